@@ -1,22 +1,60 @@
 """
 Run pytickrs
     python -m pytickrs --version
+
+Keep the imports here light: each mode imports what it needs, so that
+`--version`, `--help` and `--once` do not pay for textual and friends.
 """
 
 import logging
 import sys
-from argparse import ArgumentParser, ArgumentTypeError, FileType, RawTextHelpFormatter
+from argparse import (
+    ArgumentParser,
+    ArgumentTypeError,
+    FileType,
+    Namespace,
+    RawTextHelpFormatter,
+)
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from . import __version__
-from .once import run_once
-from .tui import run_tui
+from .defaults import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_LIVE_TTL,
+    DEFAULT_PROXIMITY_PERCENT,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RETRIES,
+    DEFAULT_SLOW_TTL,
+    DEFAULT_TIMEOUT,
+)
+from .log import (
+    LOG_FILE,
+    LOG_MAX_BYTES,
+    configure_logging,
+    eprint,
+    parse_log_levels,
+    parse_log_rotation,
+)
+
+if TYPE_CHECKING:
+    from .alerts import AlertEngine
+    from .providers import QuoteProvider
 
 epilog = """Examples:
     python -m pytickrs --version
     python -m pytickrs --once --ticker=AAPL,MSFT,GOOG
+    python -m pytickrs --once --stream --format=jsonl
+    python -m pytickrs --once --watch --alerts=alerts.txt
+    python -m pytickrs --once --record=fixtures
+    python -m pytickrs --once --replay=fixtures --replay-latency=0.2
+    python -m pytickrs --once --profile=trace.json
+    python -m pytickrs serve --tickers-from=tickers.txt
 """
 
+# --once output formats
+output_formats = ('table', 'csv', 'jsonl')
+
 
 def existing_file_path(path: str) -> bool:
     """
@@ -30,6 +68,60 @@ def existing_file_path(path: str) -> bool:
     return path
 
 
+def existing_dir_path(path: str) -> str:
+    """
+    Custom type function for argparse to validate an existing directory path.
+    """
+    p = Path(path)
+    if not p.is_dir():
+        raise ArgumentTypeError(f"Directory '{path}' does not exist.")
+    return path
+
+
+def non_negative_float(arg: str) -> float:
+    val = float(arg)
+    if val < 0:
+        raise ArgumentTypeError(f"'{arg}' is a negative number.")
+    return val
+
+
+def non_negative_int(arg: str) -> int:
+    val = int(arg)
+    if val < 0:
+        raise ArgumentTypeError(f"'{arg}' is a negative number.")
+    return val
+
+
+def positive_int(arg: str) -> int:
+    val = int(arg)
+    if val < 1:
+        raise ArgumentTypeError(f"'{arg}' is not a positive integer.")
+    return val
+
+
+def positive_float(arg: str) -> float:
+    val = float(arg)
+    if val <= 0:
+        raise ArgumentTypeError(f"'{arg}' is not a positive number.")
+    return val
+
+
+def log_levels(arg: str) -> dict[str, int]:
+    try:
+        return parse_log_levels(arg)
+    except ValueError as err:
+        raise ArgumentTypeError(str(err)) from None
+
+
+def log_rotation(arg: str) -> int | str:
+    try:
+        return parse_log_rotation(arg)
+    except ValueError:
+        raise ArgumentTypeError(
+            f"'{arg}' is neither a size, e.g. 10M, nor one of: s, m, h, d, midnight"
+        ) from None
+
+
 def comma_separated_list(arg: str) -> list[str]:
     return arg.strip().split(',')
 
@@ -43,6 +135,25 @@ def load_tickers(f) -> set[str]:
     return tickers
 
 
+def use_daemon(args: Namespace) -> bool:
+    """
+    Whether --once can be answered by a `pytickrs serve` daemon: the daemon
+    only prints the tickers it keeps fresh, anything more is done directly.
+    The daemon refuses when its --history or cache TTLs differ from args,
+    or when it replays or records.
+    """
+    return args.once and not (
+        args.no_daemon
+        or args.watch
+        or args.stream
+        or args.alerts
+        or args.replay
+        or args.record
+        or args.no_cache
+        or args.profile
+    )
+
+
 def main() -> int:
     """
     Get the tickers info and act on it
@@ -53,6 +164,13 @@ def main() -> int:
         formatter_class=RawTextHelpFormatter,
         epilog=epilog,
     )
+    ap.add_argument(
+        'command',
+        nargs='?',
+        choices=('serve',),
+        help='serve: keep the quotes of the tickers fresh in memory, answer the\n'
+        '--once clients on a Unix socket',
+    )
     ap.add_argument(
         '-v',
         '--verbose',
@@ -94,18 +212,280 @@ def main() -> int:
         default='tickers.txt',
         help='Path to a file with tickers (one per line), default: tickers.txt',
     )
+    ap.add_argument(
+        '--format',
+        choices=output_formats,
+        help='--once output format, default: table, or jsonl with --stream',
+    )
+    ap.add_argument(
+        '--stream',
+        action='store_true',
+        default=False,
+        help='--once prints each ticker as soon as it is fetched, unsorted',
+    )
+    ap.add_argument(
+        '--watch',
+        action='store_true',
+        default=False,
+        help='Keep refreshing the tickers, more often while their markets are open.\n'
+        'With --once, until interrupted',
+    )
+    ap.add_argument(
+        '--live',
+        action='store_true',
+        default=False,
+        help='Stream the prices into the TUI, poll if the stream is lost',
+    )
+    ap.add_argument(
+        '--alerts',
+        type=existing_file_path,
+        help='Path to a file with price alert rules (one per line), e.g.:\n'
+        '  AAPL price > 200\n  MSFT change%% < -3\n  NVDA near-high 5',
+    )
+    ap.add_argument(
+        '--proximity',
+        type=non_negative_float,
+        default=DEFAULT_PROXIMITY_PERCENT,
+        help='Percent of the 52 week range considered close to the high or low, '
+        f'default: {DEFAULT_PROXIMITY_PERCENT}',
+    )
+    ap.add_argument(
+        '--concurrency',
+        type=positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Number of tickers to fetch in parallel, default: {DEFAULT_CONCURRENCY}',
+    )
+    ap.add_argument(
+        '--timeout',
+        type=positive_float,
+        default=DEFAULT_TIMEOUT,
+        help=f'Per-ticker fetch timeout in seconds, default: {DEFAULT_TIMEOUT}',
+    )
+    ap.add_argument(
+        '--rate-limit',
+        type=non_negative_float,
+        default=DEFAULT_RATE_LIMIT,
+        help='Requests per second to Yahoo Finance, 0 for no limit, '
+        f'default: {DEFAULT_RATE_LIMIT}',
+    )
+    ap.add_argument(
+        '--retries',
+        type=non_negative_int,
+        default=DEFAULT_RETRIES,
+        help='Times to retry a rate limited or failed request, once the other\n'
+        f'tickers are fetched, default: {DEFAULT_RETRIES}',
+    )
+    #
+    # '--replay' and '--record' are mutually exclusive
+    #
+    group3 = ap.add_mutually_exclusive_group()
+    group3.add_argument(
+        '--replay',
+        type=existing_dir_path,
+        help='Replay ticker data recorded in this directory instead of going online',
+    )
+    group3.add_argument(
+        '--record',
+        help='Record fetched ticker data into this directory for a later --replay',
+    )
+    ap.add_argument(
+        '--replay-latency',
+        type=non_negative_float,
+        default=0.0,
+        help='Synthetic per-request latency in seconds for --replay, default: 0',
+    )
+    ap.add_argument(
+        '--no-cache',
+        action='store_true',
+        default=False,
+        help='Bypass the on-disk quote cache',
+    )
+    ap.add_argument(
+        '--no-snapshot',
+        action='store_true',
+        default=False,
+        help='The TUI neither starts from nor saves the snapshot of the last session',
+    )
+    ap.add_argument(
+        '--history',
+        action='store_true',
+        default=False,
+        help='Keep the local daily and intraday price history up to date',
+    )
+    ap.add_argument(
+        '--live-ttl',
+        type=non_negative_float,
+        default=DEFAULT_LIVE_TTL,
+        help=f'Seconds to cache prices and other live fields, default: {DEFAULT_LIVE_TTL}',
+    )
+    ap.add_argument(
+        '--slow-ttl',
+        type=non_negative_float,
+        default=DEFAULT_SLOW_TTL,
+        help=f'Seconds to cache fundamentals and profile fields, default: {DEFAULT_SLOW_TTL}',
+    )
+    ap.add_argument(
+        '--log-file',
+        default=LOG_FILE,
+        help=f'Path to the log file, default: {LOG_FILE}',
+    )
+    ap.add_argument(
+        '--log-level',
+        type=log_levels,
+        default={},
+        help='Log level of the root logger and of given loggers, e.g.:\n'
+        '  WARNING,pytickrs.tui=DEBUG,yfinance=INFO\n'
+        'default: INFO, DEBUG for pytickrs with --verbose',
+    )
+    ap.add_argument(
+        '--log-rotate',
+        type=log_rotation,
+        default=LOG_MAX_BYTES,
+        help='Rotate the log file at a size, e.g. 10M, or every s, m, h, d or '
+        f'at midnight,\ndefault: {LOG_MAX_BYTES // 1024**2}M',
+    )
+    ap.add_argument(
+        '--socket',
+        help='Path to the Unix socket of the daemon,\n'
+        'default: pytickrs.sock in $XDG_RUNTIME_DIR or in the cache directory',
+    )
+    ap.add_argument(
+        '--no-daemon',
+        action='store_true',
+        default=False,
+        help='--once fetches the tickers itself, even if a daemon is running',
+    )
+    ap.add_argument(
+        '--profile',
+        metavar='TRACE',
+        help='Time the phases of each refresh, save the spans to this JSON trace\n'
+        '(chrome://tracing, Perfetto) on exit.  The TUI shows a summary in the status',
+    )
 
     args = ap.parse_args()
     if args.version:
         print(__version__)
         return 0
 
-    level = logging.DEBUG if args.verbose else logging.INFO
+    if args.format is None:
+        args.format = 'jsonl' if args.stream else 'table'
+    elif args.stream and args.format == 'table':
+        ap.error('--stream needs --format=csv or --format=jsonl')
+    if args.live and args.once:
+        ap.error('--live is for the TUI, not --once')
+    if args.command == 'serve' and (args.once or args.live):
+        ap.error('serve is not for --once nor --live')
+
+    alerts = None
+    if args.alerts:
+        from .alerts import AlertEngine, load_rules
+
+        try:
+            alerts = AlertEngine(load_rules(args.alerts))
+        except ValueError as err:
+            ap.error(f'--alerts {args.alerts}: {err}')
+
+    levels = args.log_level
+    if not levels.keys() & {'', 'pytickrs'}:
+        # unless given for the root logger or for pytickrs
+        level = logging.DEBUG if args.verbose else logging.INFO
+        levels = {'pytickrs': level} | levels
+    configure_logging(args.log_file, levels, args.log_rotate)
     tickers = args.tickers if args.tickers else load_tickers(args.tickers_from)
+    if use_daemon(args):
+        from .client import run_client
+
+        ec = run_client(
+            args.socket,
+            tickers,
+            args.format,
+            args.proximity,
+            args.history,
+            (args.live_ttl, args.slow_ttl),
+        )
+        if ec is not None:
+            return ec
+    from .providers import make_provider
+
+    cache_ttls = None if args.no_cache else (args.live_ttl, args.slow_ttl)
+    throttle = None
+    if not args.replay:
+        from .throttle import Throttle
+
+        throttle = Throttle(args.rate_limit, retries=args.retries)
+    provider = make_provider(
+        args.replay,
+        args.replay_latency,
+        args.record,
+        cache_ttls,
+        args.history,
+        throttle,
+    )
+    recording = None
+    if args.profile:
+        from .timing import start_profiling
+
+        recording = start_profiling()
+    try:
+        return run(args, tickers, provider, alerts)
+    finally:
+        if recording is not None:
+            recording.save(args.profile)
+            eprint(f'{recording.summary()}, trace saved to {args.profile}')
+
+
+def run(
+    args: Namespace,
+    tickers: set[str],
+    provider: 'QuoteProvider',
+    alerts: 'AlertEngine | None',
+) -> int:
+    """
+    Run the daemon, --once or the TUI as asked for by args
+    """
+    # the levels are set by configure_logging
+    level = logging.NOTSET
+    if args.command == 'serve':
+        from .serve import serve
+
+        return serve(args.socket, tickers, provider, args.concurrency, args.timeout)
+
     if args.once:
-        return run_once(level, tickers)
+        from .once import run_once
+
+        return run_once(
+            level,
+            tickers,
+            provider,
+            args.concurrency,
+            args.timeout,
+            args.format,
+            args.stream,
+            args.proximity,
+            args.watch,
+            alerts,
+        )
 
-    return run_tui(level, tickers, args.details_template)
+    from .live import YAHOO_STREAMER_URL
+    from .snapshot import default_snapshot_path
+    from .tui import run_tui
+
+    # replayed data does not make a session
+    snapshot = None if args.no_snapshot or args.replay else default_snapshot_path()
+
+    return run_tui(
+        level,
+        tickers,
+        args.details_template,
+        provider,
+        args.concurrency,
+        args.timeout,
+        args.proximity,
+        args.watch,
+        YAHOO_STREAMER_URL if args.live else None,
+        alerts,
+        snapshot,
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,235 @@
+"""
+Price alerts defined by the user, one rule per line of a file, e.g.:
+
+    AAPL price > 200
+    AAPL price < 150
+    MSFT change% < -3
+    NVDA near-high 5
+
+`near-high N` and `near-low N` fire within N percent of the 52 week high or
+low.  A rule fires when its value crosses the level, or right away if it is
+already past it when the symbol is first seen.
+
+The levels of each symbol and metric are kept sorted, an update of a symbol
+finds the crossed levels by bisection: O(log rules) plus the alerts fired.
+"""
+
+import json
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+# info fields the metrics are computed from
+ALERT_FIELDS = (
+    'currentPrice',
+    'regularMarketChangePercent',
+    'fiftyTwoWeekHigh',
+    'fiftyTwoWeekLow',
+)
+
+
+def _number(val: Any) -> float | None:
+    if isinstance(val, int | float) and not isinstance(val, bool):
+        val = float(val)
+        return None if math.isnan(val) else val
+    return None
+
+
+def _near_high(info: Mapping[str, Any]) -> float | None:
+    price = _number(info.get('currentPrice'))
+    high = _number(info.get('fiftyTwoWeekHigh'))
+    if price is None or high is None or high <= 0:
+        return None
+    return (high - price) / high * 100
+
+
+def _near_low(info: Mapping[str, Any]) -> float | None:
+    price = _number(info.get('currentPrice'))
+    low = _number(info.get('fiftyTwoWeekLow'))
+    if price is None or low is None or low <= 0:
+        return None
+    return (price - low) / low * 100
+
+
+#
+# Metric name -> its value from the info, None if it cannot be computed
+#
+METRICS: dict[str, Callable[[Mapping[str, Any]], float | None]] = {
+    'price': lambda info: _number(info.get('currentPrice')),
+    'change%': lambda info: _number(info.get('regularMarketChangePercent')),
+    # percent below the 52 week high
+    'near-high': _near_high,
+    # percent above the 52 week low
+    'near-low': _near_low,
+}
+
+
+class AlertRule:
+    """
+    Fire when the metric of symbol crosses the level
+    """
+
+    __slots__ = ('level', 'metric', 'op', 'symbol')
+
+    def __init__(self, symbol: str, metric: str, op: str, level: float) -> None:
+        self.symbol = symbol
+        self.metric = metric
+        # '>' fires rising above level, '<' falling below it
+        self.op = op
+        self.level = level
+        return
+
+    def __str__(self) -> str:
+        return f'{self.symbol} {self.metric} {self.op} {self.level:g}'
+
+
+class Alert:
+    """
+    A rule fired by the value of its metric
+    """
+
+    __slots__ = ('rule', 'value')
+
+    def __init__(self, rule: AlertRule, value: float) -> None:
+        self.rule = rule
+        self.value = value
+        return
+
+    def __str__(self) -> str:
+        return f'{self.rule}: {self.value:.2f}'
+
+    def record(self) -> dict[str, Any]:
+        """
+        JSON record of the alert
+        """
+        rule = self.rule
+        return {
+            'symbol': rule.symbol,
+            'alert': str(rule),
+            'metric': rule.metric,
+            'level': rule.level,
+            'value': round(self.value, 4),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.record())
+
+
+def parse_rule(line: str) -> AlertRule:
+    """
+    Parse `SYMBOL METRIC OP LEVEL`, or `SYMBOL near-high|near-low PERCENT`
+    """
+    words = line.split()
+    if len(words) == 3 and words[1] in {'near-high', 'near-low'}:
+        words.insert(2, '<')
+    if len(words) != 4:
+        msg = f'expected SYMBOL METRIC OP LEVEL: {line!r}'
+        raise ValueError(msg)
+    symbol, metric, op, level = words
+    if metric not in METRICS:
+        msg = f'unknown metric {metric!r}, one of: {", ".join(METRICS)}'
+        raise ValueError(msg)
+    if op not in {'<', '>'}:
+        msg = f"unknown operator {op!r}, one of: '<', '>'"
+        raise ValueError(msg)
+    return AlertRule(symbol.upper(), metric, op, float(level))
+
+
+def load_rules(path: str | Path) -> list[AlertRule]:
+    """
+    Load alert rules from the file, blank lines and # comments are skipped
+    """
+    rules = []
+    with Path(path).open(encoding='utf-8') as f:
+        for number, line1 in enumerate(f, 1):
+            line = line1.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                rules.append(parse_rule(line))
+            except ValueError as err:
+                msg = f'line {number}: {err}'
+                raise ValueError(msg) from err
+    return rules
+
+
+class _Levels:
+    """
+    Rules of a single symbol, metric and op sorted by level
+    """
+
+    __slots__ = ('levels', 'rules')
+
+    def __init__(self, rules: list[AlertRule]) -> None:
+        rules.sort(key=lambda rule: rule.level)
+        self.rules = rules
+        self.levels = [rule.level for rule in rules]
+        return
+
+
+class AlertEngine:
+    """
+    Evaluates the alert rules against the updated quotes
+    """
+
+    def __init__(self, rules: Iterable[AlertRule]) -> None:
+        grouped: dict[tuple[str, str, str], list[AlertRule]] = {}
+        for rule in rules:
+            grouped.setdefault((rule.symbol, rule.metric, rule.op), []).append(rule)
+        # (symbol, metric) -> rules firing when rising above / falling below
+        self._above: dict[tuple[str, str], _Levels] = {}
+        self._below: dict[tuple[str, str], _Levels] = {}
+        # symbol -> metrics with rules
+        self._metrics: dict[str, set[str]] = {}
+        for (symbol, metric, op), group in grouped.items():
+            levels = self._above if op == '>' else self._below
+            levels[symbol, metric] = _Levels(group)
+            self._metrics.setdefault(symbol, set()).add(metric)
+        # (symbol, metric) -> the last value seen
+        self._last: dict[tuple[str, str], float] = {}
+        self._count = sum(len(group) for group in grouped.values())
+        return
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._metrics
+
+    @property
+    def symbols(self) -> set[str]:
+        return set(self._metrics)
+
+    def update(self, symbol: str, info: Mapping[str, Any]) -> list[Alert]:
+        """
+        Alerts fired by the updated info of symbol
+        """
+        fired: list[Alert] = []
+        for metric in self._metrics.get(symbol, ()):
+            value = METRICS[metric](info)
+            if value is None:
+                continue
+            key = (symbol, metric)
+            old = self._last.get(key)
+            self._last[key] = value
+            if old == value:
+                continue
+            above = self._above.get(key)
+            if above is not None:
+                # old <= level < value
+                lo = 0 if old is None else bisect_left(above.levels, old)
+                hi = bisect_left(above.levels, value)
+                fired.extend(Alert(rule, value) for rule in above.rules[lo:hi])
+            below = self._below.get(key)
+            if below is not None:
+                # value < level <= old
+                lo = bisect_right(below.levels, value)
+                hi = (
+                    len(below.levels)
+                    if old is None
+                    else bisect_right(below.levels, old)
+                )
+                fired.extend(Alert(rule, value) for rule in below.rules[lo:hi])
+        return fired
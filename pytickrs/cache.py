@@ -0,0 +1,225 @@
+"""
+Persistent on-disk cache of the ticker info.
+
+The info is split in two classes of fields with separate TTLs:
+live fields (prices, volumes, market state) go stale in a minute,
+slow fields (fundamentals, company profile) in a day.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .defaults import DEFAULT_LIVE_TTL, DEFAULT_SLOW_TTL
+from .providers import QuoteProvider
+from .timing import span
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    import pandas as pd
+
+
+LIVE = 'live'
+SLOW = 'slow'
+
+#
+# Fields which change during the trading session, everything else is slow
+#
+LIVE_FIELDS = frozenset(
+    {
+        'ask',
+        'askSize',
+        'bid',
+        'bidSize',
+        'currentPrice',
+        'dayHigh',
+        'dayLow',
+        'fiftyTwoWeekHigh',
+        'fiftyTwoWeekLow',
+        'fiftyTwoWeekRange',
+        'marketState',
+        'open',
+        'postMarketChange',
+        'postMarketChangePercent',
+        'postMarketPrice',
+        'postMarketTime',
+        'preMarketChange',
+        'preMarketChangePercent',
+        'preMarketPrice',
+        'preMarketTime',
+        'regularMarketChange',
+        'regularMarketChangePercent',
+        'regularMarketDayHigh',
+        'regularMarketDayLow',
+        'regularMarketDayRange',
+        'regularMarketOpen',
+        'regularMarketPrice',
+        'regularMarketTime',
+        'regularMarketVolume',
+        'volume',
+    }
+)
+
+
+def user_cache_dir() -> Path:
+    """
+    Per-user cache directory for pytickrs
+    """
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'pytickrs'
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+        return Path(base) / 'pytickrs' / 'Cache'
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'pytickrs'
+
+
+def split_info(info: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """
+    Split info into the live and slow fields
+    """
+    parts: dict[str, dict[str, Any]] = {LIVE: {}, SLOW: {}}
+    for k, v in info.items():
+        parts[LIVE if k in LIVE_FIELDS else SLOW][k] = v
+    return parts
+
+
+class QuoteCache:
+    """
+    SQLite-backed store of the ticker info, one row per symbol and field class
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        if path is None:
+            path = user_cache_dir() / 'quotes.sqlite'
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        # let concurrent `--once` runs and the TUI share the file
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS info ('
+            ' symbol TEXT NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' fetched REAL NOT NULL,'
+            ' data TEXT NOT NULL,'
+            ' PRIMARY KEY (symbol, kind))'
+        )
+        return
+
+    def load(self, symbol: str) -> dict[str, tuple[float, dict[str, Any]]]:
+        """
+        Returns field class -> (fetch time, fields) for `symbol`
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT kind, fetched, data FROM info WHERE symbol = ?', (symbol,)
+            ).fetchall()
+        return {kind: (fetched, json.loads(data)) for kind, fetched, data in rows}
+
+    def store(
+        self, symbol: str, parts: dict[str, dict[str, Any]], fetched: float
+    ) -> None:
+        """
+        Save the field classes in `parts` for `symbol`
+        """
+        rows = [
+            (symbol, kind, fetched, json.dumps(data, default=str))
+            for kind, data in parts.items()
+        ]
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO info (symbol, kind, fetched, data)'
+                ' VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        return
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+        return
+
+
+class CachingProvider(QuoteProvider):
+    """
+    Serve the info from QuoteCache, go to `provider` only for the stale
+    field classes.  Stale live fields alone are refreshed with
+    `provider.get_live`, anything else with `provider.get_info`.
+    """
+
+    def __init__(
+        self,
+        provider: QuoteProvider,
+        cache: QuoteCache,
+        live_ttl: float = DEFAULT_LIVE_TTL,
+        slow_ttl: float = DEFAULT_SLOW_TTL,
+    ) -> None:
+        self.provider = provider
+        self.name = f'{provider.name}+cache'
+        self.throttle = provider.throttle
+        self.kind = provider.kind
+        self.cache = cache
+        self.cache_ttls = (live_ttl, slow_ttl)
+        self.ttls = {LIVE: live_ttl, SLOW: slow_ttl}
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        with span('cache', symbol):
+            entries = self.cache.load(symbol)
+        now = time.time()
+        stale = {
+            kind
+            for kind, ttl in self.ttls.items()
+            if kind not in entries or now - entries[kind][0] > ttl
+        }
+        if not stale:
+            return {**entries[SLOW][1], **entries[LIVE][1]}
+
+        if stale == {LIVE}:
+            parts = split_info(self.provider.get_live(symbol))
+            if not parts[LIVE]:
+                # failed request, better stale than nothing
+                _, live = entries.get(LIVE, (now, {}))
+                return {**entries[SLOW][1], **live}
+            self.cache.store(symbol, {k: v for k, v in parts.items() if v}, now)
+            return {**entries[SLOW][1], **parts[SLOW], **parts[LIVE]}
+
+        info = self.provider.get_info(symbol)
+        # do not cache failed requests, these often come back empty
+        if info:
+            self.cache.store(symbol, split_info(info), now)
+        return info
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        return self.provider.get_history(symbol, period, interval, start)
+
+    def cached_quotes(self, symbols: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """
+        Whatever is in the cache for `symbols`, regardless of age
+        """
+        quotes: dict[str, dict[str, Any]] = {}
+        for symbol in symbols:
+            entries = self.cache.load(symbol)
+            if entries:
+                info: dict[str, Any] = {}
+                for _, data in entries.values():
+                    info.update(data)
+                quotes[symbol] = info
+        return quotes
@@ -0,0 +1,131 @@
+"""
+Client of the `pytickrs serve` daemon, used by --once when a daemon listens.
+
+Only the standard library here: answering from the daemon is worth it as
+long as the client does not import what the daemon saves it from.
+
+A request is a single JSON line: the protocol version, the tickers, the
+output format, the proximity, whether to add the indicator columns, the
+cache TTLs and the kind of provider, live, replay or record.  The answer is
+a JSON line, with either the symbols which failed, an error, or why the
+daemon refused to answer, then the output exactly as --once prints it,
+until the daemon closes the connection.  The daemon refuses the requests it
+cannot answer as --once would with the same options, the client then
+fetches the tickers itself.
+"""
+
+import json
+import os
+import socket
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .cache import user_cache_dir
+from .log import eprint, setup_logging
+
+log = setup_logging(__name__)
+
+PROTOCOL = 3
+SOCKET_NAME = 'pytickrs.sock'
+# seconds, the daemon may have to fetch the tickers it does not know yet
+CLIENT_TIMEOUT = 60.0
+
+
+def default_socket_path() -> Path:
+    """
+    In the per-user runtime directory if any, else in the cache directory
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return Path(runtime_dir) / SOCKET_NAME
+    return user_cache_dir() / SOCKET_NAME
+
+
+def connect(path: str | Path, timeout: float = CLIENT_TIMEOUT) -> socket.socket | None:
+    """
+    Connected socket, None if no daemon listens on path
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        # no daemon on Windows
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def query(
+    path: str | Path,
+    tickers: Iterable[str],
+    fmt: str,
+    proximity: float,
+    indicators: bool,
+    ttls: tuple[float, float],
+    kind: str = 'live',
+    timeout: float = CLIENT_TIMEOUT,
+) -> tuple[dict[str, Any], str] | None:
+    """
+    Ask the daemon listening on path, returns the header and the output,
+    None if no daemon listens.  Raises OSError or ValueError if the daemon
+    fails to answer.
+    """
+    sock = connect(path, timeout)
+    if sock is None:
+        return None
+    request = {
+        'protocol': PROTOCOL,
+        'tickers': sorted(tickers),
+        'format': fmt,
+        'proximity': proximity,
+        'indicators': indicators,
+        'ttls': list(ttls),
+        'kind': kind,
+    }
+    with sock, sock.makefile('rb') as answer:
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        header: dict[str, Any] = json.loads(answer.readline())
+        output = answer.read().decode()
+    return header, output
+
+
+def run_client(
+    path: str | Path | None,
+    tickers: Iterable[str],
+    fmt: str,
+    proximity: float,
+    indicators: bool,
+    ttls: tuple[float, float],
+    kind: str = 'live',
+) -> int | None:
+    """
+    Print the --once output answered by the daemon listening on path, or on
+    the default socket, returns the exit code, None if no daemon could answer
+    """
+    if path is None:
+        path = default_socket_path()
+    try:
+        answer = query(path, tickers, fmt, proximity, indicators, ttls, kind)
+    except (OSError, ValueError) as err:
+        log.warning('The daemon on %s failed to answer: %s', path, err)
+        return None
+    if answer is None:
+        log.debug('No daemon on %s', path)
+        return None
+    header, output = answer
+    if 'refused' in header:
+        log.info('The daemon on %s refused: %s', path, header['refused'])
+        return None
+    if 'error' in header:
+        eprint(f'pytickrs daemon: {header["error"]}')
+        return 1
+    for symbol in header.get('failed', []):
+        log.warning('Failed to fetch %s', symbol)
+    sys.stdout.write(output)
+    return 0
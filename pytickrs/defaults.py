@@ -0,0 +1,27 @@
+"""
+Defaults of the command line options.  No imports here: `--version` and
+`--help` show them without loading the modules which use them.
+"""
+
+# percent of the 52 week range considered close to the high or low
+DEFAULT_PROXIMITY_PERCENT = 20.0
+
+#
+# Fetch engine defaults
+#
+DEFAULT_CONCURRENCY = 8
+# seconds, per symbol
+DEFAULT_TIMEOUT = 30.0
+
+#
+# Quote cache TTLs, in seconds
+#
+DEFAULT_LIVE_TTL = 60.0
+DEFAULT_SLOW_TTL = 24 * 60 * 60.0
+
+#
+# Throttling of the online requests
+#
+# requests per second
+DEFAULT_RATE_LIMIT = 10.0
+DEFAULT_RETRIES = 3
@@ -0,0 +1,248 @@
+"""
+Local store of the price history bars.
+
+One NumPy `.npy` file per symbol and interval, a structured array of bars
+sorted by time, which can be memory-mapped.  A refresh fetches only the bars
+after the last stored one.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from .cache import user_cache_dir
+from .log import setup_logging
+from .providers import QuoteProvider
+from .timing import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = setup_logging(__name__)
+
+BAR_DTYPE = np.dtype(
+    [
+        # seconds since the epoch, UTC
+        ('ts', '<i8'),
+        ('open', '<f8'),
+        ('high', '<f8'),
+        ('low', '<f8'),
+        ('close', '<f8'),
+        ('volume', '<f8'),
+    ]
+)
+
+#
+# Recorded intervals -> (period fetched initially, seconds per bar,
+#                        seconds of bars retained)
+#
+INTERVALS: dict[str, tuple[str, int, int | None]] = {
+    '1d': ('2y', 24 * 60 * 60, None),
+    # yfinance serves 5m bars for the last 60 days only
+    '5m': ('5d', 5 * 60, 30 * 24 * 60 * 60),
+}
+
+_FRAME_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume',
+}
+
+
+def frame_to_bars(df: 'pd.DataFrame') -> np.ndarray:
+    """
+    Convert yfinance history frame to an array of BAR_DTYPE
+    """
+    import pandas as pd
+
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    if not len(df):
+        return bars
+    index = pd.to_datetime(df.index, utc=True)
+    bars['ts'] = index.as_unit('s').to_numpy(dtype=np.int64)
+    for field, column in _FRAME_COLUMNS.items():
+        if column in df:
+            bars[field] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            bars[field] = np.nan
+    return bars
+
+
+def merge_bars(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """
+    Append new bars to old ones, new bars replace the old ones from the same time on
+    """
+    if not len(new):
+        return old
+    new = np.sort(new, order='ts')
+    keep = old[old['ts'] < new['ts'][0]]
+    return np.concatenate((keep, new))
+
+
+class HistoryStore:
+    """
+    Directory of `<symbol>.<interval>.npy` bar files
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        if path is None:
+            path = user_cache_dir() / 'history'
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # per symbol and interval, to serialize read-modify-write
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        return
+
+    def _file(self, symbol: str, interval: str) -> Path:
+        return self.path / f'{symbol}.{interval}.npy'
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def load(self, symbol: str, interval: str = '1d') -> np.ndarray:
+        """
+        Memory-mapped bars for symbol, empty if none are stored
+        """
+        path = self._file(symbol, interval)
+        if not path.exists():
+            return np.empty(0, dtype=BAR_DTYPE)
+        bars: np.ndarray = np.load(path, mmap_mode='r')
+        return bars
+
+    def last_timestamp(self, symbol: str, interval: str = '1d') -> int | None:
+        bars = self.load(symbol, interval)
+        return int(bars['ts'][-1]) if len(bars) else None
+
+    def save(self, symbol: str, interval: str, bars: np.ndarray) -> None:
+        """
+        Atomically replace the stored bars for symbol
+        """
+        path = self._file(symbol, interval)
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with tmp.open('wb') as f:
+            np.save(f, bars)
+        tmp.replace(path)
+        return
+
+    def append(self, symbol: str, interval: str, new: np.ndarray) -> np.ndarray:
+        """
+        Merge new bars into the stored ones, apply the retention of interval
+        """
+        with self._lock(symbol, interval):
+            bars = merge_bars(np.array(self.load(symbol, interval)), new)
+            _, _, retention = INTERVALS.get(interval, ('', 0, None))
+            if retention is not None and len(bars):
+                bars = bars[bars['ts'] >= bars['ts'][-1] - retention]
+            self.save(symbol, interval, bars)
+        return bars
+
+    def stale(self, symbol: str, interval: str, now: float | None = None) -> bool:
+        """
+        True when a bar newer than the last stored one may be available
+        """
+        last = self.last_timestamp(symbol, interval)
+        if last is None:
+            return True
+        if now is None:
+            now = time.time()
+        _, width, _ = INTERVALS.get(interval, ('', 0, None))
+        return now - last >= width
+
+    def update(self, symbol: str, provider: QuoteProvider, interval: str = '1d') -> int:
+        """
+        Fetch the bars after the last stored one, returns the number of bars fetched
+        """
+        last = self.last_timestamp(symbol, interval)
+        period, _, _ = INTERVALS.get(interval, ('1y', 0, None))
+        if last is None:
+            df = provider.get_history(symbol, period=period, interval=interval)
+        else:
+            # refetch the last bar, it may have been incomplete
+            start = datetime.fromtimestamp(last, tz=UTC)
+            df = provider.get_history(symbol, interval=interval, start=start)
+        new = frame_to_bars(df)
+        self.append(symbol, interval, new)
+        return len(new)
+
+
+def yearly_range(
+    bars: np.ndarray, now: float | None = None
+) -> tuple[float, float] | None:
+    """
+    52 week (low, high) from daily bars, None if there are none
+    """
+    if now is None:
+        now = time.time()
+    year = bars[bars['ts'] >= now - 365 * 24 * 60 * 60]
+    if not len(year):
+        return None
+    return float(np.nanmin(year['low'])), float(np.nanmax(year['high']))
+
+
+class HistoryProvider(QuoteProvider):
+    """
+    Pass the requests through to `provider`, on every info request
+    bring the stale intervals of the stored history for the symbol up to date.
+    """
+
+    history_store: HistoryStore
+
+    def __init__(
+        self,
+        provider: QuoteProvider,
+        store: HistoryStore,
+        intervals: tuple[str, ...] = tuple(INTERVALS),
+    ) -> None:
+        self.provider = provider
+        self.name = f'{provider.name}+history'
+        self.throttle = provider.throttle
+        self.cache_ttls = provider.cache_ttls
+        self.kind = provider.kind
+        self.history_store = store
+        self.intervals = intervals
+        return
+
+    def _update(self, symbol: str, info: dict[str, Any]) -> None:
+        for interval in self.intervals:
+            if not self.history_store.stale(symbol, interval):
+                continue
+            try:
+                self.history_store.update(symbol, self.provider, interval)
+            except Exception as err:
+                log.warning('Failed to update %s %s history: %s', symbol, interval, err)
+        # fill in what yfinance did not provide
+        if info.get('fiftyTwoWeekLow') is None or info.get('fiftyTwoWeekHigh') is None:
+            low_high = yearly_range(self.history_store.load(symbol, '1d'))
+            if low_high is not None:
+                info['fiftyTwoWeekLow'], info['fiftyTwoWeekHigh'] = low_high
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        info = self.provider.get_info(symbol)
+        # empty info means the request failed
+        if info:
+            with span('history', symbol):
+                self._update(symbol, info)
+        return info
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: datetime | None = None,
+    ) -> 'pd.DataFrame':
+        return self.provider.get_history(symbol, period, interval, start)
+
+    def cached_quotes(self, symbols: Iterable[str]) -> dict[str, dict[str, Any]]:
+        return self.provider.cached_quotes(symbols)
@@ -0,0 +1,193 @@
+"""
+Technical indicators for the whole watchlist at once.
+
+The daily closes of all the symbols form a (symbols, bars) matrix, every
+indicator is a vectorized rolling-window kernel along the bars axis:
+cumulative sums for the moving averages and deviations, scipy IIR filters
+for the exponential averages.  Cost is linear in bars x symbols.
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+from scipy.signal import lfilter
+
+from .history import HistoryStore
+
+# daily bars needed for the longest window plus a crossover
+LOOKBACK = 201
+
+SMA_FAST = 50
+SMA_SLOW = 200
+EMA_FAST = 12
+EMA_SLOW = 26
+RSI_WINDOW = 14
+VOLATILITY_WINDOW = 20
+ZSCORE_WINDOW = 200
+TRADING_DAYS = 252
+
+#
+# Indicator -> info field name, the values are merged into the ticker info
+#
+INDICATOR_FIELDS = {
+    'rsi': 'rsi14',
+    'volatility': 'volatility20',
+    'zscore': 'zScore200',
+    'sma_cross': 'smaCross',
+    'ema_cross': 'emaCross',
+}
+
+
+def fill_gaps(closes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Forward fill the NaNs in each row, leading NaNs take the first valid value.
+    Returns the filled matrix and the number of bars since the first valid one.
+    """
+    rows, cols = closes.shape
+    valid = ~np.isnan(closes)
+    idx = np.where(valid, np.arange(cols), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = np.take_along_axis(closes, idx, axis=1)
+    first = valid.argmax(axis=1)
+    leading = np.arange(cols) < first[:, None]
+    filled = np.where(leading, closes[np.arange(rows), first][:, None], filled)
+    n_valid = np.where(valid.any(axis=1), cols - first, 0)
+    return filled, n_valid
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing moving average along axis 1, NaN for the first window - 1 bars
+    """
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < window:
+        return out
+    csum = np.cumsum(x, axis=1)
+    out[:, window - 1] = csum[:, window - 1]
+    out[:, window:] = csum[:, window:] - csum[:, :-window]
+    out[:, window - 1 :] /= window
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing population standard deviation along axis 1
+    """
+    mean = rolling_mean(x, window)
+    mean_sq = rolling_mean(x * x, window)
+    return np.asarray(np.sqrt(np.maximum(mean_sq - mean * mean, 0.0)), dtype=float)
+
+
+def ema(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Exponential moving average along axis 1, seeded with the first value
+    """
+    b = [alpha]
+    a = [1.0, alpha - 1.0]
+    zi = (1.0 - alpha) * x[:, :1]
+    y, _ = lfilter(b, a, x, axis=1, zi=zi)
+    return np.asarray(y, dtype=float)
+
+
+def rsi(closes: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    """
+    Wilder's relative strength index of the last bar
+    """
+    delta = np.diff(closes, axis=1)
+    if not delta.shape[1]:
+        return np.full(closes.shape[0], np.nan)
+    alpha = 1.0 / window
+    gain = ema(np.maximum(delta, 0.0), alpha)[:, -1]
+    loss = ema(np.maximum(-delta, 0.0), alpha)[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        return np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+
+
+def crossover(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """
+    1 if fast crossed above slow on the last bar, -1 if below, 0 otherwise
+    """
+    diff = np.asarray(fast[:, -2:] - slow[:, -2:], dtype=float)
+    up = (diff[:, 0] <= 0) & (diff[:, 1] > 0)
+    down = (diff[:, 0] >= 0) & (diff[:, 1] < 0)
+    return up.astype(np.float64) - down.astype(np.float64)
+
+
+def compute_indicators(closes: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Indicators of the last bar for each row of closes (symbols, bars),
+    NaN where there is not enough history.
+    """
+    filled, n_valid = fill_gaps(closes)
+    if filled.shape[1] < 2:
+        nan = np.full(filled.shape[0], np.nan)
+        return dict.fromkeys(INDICATOR_FIELDS, nan)
+
+    def enough(window: int, values: np.ndarray) -> np.ndarray:
+        return np.where(n_valid >= window, values, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(filled), axis=1)
+        volatility = rolling_std(returns, VOLATILITY_WINDOW)[:, -1]
+        z_mean = rolling_mean(filled, ZSCORE_WINDOW)[:, -1]
+        z_std = rolling_std(filled, ZSCORE_WINDOW)[:, -1]
+        zscore = np.where(z_std > 0, (filled[:, -1] - z_mean) / z_std, np.nan)
+    sma_cross = crossover(
+        rolling_mean(filled, SMA_FAST), rolling_mean(filled, SMA_SLOW)
+    )
+    ema_cross = crossover(
+        ema(filled, 2.0 / (EMA_FAST + 1)), ema(filled, 2.0 / (EMA_SLOW + 1))
+    )
+    return {
+        'rsi': enough(RSI_WINDOW + 1, rsi(filled)),
+        'volatility': enough(
+            VOLATILITY_WINDOW + 1, volatility * np.sqrt(TRADING_DAYS) * 100
+        ),
+        'zscore': enough(ZSCORE_WINDOW, zscore),
+        'sma_cross': enough(SMA_SLOW + 1, sma_cross),
+        'ema_cross': enough(EMA_SLOW + 1, ema_cross),
+    }
+
+
+def close_matrix(
+    store: HistoryStore, symbols: Sequence[str], lookback: int = LOOKBACK
+) -> np.ndarray:
+    """
+    The last `lookback` daily closes of symbols, left padded with NaN
+    """
+    closes = np.full((len(symbols), lookback), np.nan)
+    for i, symbol in enumerate(symbols):
+        bars = store.load(symbol, '1d')['close'][-lookback:]
+        if len(bars):
+            closes[i, -len(bars) :] = bars
+    return closes
+
+
+def indicator_fields(
+    store: HistoryStore, symbols: Sequence[str]
+) -> dict[str, dict[str, float]]:
+    """
+    Symbol -> info fields with the indicators, for the symbols with enough history
+    """
+    indicators = compute_indicators(close_matrix(store, symbols))
+    result: dict[str, dict[str, float]] = {}
+    for i, symbol in enumerate(symbols):
+        fields = {
+            INDICATOR_FIELDS[name]: round(float(values[i]), 2)
+            for name, values in indicators.items()
+            if not np.isnan(values[i])
+        }
+        if fields:
+            result[symbol] = fields
+    return result
+
+
+def merge_indicators(store: HistoryStore, quotes: dict[str, dict[str, Any]]) -> None:
+    """
+    Add the indicator fields to the info of each of quotes
+    """
+    for symbol, fields in indicator_fields(store, list(quotes)).items():
+        quotes[symbol].update(fields)
+    return
@@ -0,0 +1,176 @@
+"""
+Live prices streamed over the yfinance websocket.
+
+One subscription covers the whole watchlist.  Ticks arrive on the feed
+thread and are merged per symbol by a TickCoalescer, the UI drains it once
+per frame, so a burst of ticks for a symbol costs a single row update.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from .log import setup_logging
+
+log = setup_logging(__name__)
+
+YAHOO_STREAMER_URL = 'wss://streamer.finance.yahoo.com/?version=2'
+# seconds, the streamer drops the subscriptions not renewed in time
+HEARTBEAT_INTERVAL = 15.0
+
+#
+# Streamed pricing field -> info field
+#
+TICK_FIELDS = {
+    'price': 'currentPrice',
+    'change': 'regularMarketChange',
+    'change_percent': 'regularMarketChangePercent',
+    'day_high': 'dayHigh',
+    'day_low': 'dayLow',
+    'bid': 'bid',
+    'ask': 'ask',
+    'day_volume': 'volume',
+}
+
+#
+# Streamed market_hours -> info marketState, 0 (pre market) is not sent
+#
+MARKET_STATES = {
+    0: 'PRE',
+    1: 'REGULAR',
+    2: 'POST',
+    3: 'POSTPOST',
+}
+
+
+def tick_fields(message: dict[str, Any]) -> tuple[str, dict[str, Any]] | None:
+    """
+    Symbol and info fields of a decoded pricing message, None if it has no symbol
+    """
+    symbol = message.get('id')
+    if not symbol:
+        return None
+    fields: dict[str, Any] = {}
+    for name, field in TICK_FIELDS.items():
+        value = message.get(name)
+        if value is None:
+            continue
+        # 64 bit integers come as strings
+        try:
+            fields[field] = float(value)
+        except (TypeError, ValueError):
+            continue
+    market_state = MARKET_STATES.get(message.get('market_hours', -1))
+    if market_state is not None:
+        fields['marketState'] = market_state
+    return symbol, fields
+
+
+class TickCoalescer:
+    """
+    Ticks merged per symbol between two drains, thread safe
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # symbol -> merged fields
+        self._pending: dict[str, dict[str, Any]] = {}
+        # symbol -> time.monotonic() of its oldest pending tick
+        self._received: dict[str, float] = {}
+        self.ticks = 0
+        return
+
+    def add(self, symbol: str, fields: dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.ticks += 1
+            pending = self._pending.get(symbol)
+            if pending is None:
+                self._pending[symbol] = dict(fields)
+                self._received[symbol] = now
+            else:
+                pending.update(fields)
+        return
+
+    def drain(self) -> tuple[dict[str, dict[str, Any]], dict[str, float]]:
+        """
+        The merged ticks and when the oldest of each arrived, since the last drain
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            received, self._received = self._received, {}
+        return pending, received
+
+
+class LiveFeed:
+    """
+    Streaming subscription to the symbols, feeding a TickCoalescer
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        coalescer: TickCoalescer,
+        url: str = YAHOO_STREAMER_URL,
+        heartbeat: float = HEARTBEAT_INTERVAL,
+    ) -> None:
+        self.symbols = sorted(symbols)
+        self.coalescer = coalescer
+        self.url = url
+        self.heartbeat = heartbeat
+        self._ws: Any = None
+        self._stopped = threading.Event()
+        return
+
+    def handle(self, message: dict[str, Any]) -> None:
+        """
+        Called by the websocket client for each decoded message
+        """
+        tick = tick_fields(message)
+        if tick is not None:
+            self.coalescer.add(*tick)
+        return
+
+    def _renew(self) -> None:
+        while not self._stopped.wait(self.heartbeat):
+            try:
+                # re-sends all the subscriptions
+                self._ws.subscribe([])
+            except Exception as err:
+                log.warning('Failed to renew the live subscription: %s', err)
+                return
+        return
+
+    def run(self, on_connected: Callable[[], None] | None = None) -> None:
+        """
+        Stream until the connection is lost or stop() is called, blocks.
+        Raises the error the connection was lost with, if any.
+        """
+        import yfinance as yf
+
+        self._ws = yf.WebSocket(url=self.url, verbose=False)
+        try:
+            self._ws.subscribe(self.symbols)
+            if on_connected is not None:
+                on_connected()
+            threading.Thread(target=self._renew, daemon=True).start()
+            # returns once the connection is lost, yfinance logs why
+            self._ws.listen(self.handle)
+        except Exception:
+            if not self._stopped.is_set():
+                raise
+        finally:
+            lost = not self._stopped.is_set()
+            self._stopped.set()
+            self._ws.close()
+        if lost:
+            msg = 'live feed disconnected'
+            raise ConnectionError(msg)
+        return
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
+        return
@@ -1,35 +1,159 @@
-import logging
+"""
+Logging to a rotating file, written by a background thread.
+
+The loggers only put the records on a queue, a QueueListener thread writes
+them out, so logging does not block the UI thread on file I/O.  The root
+level is INFO unless configured otherwise: debug calls cost a cached level
+check unless asked for.  Only main() configures logging, importing a module
+neither starts the thread nor opens the file.
+"""
 
-# import logging.config
+import atexit
+import logging
+import logging.handlers
+import queue
 import sys
+from pathlib import Path
 from typing import Any
 
+LOG_FILE = 'main.log'
+# rotate the log file once it grows past this size, in bytes
+LOG_MAX_BYTES = 10 * 1024 * 1024
+# rotated log files kept
+LOG_BACKUPS = 3
+# TimedRotatingFileHandler `when` values
+LOG_ROTATE_WHEN = ('s', 'm', 'h', 'd', 'midnight')
+
 
 def eprint(*args: Any) -> None:
     print(*args, file=sys.stderr)
 
+
 log_levels = {
     'markdown_it': logging.WARNING,
     #'pytickrs': logging.INFO,
     'yfinance': logging.WARNING,
 }
 
+# the background writer, once logging is configured
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.handlers.QueueHandler | None = None
+
+
+def parse_log_levels(arg: str) -> dict[str, int]:
+    """
+    Parse `LEVEL` or `LOGGER=LEVEL` pairs separated by commas,
+    e.g. `DEBUG,yfinance=INFO`.  A bare level is for the root logger,
+    the returned dict has it under ''.  Raises ValueError.
+    """
+    levels: dict[str, int] = {}
+    for item in arg.split(','):
+        name, _, level_name = item.strip().rpartition('=')
+        level = logging.getLevelNamesMapping().get(level_name.strip().upper())
+        if level is None:
+            msg = f'unknown log level {level_name!r} in {item!r}'
+            raise ValueError(msg)
+        levels[name.strip()] = level
+    return levels
+
+
+def parse_log_rotation(arg: str) -> int | str:
+    """
+    Parse a size in bytes with an optional k, M or G suffix, e.g. 10M,
+    or a time interval: s, m, h, d or midnight.  Raises ValueError.
+    """
+    when = arg.strip().lower()
+    if when in LOG_ROTATE_WHEN:
+        return when
+    multipliers = {'k': 1024, 'm': 1024**2, 'g': 1024**3}
+    multiplier = multipliers.get(when[-1:], 1)
+    if multiplier != 1:
+        when = when[:-1]
+    size = int(when) * multiplier
+    if size < 0:
+        msg = f'negative log size {arg!r}'
+        raise ValueError(msg)
+    return size
+
+
+def _file_handler(
+    path: str | Path, rotation: int | str, backups: int
+) -> logging.Handler:
+    """
+    Handler appending to path, rotated by size in bytes or by time
+    """
+    handler: logging.Handler
+    if isinstance(rotation, str):
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=rotation, backupCount=backups, encoding='utf-8', delay=True
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=rotation, backupCount=backups, encoding='utf-8', delay=True
+        )
+    handler.setFormatter(
+        logging.Formatter(
+            '{asctime} {name} {levelname} {message}', datefmt='%H:%M:%S', style='{'
+        )
+    )
+    return handler
+
+
+def configure_logging(
+    path: str | Path = LOG_FILE,
+    levels: dict[str, int] | None = None,
+    rotation: int | str = LOG_MAX_BYTES,
+    backups: int = LOG_BACKUPS,
+) -> None:
+    """
+    Send the records of all the loggers through a queue to a rotating file.
+    levels: logger name -> level, '' for the root logger, INFO by default.
+    rotation: maximum size in bytes, or a time interval as in LOG_ROTATE_WHEN.
+    Replaces the previous configuration, if any.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for lname, llevel in (log_levels | (levels or {})).items():
+        logging.getLogger(lname or None).setLevel(llevel)
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    root.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(
+        records, _file_handler(path, rotation, backups), respect_handler_level=True
+    )
+    _listener.start()
+    return
+
+
+def stop_logging() -> None:
+    """
+    Write out the queued records and stop the background writer
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    return
+
+
+atexit.register(stop_logging)
+
+
 def setup_logging(
     logger_name: str | None,
     level: int = logging.NOTSET,
 ) -> logging.Logger:
     """
-    Setup the logger `logger_name`
+    Setup the logger `logger_name`, see configure_logging for where
+    the records go
     """
-    logging.basicConfig(
-        filename='main.log',
-        encoding='utf-8',
-        filemode='a',  # 'w'
-        datefmt='%H:%M:%S',
-        format='{asctime} {name} {levelname} {message}',
-        style='{',
-        level=level,
-    )
     logger = logging.getLogger(logger_name)
     if level != logging.NOTSET:
         logger.setLevel(level)
@@ -37,8 +161,4 @@ def setup_logging(
     assert logger is not None
     # print('setup_logging() =>', logger)
     # print_logging_tree()
-
-    for lname, llevel in log_levels.items():
-        logging.getLogger(lname).setLevel(llevel)
-
     return logger
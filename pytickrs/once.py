@@ -1,62 +1,337 @@
-import yfinance as yf
+import csv
+import json
+import sys
+import time
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any, TextIO
+
 from tabulate import tabulate
 
+from .alerts import AlertEngine
 from .log import eprint, setup_logging
-from .tickers import analyze_ticker, headers
+from .providers import QuoteProvider
+from .schedule import RefreshScheduler
+from .tickers import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PROXIMITY_PERCENT,
+    DEFAULT_TIMEOUT,
+    FetchResult,
+    analyze_ticker,
+    analyze_tickers,
+    fetch_quotes,
+    header2ticker_info,
+    indicator_header2ticker_info,
+    iter_quotes,
+    table_headers,
+)
+from .timing import span
 
 log = setup_logging(__name__)
 
+# prints a single fetched ticker with its recommendations
+Writer = Callable[[FetchResult, list[str]], None]
+
 
 epilog = """Examples:
     $ fin-cli min-max --help
 """
 
 
-def process_tickers(tickers: set[str]) -> None:
-    """
-    Process tickers
-    """
-    tkrs = yf.Tickers(list(tickers))
-    tkrs.history(period='1d', repair=True, progress=False)
-
-    # Define the headers for the table
-
-    table_data = []
-    for ticker in tkrs.tickers.values():
-        info = ticker.info
-        # print(info)
-        table_data.append(
-            [
-                ticker.ticker,
-                info.get('fiftyTwoWeekLow'),
-                info.get('dayLow'),
-                # the highest price a buyer is ready to pay
-                info.get('bid'),
-                info.get('currentPrice'),
-                # the lowest price a seller is ready to accept
-                info.get('ask'),
-                info.get('dayHigh'),
-                info.get('fiftyTwoWeekHigh'),
-                info.get('regularMarketChange'),
-                info.get('regularMarketChangePercent'),
-                '; '.join(analyze_ticker(ticker)),
-            ]
+def result_thoughts(result: FetchResult, proximity: float) -> list[str]:
+    """
+    Recommendations for the fetched ticker
+    """
+    if not result.ok:
+        log.warning('Failed to fetch %s: %s', result.symbol, result.error)
+        return [f'error: {result.error}']
+    with span('analyze', result.symbol):
+        return analyze_ticker(result.info, proximity)
+
+
+def batch_thoughts(results: list[FetchResult], proximity: float) -> list[list[str]]:
+    """
+    Recommendations for all the fetched tickers in a single pass
+    """
+    ok = [result.info for result in results if result.ok]
+    with span('analyze'):
+        analyzed = iter(analyze_tickers(ok, proximity))
+    thoughts = []
+    for result in results:
+        if result.ok:
+            thoughts.append(next(analyzed))
+        else:
+            log.warning('Failed to fetch %s: %s', result.symbol, result.error)
+            thoughts.append([f'error: {result.error}'])
+    return thoughts
+
+
+def add_indicators(provider: QuoteProvider, results: list[FetchResult]) -> None:
+    """
+    Add the indicators computed from the local price history to the info
+    """
+    if provider.history_store is None:
+        return
+    from .indicators import merge_indicators
+
+    with span('indicators'):
+        merge_indicators(
+            provider.history_store, {r.symbol: r.info for r in results if r.ok}
         )
+    return
+
+
+def result_row(
+    result: FetchResult, thoughts: list[str], extra: Sequence[str] = ()
+) -> list[Any]:
+    """
+    Table or CSV row for the fetched ticker, columns as in `table_headers`,
+    `extra` are the info fields of the indicator columns, if any
+    """
+    info = result.info
+    return [
+        result.symbol,
+        info.get('fiftyTwoWeekLow'),
+        info.get('dayLow'),
+        # the highest price a buyer is ready to pay
+        info.get('bid'),
+        info.get('currentPrice'),
+        # the lowest price a seller is ready to accept
+        info.get('ask'),
+        info.get('dayHigh'),
+        info.get('fiftyTwoWeekHigh'),
+        info.get('regularMarketChange'),
+        info.get('regularMarketChangePercent'),
+        *(info.get(field) for field in extra),
+        '; '.join(thoughts),
+    ]
+
 
-    # sort by ticker
-    sorted_data = sorted(table_data, key=lambda x: x[0])
-    print(tabulate(sorted_data, headers=headers, tablefmt='simple'))
+def result_record(
+    result: FetchResult, thoughts: list[str], extra: Sequence[str] = ()
+) -> dict[str, Any]:
+    """
+    JSON record for the fetched ticker, keyed by the yfinance info field names
+    """
+    record: dict[str, Any] = {'symbol': result.symbol}
+    for field in (*header2ticker_info.values(), *extra):
+        record[field] = result.info.get(field)
+    if result.ok:
+        record['thoughts'] = thoughts
+    else:
+        record['error'] = result.error
+    return record
+
+
+def emit_alerts(
+    alerts: AlertEngine | None, results: Iterable[FetchResult], fmt: str
+) -> None:
+    """
+    Print the alerts fired by the results as JSON lines: to stdout with the
+    jsonl format, to stderr not to break up a table or CSV.
+    """
+    if alerts is None:
+        return
+    out = sys.stdout if fmt == 'jsonl' else sys.stderr
+    for result in results:
+        if not result.ok:
+            continue
+        for alert in alerts.update(result.symbol, result.info):
+            print(alert.to_json(), file=out, flush=True)
     return
 
 
-def run_once(log_level: int, tickers: set[str]) -> int:
+def make_writer(
+    fmt: str, flush: bool, indicators: bool, out: TextIO | None = None
+) -> Writer:
+    """
+    Returns a function printing a single result in the format `fmt`
+    to `out`, stdout by default.
+    """
+    if out is None:
+        out = sys.stdout
+    extra = tuple(indicator_header2ticker_info.values()) if indicators else ()
+    if fmt == 'csv':
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(table_headers(indicators))
+
+        def write_csv(result: FetchResult, thoughts: list[str]) -> None:
+            writer.writerow(result_row(result, thoughts, extra))
+            if flush:
+                out.flush()
+            return
+
+        return write_csv
+
+    assert fmt == 'jsonl'
+
+    def write_jsonl(result: FetchResult, thoughts: list[str]) -> None:
+        record = result_record(result, thoughts, extra)
+        print(json.dumps(record, default=str), file=out, flush=flush)
+        return
+
+    return write_jsonl
+
+
+def format_table(
+    results: list[FetchResult], thoughts: list[list[str]], indicators: bool
+) -> str:
+    """
+    The --once table of the results
+    """
+    extra = tuple(indicator_header2ticker_info.values()) if indicators else ()
+    with span('render'):
+        table_data = [
+            result_row(r, t, extra) for r, t in zip(results, thoughts, strict=True)
+        ]
+        table: str = tabulate(
+            table_data, headers=table_headers(indicators), tablefmt='simple'
+        )
+    return table
+
+
+def process_tickers(
+    tickers: set[str],
+    provider: QuoteProvider,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    fmt: str = 'table',
+    stream: bool = False,
+    proximity: float = DEFAULT_PROXIMITY_PERCENT,
+    write: Writer | None = None,
+    alerts: AlertEngine | None = None,
+) -> list[FetchResult]:
+    """
+    Process tickers, returns the fetch results.
+    stream: print each ticker as soon as it is fetched, in no particular order.
+    Otherwise print all of them sorted by ticker once fetched.
+    write: print the csv or jsonl rows with it, instead of a new writer.
+    alerts: print the alerts fired by the fetched tickers.
+    """
+    # sort by ticker, results come back in the same order
+    symbols = sorted(tickers)
+    indicators = provider.history_store is not None
+    if stream:
+        assert fmt != 'table'
+        if write is None:
+            write = make_writer(fmt, flush=True, indicators=indicators)
+        streamed = []
+        for result in iter_quotes(
+            symbols,
+            provider.get_info,
+            concurrency=concurrency,
+            timeout=timeout,
+            throttle=provider.throttle,
+        ):
+            add_indicators(provider, [result])
+            row_thoughts = result_thoughts(result, proximity)
+            with span('render', result.symbol):
+                write(result, row_thoughts)
+            emit_alerts(alerts, [result], fmt)
+            streamed.append(result)
+        return streamed
+
+    results = fetch_quotes(
+        symbols,
+        provider.get_info,
+        concurrency=concurrency,
+        timeout=timeout,
+        throttle=provider.throttle,
+    )
+    add_indicators(provider, results)
+    thoughts = batch_thoughts(results, proximity)
+    if fmt == 'table':
+        print(format_table(results, thoughts, indicators))
+        emit_alerts(alerts, results, fmt)
+        return results
+
+    if write is None:
+        write = make_writer(fmt, flush=False, indicators=indicators)
+    with span('render'):
+        for result, row_thoughts in zip(results, thoughts, strict=True):
+            write(result, row_thoughts)
+    emit_alerts(alerts, results, fmt)
+    return results
+
+
+def watch_tickers(
+    tickers: set[str],
+    provider: QuoteProvider,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    fmt: str = 'table',
+    stream: bool = False,
+    proximity: float = DEFAULT_PROXIMITY_PERCENT,
+    alerts: AlertEngine | None = None,
+) -> None:
+    """
+    Process the tickers as they come due, until interrupted.
+    A table is printed for each refresh, csv and jsonl rows are appended.
+    """
+    scheduler = RefreshScheduler()
+    scheduler.schedule_all(tickers)
+    write = None
+    if fmt != 'table':
+        indicators = provider.history_store is not None
+        write = make_writer(fmt, flush=True, indicators=indicators)
+    while True:
+        due = scheduler.pop_due()
+        if due:
+            log.debug('Refreshing %d due tickers', len(due))
+            results = process_tickers(
+                set(due),
+                provider,
+                concurrency,
+                timeout,
+                fmt,
+                stream,
+                proximity,
+                write,
+                alerts,
+            )
+            if fmt == 'table':
+                sys.stdout.flush()
+            for result in results:
+                scheduler.reschedule(result.symbol, result.info.get('marketState'))
+        next_due = scheduler.next_due()
+        if next_due is None:
+            eprint('No tickers left to refresh')
+            return
+        time.sleep(max(next_due - scheduler.clock(), 0.0))
+
+
+def run_once(
+    log_level: int,
+    tickers: set[str],
+    provider: QuoteProvider,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    fmt: str = 'table',
+    stream: bool = False,
+    proximity: float = DEFAULT_PROXIMITY_PERCENT,
+    watch: bool = False,
+    alerts: AlertEngine | None = None,
+) -> int:
     """
     Main entry point
     """
     log.setLevel(log_level)
 
     try:
-        process_tickers(tickers)
+        if watch:
+            watch_tickers(
+                tickers, provider, concurrency, timeout, fmt, stream, proximity, alerts
+            )
+        else:
+            process_tickers(
+                tickers,
+                provider,
+                concurrency,
+                timeout,
+                fmt,
+                stream,
+                proximity,
+                alerts=alerts,
+            )
         return 0
 
     except KeyboardInterrupt:
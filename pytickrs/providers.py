@@ -0,0 +1,288 @@
+"""
+Quote providers: where the ticker info and price history come from
+"""
+
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .timing import span
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    import pandas as pd
+
+    from .history import HistoryStore
+    from .throttle import Throttle
+
+INFO_SUFFIX = '.info.json'
+HISTORY_SUFFIX = '.history.csv'
+
+
+class QuoteProvider(ABC):
+    """
+    Source of the ticker info dicts and price history frames.
+    Implementations must be safe to call from multiple threads.
+    """
+
+    name = 'abstract'
+    # the local price history store kept up to date by this provider, if any
+    history_store: 'HistoryStore | None' = None
+    # the throttle of the online requests of this provider, if any
+    throttle: 'Throttle | None' = None
+    # (live, slow) TTLs of the on-disk cache in front of this provider, if any
+    cache_ttls: tuple[float, float] | None = None
+    # where the quotes come from: live, replay or record
+    kind = 'live'
+
+    @abstractmethod
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        """
+        Blocking fetch of the info for a single symbol
+        """
+
+    def get_live(self, symbol: str) -> dict[str, Any]:
+        """
+        Blocking fetch of the fast changing fields for a single symbol.
+        Providers without a cheaper endpoint return the whole info.
+        """
+        return self.get_info(symbol)
+
+    @abstractmethod
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        """
+        Blocking fetch of the price history for a single symbol,
+        `period` is ignored when `start` is given.
+        """
+
+    def cached_quotes(self, symbols: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """
+        Whatever is in the cache for `symbols`, regardless of age.
+        Wrappers pass this down, providers without a cache have nothing.
+        """
+        return {}
+
+
+class YFinanceProvider(QuoteProvider):
+    """
+    Live data from Yahoo Finance
+    """
+
+    name = 'yfinance'
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        import yfinance as yf
+
+        # the HTTP requests and the parsing of the responses
+        with span('yfinance', symbol):
+            info: dict[str, Any] = yf.Ticker(symbol).info
+        return info
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        df: pd.DataFrame
+        with span('yfinance.history', symbol):
+            if start is not None:
+                df = ticker.history(start=start, interval=interval, repair=True)
+            else:
+                df = ticker.history(period=period, interval=interval, repair=True)
+        return df
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Replay the info and history captured by RecordingProvider from `path`,
+    optionally with a synthetic per-request latency.  Useful for offline
+    and reproducible benchmarks.
+    """
+
+    name = 'replay'
+    kind = 'replay'
+
+    def __init__(
+        self, path: str | Path, latency: float = 0.0, jitter: float = 0.0
+    ) -> None:
+        self.path = Path(path)
+        if not self.path.is_dir():
+            raise FileNotFoundError(f"Replay directory '{path}' does not exist")
+        # seconds
+        self.latency = latency
+        self.jitter = jitter
+        return
+
+    def symbols(self) -> set[str]:
+        """
+        Symbols available for replay
+        """
+        return {
+            p.name.removesuffix(INFO_SUFFIX) for p in self.path.glob('*' + INFO_SUFFIX)
+        }
+
+    def _delay(self) -> None:
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        self._delay()
+        path = self.path / (symbol + INFO_SUFFIX)
+        try:
+            with path.open(encoding='utf-8') as f:
+                info: dict[str, Any] = json.load(f)
+        except FileNotFoundError:
+            raise LookupError(f'No recorded info for {symbol}') from None
+        return info
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        import pandas as pd
+
+        self._delay()
+        path = history_file(self.path, symbol, interval)
+        if not path.exists():
+            raise LookupError(f'No recorded {interval} history for {symbol}')
+        df = pd.read_csv(path, index_col=0, parse_dates=True)
+        if start is not None:
+            df = df[pd.to_datetime(df.index, utc=True) >= pd.Timestamp(start)]
+        return df
+
+
+class RecordingProvider(QuoteProvider):
+    """
+    Pass requests through to `provider`, save the responses to `path`
+    in the format understood by ReplayProvider.
+    """
+
+    def __init__(self, provider: QuoteProvider, path: str | Path) -> None:
+        self.provider = provider
+        self.name = f'{provider.name}+record'
+        self.throttle = provider.throttle
+        self.cache_ttls = provider.cache_ttls
+        self.kind = 'record'
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # serializes the read-modify-write of the history fixtures
+        self._history_lock = threading.Lock()
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        info = self.provider.get_info(symbol)
+        write_info(self.path, symbol, info)
+        return info
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        import pandas as pd
+
+        df = self.provider.get_history(symbol, period, interval, start)
+        path = history_file(self.path, symbol, interval)
+        with self._history_lock:
+            recorded = df
+            if start is not None and path.exists():
+                # an incremental fetch, keep the bars recorded before it
+                old = pd.read_csv(path, index_col=0, parse_dates=True)
+                old = old[pd.to_datetime(old.index, utc=True) < pd.Timestamp(start)]
+                recorded = pd.concat((old, df))
+            recorded.to_csv(path)
+        return df
+
+    def cached_quotes(self, symbols: Iterable[str]) -> dict[str, dict[str, Any]]:
+        return self.provider.cached_quotes(symbols)
+
+
+def history_file(path: Path, symbol: str, interval: str) -> Path:
+    """
+    The replay fixture of the `interval` bars of `symbol`
+    """
+    return path / f'{symbol}.{interval}{HISTORY_SUFFIX}'
+
+
+def write_info(path: Path, symbol: str, info: dict[str, Any]) -> None:
+    """
+    Save the info for `symbol` as a replay fixture
+    """
+    with (path / (symbol + INFO_SUFFIX)).open('w', encoding='utf-8') as f:
+        json.dump(info, f, default=str)
+    return
+
+
+def make_provider(
+    replay: str | None = None,
+    latency: float = 0.0,
+    record: str | None = None,
+    cache_ttls: tuple[float, float] | None = None,
+    history: bool = False,
+    throttle: 'Throttle | None' = None,
+) -> QuoteProvider:
+    """
+    Build the provider requested on the command line.
+    cache_ttls: (live, slow) TTLs of the on-disk cache, None to bypass it.
+    Replayed data is never cached.
+    history: keep the local price history store up to date.
+    throttle: of the online requests, replayed ones are not throttled.
+    """
+    provider: QuoteProvider
+    if replay:
+        provider = ReplayProvider(replay, latency)
+    else:
+        provider = _make_online_provider(record, cache_ttls, throttle)
+    if history:
+        from .history import HistoryProvider, HistoryStore
+
+        provider = HistoryProvider(provider, HistoryStore())
+    return provider
+
+
+def _make_online_provider(
+    record: str | None,
+    cache_ttls: tuple[float, float] | None,
+    throttle: 'Throttle | None' = None,
+) -> QuoteProvider:
+    provider: QuoteProvider = YFinanceProvider()
+    if throttle is not None:
+        from .throttle import ThrottledProvider
+
+        # cache hits are not throttled
+        provider = ThrottledProvider(provider, throttle)
+    if cache_ttls is not None:
+        from .cache import CachingProvider, QuoteCache
+
+        live_ttl, slow_ttl = cache_ttls
+        provider = CachingProvider(provider, QuoteCache(), live_ttl, slow_ttl)
+    if record:
+        # outside the cache, to record the cache hits too
+        provider = RecordingProvider(provider, record)
+    return provider
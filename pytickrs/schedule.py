@@ -0,0 +1,114 @@
+"""
+Refresh scheduling driven by the market state of each symbol.
+
+Every symbol has a next-due time in a heap, a tick pops only the symbols
+that are due.  The polling interval follows the `marketState` of the last
+info fetched: fast during the regular session, slower around it, and only
+checking for the next session once the market is closed.
+"""
+
+import heapq
+import time
+from collections.abc import Callable, Iterable
+
+#
+# yfinance marketState -> seconds between refreshes, None to stop refreshing
+#
+POLL_INTERVALS: dict[str, float | None] = {
+    'REGULAR': 60.0,
+    'PRE': 300.0,
+    'POST': 300.0,
+    'PREPRE': 900.0,
+    'POSTPOST': 900.0,
+    # a closed market opens again, be it the next day
+    'CLOSED': 900.0,
+}
+# seconds, unknown market state or failed fetch
+DEFAULT_POLL_INTERVAL = 300.0
+
+
+class RefreshScheduler:
+    """
+    Heap of (due time, symbol).  Rescheduling a symbol leaves its old entry
+    in the heap, stale entries are skipped when they surface.
+    """
+
+    def __init__(
+        self,
+        intervals: dict[str, float | None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.intervals = POLL_INTERVALS if intervals is None else intervals
+        self.clock = clock
+        self._heap: list[tuple[float, str]] = []
+        # symbol -> current due time
+        self._due: dict[str, float] = {}
+        return
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._due
+
+    def schedule(self, symbol: str, due: float | None = None) -> None:
+        """
+        Make symbol due at `due`, now by default
+        """
+        if due is None:
+            due = self.clock()
+        self._due[symbol] = due
+        heapq.heappush(self._heap, (due, symbol))
+        return
+
+    def schedule_all(self, symbols: Iterable[str]) -> None:
+        now = self.clock()
+        for symbol in symbols:
+            self.schedule(symbol, now)
+        return
+
+    def interval(self, market_state: str | None) -> float | None:
+        """
+        Seconds until the next refresh in market_state, None for no more
+        """
+        if market_state is None:
+            return DEFAULT_POLL_INTERVAL
+        return self.intervals.get(market_state, DEFAULT_POLL_INTERVAL)
+
+    def reschedule(self, symbol: str, market_state: str | None) -> None:
+        """
+        Schedule the next refresh of symbol just fetched in market_state
+        """
+        interval = self.interval(market_state)
+        if interval is None:
+            self._due.pop(symbol, None)
+            return
+        self.schedule(symbol, self.clock() + interval)
+        return
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return
+
+    def pop_due(self) -> list[str]:
+        """
+        Symbols due by now, they are not scheduled until rescheduled
+        """
+        now = self.clock()
+        due: list[str] = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, symbol = heapq.heappop(self._heap)
+            del self._due[symbol]
+            due.append(symbol)
+            self._drop_stale()
+        return due
+
+    def next_due(self) -> float | None:
+        """
+        Clock time the next symbol is due, None if nothing is scheduled
+        """
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
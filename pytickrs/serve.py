@@ -0,0 +1,272 @@
+"""
+The `pytickrs serve` daemon: keeps the quotes refreshed in memory and
+answers the --once clients on a Unix socket, see client.py for the protocol.
+
+A background thread refreshes the quotes as they come due, as --watch does.
+The tickers a client asks for and the daemon does not know yet are fetched
+then, and refreshed from then on if the fetch succeeded.
+"""
+
+import io
+import json
+import os
+import signal
+import socketserver
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .client import PROTOCOL, connect, default_socket_path
+from .log import eprint, setup_logging
+from .once import add_indicators, batch_thoughts, format_table, make_writer
+from .providers import QuoteProvider
+from .schedule import POLL_INTERVALS, RefreshScheduler
+from .tickers import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PROXIMITY_PERCENT,
+    DEFAULT_TIMEOUT,
+    FetchResult,
+    fetch_quotes,
+)
+
+log = setup_logging(__name__)
+
+# --once output formats the daemon answers with
+DAEMON_FORMATS = ('table', 'csv', 'jsonl')
+
+
+class QuoteDaemon:
+    """
+    The last quote of each symbol, refreshed as it comes due.
+    Safe to call from the request handler threads.
+    """
+
+    def __init__(
+        self,
+        provider: QuoteProvider,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        intervals: dict[str, float | None] = POLL_INTERVALS,
+    ) -> None:
+        self.provider = provider
+        self.concurrency = concurrency
+        self.timeout = timeout
+        # symbol -> last fetch result, a failed refresh keeps the last quote
+        self.results: dict[str, FetchResult] = {}
+        self.scheduler = RefreshScheduler(intervals)
+        # guards results and scheduler
+        self.lock = threading.Lock()
+        # set when the schedule changes, or to stop
+        self.wakeup = threading.Event()
+        self.stopped = False
+        return
+
+    def watch(self, symbols: Iterable[str]) -> None:
+        """
+        Refresh symbols from now on
+        """
+        with self.lock:
+            self.scheduler.schedule_all(symbols)
+        self.wakeup.set()
+        return
+
+    def fetch(self, symbols: list[str]) -> list[FetchResult]:
+        """
+        Fetch symbols, keep and reschedule those known or fetched
+        """
+        results = fetch_quotes(
+            symbols,
+            self.provider.get_info,
+            self.concurrency,
+            self.timeout,
+            self.provider.throttle,
+        )
+        add_indicators(self.provider, results)
+        with self.lock:
+            for result in results:
+                symbol = result.symbol
+                if result.ok:
+                    self.results[symbol] = result
+                elif symbol in self.results:
+                    log.warning('Failed to refresh %s: %s', symbol, result.error)
+                else:
+                    # a failed request does not add to the refreshes
+                    continue
+                self.scheduler.reschedule(symbol, result.info.get('marketState'))
+        self.wakeup.set()
+        return results
+
+    def quotes(self, symbols: list[str]) -> list[FetchResult]:
+        """
+        The results for symbols in the same order, fetching the unknown ones
+        """
+        with self.lock:
+            missing = [symbol for symbol in symbols if symbol not in self.results]
+        fetched = {}
+        if missing:
+            log.info('Fetching %d new tickers', len(missing))
+            fetched = {result.symbol: result for result in self.fetch(missing)}
+        with self.lock:
+            return [self.results.get(symbol) or fetched[symbol] for symbol in symbols]
+
+    def refresh(self) -> None:
+        """
+        Refresh the due symbols until stopped, run by the refresh thread
+        """
+        while not self.stopped:
+            with self.lock:
+                due = self.scheduler.pop_due()
+                next_due = self.scheduler.next_due()
+            if due:
+                log.debug('Refreshing %d due tickers', len(due))
+                self.fetch(due)
+                continue
+            delay = None
+            if next_due is not None:
+                delay = max(next_due - self.scheduler.clock(), 0.0)
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+        return
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.wakeup.set()
+        return
+
+    def answer(self, request: dict[str, Any]) -> tuple[dict[str, Any], str]:
+        """
+        Header and output for the client request.  Raises ValueError.
+        """
+        if request.get('protocol') != PROTOCOL:
+            msg = f'protocol {request.get("protocol")!r}, expected {PROTOCOL}'
+            raise ValueError(msg)
+        fmt = request['format']
+        if fmt not in DAEMON_FORMATS:
+            msg = f'unknown format {fmt!r}'
+            raise ValueError(msg)
+        proximity = float(request.get('proximity', DEFAULT_PROXIMITY_PERCENT))
+        refused = self.mismatch(request)
+        if refused is not None:
+            return {'refused': refused}, ''
+        symbols = sorted({str(symbol).upper() for symbol in request['tickers']})
+        results = self.quotes(symbols)
+        failed = [result.symbol for result in results if not result.ok]
+        return {'failed': failed}, render(
+            results, fmt, proximity, self.provider.history_store is not None
+        )
+
+    def mismatch(self, request: dict[str, Any]) -> str | None:
+        """
+        How the provider of the daemon differs from the one the client
+        would fetch with, None if it does not
+        """
+        kind = self.provider.kind
+        if request['kind'] != kind:
+            return f'{kind} quotes, asked for {request["kind"]}'
+        indicators = self.provider.history_store is not None
+        if bool(request['indicators']) != indicators:
+            return 'with --history' if indicators else 'without --history'
+        # without a cache the quotes are as fresh as the refreshes make them
+        cache_ttls = self.provider.cache_ttls
+        ttls = tuple(float(ttl) for ttl in request['ttls'])
+        if cache_ttls is not None and ttls != cache_ttls:
+            return f'cache TTLs {cache_ttls}, asked for {ttls}'
+        return None
+
+
+def render(
+    results: list[FetchResult], fmt: str, proximity: float, indicators: bool
+) -> str:
+    """
+    The results as --once prints them
+    """
+    thoughts = batch_thoughts(results, proximity)
+    if fmt == 'table':
+        return format_table(results, thoughts, indicators) + '\n'
+    out = io.StringIO()
+    write = make_writer(fmt, flush=False, indicators=indicators, out=out)
+    for result, row_thoughts in zip(results, thoughts, strict=True):
+        write(result, row_thoughts)
+    return out.getvalue()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers a single request per connection
+    """
+
+    server: 'DaemonServer'
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            # checking that the daemon is running
+            return
+        try:
+            header, output = self.server.daemon.answer(json.loads(line))
+        except (ValueError, KeyError, TypeError) as err:
+            log.warning('Bad request: %s', err)
+            header, output = {'error': f'bad request: {err}'}, ''
+        try:
+            self.wfile.write(json.dumps(header).encode() + b'\n')
+            self.wfile.write(output.encode())
+        except OSError as err:
+            log.info('The client is gone: %s', err)
+        return
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str | Path, daemon: QuoteDaemon) -> None:
+        self.daemon = daemon
+        super().__init__(str(path), RequestHandler)
+        return
+
+    def server_bind(self) -> None:
+        # the bind creates the socket, only the owner may connect from the start
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        return
+
+
+def serve(
+    path: str | Path | None,
+    tickers: set[str],
+    provider: QuoteProvider,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> int:
+    """
+    Main entry point, serve on path, or on the default socket, until
+    interrupted or terminated
+    """
+    path = default_socket_path() if path is None else Path(path)
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        eprint(f'A daemon already listens on {path}')
+        return 1
+    # left over by a daemon which did not exit cleanly
+    path.unlink(missing_ok=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    daemon = QuoteDaemon(provider, concurrency, timeout)
+    daemon.watch(tickers)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        with DaemonServer(path, daemon) as server:
+            # after the bind, the umask is process wide
+            threading.Thread(target=daemon.refresh, name='refresh', daemon=True).start()
+            eprint(f'Serving {len(tickers)} tickers on {path}')
+            server.serve_forever()
+    except KeyboardInterrupt:
+        eprint('Caught KeyboardInterrupt')
+    finally:
+        daemon.stop()
+        path.unlink(missing_ok=True)
+    return 0
@@ -0,0 +1,103 @@
+"""
+Vectorized recommendations for the whole universe of tickers at once.
+
+The info fields are gathered into NumPy columns, missing values become NaN
+and drop out of every comparison.
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+from .tickers import RSI_OVERBOUGHT, RSI_OVERSOLD, analysis_fields
+
+# info fields the signals are computed from
+SIGNAL_FIELDS = analysis_fields
+
+#
+# Signal name -> recommendation text, in the order they are reported
+#
+SIGNALS = {
+    'sell_high': 'sell, 1y high',
+    'sell_close': 'sell, close to high',
+    'buy_low': 'buy, 1y low',
+    'buy_close': 'buy, close to low',
+    'overbought': 'sell, overbought',
+    'oversold': 'buy, oversold',
+    'golden_cross': 'buy, golden cross',
+    'death_cross': 'sell, death cross',
+}
+
+
+def _number(val: Any) -> float:
+    if isinstance(val, int | float) and not isinstance(val, bool):
+        return float(val)
+    return np.nan
+
+
+def to_columns(infos: Sequence[dict[str, Any]]) -> dict[str, np.ndarray]:
+    """
+    Gather SIGNAL_FIELDS of infos into float64 columns, NaN for missing values
+    """
+    n = len(infos)
+    return {
+        field: np.fromiter(
+            (_number(info.get(field)) for info in infos), dtype=np.float64, count=n
+        )
+        for field in SIGNAL_FIELDS
+    }
+
+
+def compute_signals(
+    cols: dict[str, np.ndarray], proximity_percent: float
+) -> dict[str, np.ndarray]:
+    """
+    Compute the boolean signal columns named as in SIGNALS
+    """
+    low = cols['fiftyTwoWeekLow']
+    high = cols['fiftyTwoWeekHigh']
+    # no quote is often reported as 0
+    bid = np.where(cols['bid'] > 0, cols['bid'], np.nan)
+    ask = np.where(cols['ask'] > 0, cols['ask'], np.nan)
+    yearly_range = high - low
+    margin = yearly_range * proximity_percent / 100
+    valid = yearly_range > 0
+
+    sell_high = valid & ((cols['dayHigh'] == high) | (bid > high))
+    buy_low = valid & ((cols['dayLow'] == low) | (ask < low))
+    return {
+        'sell_high': sell_high,
+        'sell_close': valid & ~sell_high & (bid > high - margin),
+        'buy_low': buy_low,
+        'buy_close': valid & ~buy_low & (ask < low + margin),
+        'overbought': cols['rsi14'] > RSI_OVERBOUGHT,
+        'oversold': cols['rsi14'] < RSI_OVERSOLD,
+        'golden_cross': cols['smaCross'] > 0,
+        'death_cross': cols['smaCross'] < 0,
+    }
+
+
+def column_recommendations(
+    cols: dict[str, Any], n: int, proximity_percent: float
+) -> list[list[str]]:
+    """
+    Recommendations for each of the n rows of the SIGNAL_FIELDS columns
+    """
+    arrays = {field: np.asarray(col, dtype=np.float64) for field, col in cols.items()}
+    with np.errstate(invalid='ignore'):
+        signals = compute_signals(arrays, proximity_percent)
+    result: list[list[str]] = [[] for _ in range(n)]
+    for name, text in SIGNALS.items():
+        for i in np.flatnonzero(signals[name]):
+            result[i].append(text)
+    return result
+
+
+def recommendations(
+    infos: Sequence[dict[str, Any]], proximity_percent: float
+) -> list[list[str]]:
+    """
+    Recommendations for each of infos
+    """
+    return column_recommendations(to_columns(infos), len(infos), proximity_percent)
@@ -0,0 +1,149 @@
+"""
+Warm-start snapshots of the TUI session.
+
+The quote store is saved as it is kept in memory: the float64 columns as
+their raw bytes, the symbols, the other info fields and the rendered details
+with marshal, the whole compressed with zlib.  Loading it back is a few
+copies of buffers, milliseconds for 10k symbols, so the table is shown from
+the last session while the quotes are refreshed.
+"""
+
+import marshal
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+from .cache import user_cache_dir
+from .log import setup_logging
+from .tickers import QuoteStore, quote_fields
+
+log = setup_logging(__name__)
+
+SNAPSHOT_FILE = 'session.snapshot'
+MAGIC = b'PTKS'
+# bump on any change of the payload
+SNAPSHOT_VERSION = 1
+# magic, snapshot version, marshal version
+_HEADER = struct.Struct('<4sHH')
+# fast rather than small, the columns do not compress much anyway
+COMPRESS_LEVEL = 1
+
+
+def default_snapshot_path() -> Path:
+    return user_cache_dir() / SNAPSHOT_FILE
+
+
+class Snapshot:
+    """
+    The quotes of a session, the rendered details and when they were saved
+    """
+
+    __slots__ = ('details', 'quotes', 'saved')
+
+    def __init__(
+        self, quotes: QuoteStore, details: dict[str, str], saved: float
+    ) -> None:
+        self.quotes = quotes
+        # symbol -> rendered details markdown
+        self.details = details
+        # time.time()
+        self.saved = saved
+        return
+
+    def __repr__(self) -> str:
+        return f'Snapshot({len(self.quotes)} quotes, {len(self.details)} details)'
+
+
+def dump_snapshot(
+    quotes: QuoteStore, details: dict[str, str], saved: float | None = None
+) -> bytes:
+    """
+    The binary snapshot of the quotes and details.  Raises ValueError if an
+    info value is not one of the types marshal supports.
+    """
+    fields = list(quotes.columns)
+    payload = (
+        time.time() if saved is None else saved,
+        sys.byteorder,
+        quotes.symbols,
+        fields,
+        [quotes.columns[field].tobytes() for field in fields],
+        quotes.details,
+        details,
+    )
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, marshal.version)
+    return header + zlib.compress(marshal.dumps(payload), COMPRESS_LEVEL)
+
+
+def parse_snapshot(data: bytes) -> Snapshot:
+    """
+    The snapshot dumped as data.  Raises ValueError if it is not a snapshot
+    of this version, of the current quote fields, for this machine.
+    """
+    if len(data) < _HEADER.size:
+        msg = 'truncated snapshot'
+        raise ValueError(msg)
+    magic, version, marshal_version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        msg = 'not a snapshot'
+        raise ValueError(msg)
+    if (version, marshal_version) != (SNAPSHOT_VERSION, marshal.version):
+        msg = f'snapshot version {version}.{marshal_version}'
+        raise ValueError(msg)
+    try:
+        # a file of the user's own cache directory, written by save_snapshot
+        # and of a checked version, not data from elsewhere
+        payload = marshal.loads(zlib.decompress(data[_HEADER.size :]))  # noqa: S302
+        saved, byteorder, symbols, fields, columns, infos, details = payload
+    except (zlib.error, EOFError, TypeError) as err:
+        msg = f'corrupt snapshot: {err}'
+        raise ValueError(msg) from None
+    if byteorder != sys.byteorder or tuple(fields) != quote_fields:
+        msg = 'snapshot of other quote fields or of another machine'
+        raise ValueError(msg)
+    quotes = QuoteStore(fields)
+    for field, column in zip(fields, columns, strict=True):
+        quotes.columns[field].frombytes(column)
+    quotes.symbols = [sys.intern(symbol) for symbol in symbols]
+    quotes.index = {symbol: i for i, symbol in enumerate(quotes.symbols)}
+    quotes.details = infos
+    if any(len(column) != len(symbols) for column in quotes.columns.values()):
+        msg = 'corrupt snapshot: columns of different lengths'
+        raise ValueError(msg)
+    return Snapshot(quotes, details, saved)
+
+
+def save_snapshot(
+    path: str | Path, quotes: QuoteStore, details: dict[str, str]
+) -> None:
+    """
+    Replace the snapshot at path, never leaving a partial one
+    """
+    path = Path(path)
+    data = dump_snapshot(quotes, details)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+    log.debug('Saved %d quotes, %d bytes to %s', len(quotes), len(data), path)
+    return
+
+
+def load_snapshot(path: str | Path) -> Snapshot | None:
+    """
+    The snapshot at path, None if there is none or it cannot be used
+    """
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as err:
+        log.warning('Cannot read the snapshot %s: %s', path, err)
+        return None
+    try:
+        return parse_snapshot(data)
+    except ValueError as err:
+        log.warning('Ignoring the snapshot %s: %s', path, err)
+        return None
@@ -0,0 +1,500 @@
+"""
+Throttling of the requests to the quote hosts, for large watchlists.
+
+Yahoo Finance answers too many requests with HTTP 429, or with an info
+missing all but a field or two.  The requests to a host are spaced by a token
+bucket, and a circuit breaker stops sending any while the host keeps refusing
+them.  The symbols are fetched in chunks; those which failed for one of these
+reasons are fetched again once all of the chunks are done, after an
+exponential backoff with jitter, rather than holding up the rest.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from .defaults import DEFAULT_RATE_LIMIT, DEFAULT_RETRIES
+from .log import setup_logging
+from .providers import QuoteProvider
+from .tickers import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, FetchResult, iter_quotes
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    import pandas as pd
+
+log = setup_logging(__name__)
+
+T = TypeVar('T')
+
+YAHOO_HOST = 'query2.finance.yahoo.com'
+HTTP_TOO_MANY_REQUESTS = 429
+# requests sent at once after a pause, see DEFAULT_RATE_LIMIT for the rate
+DEFAULT_BURST = 20
+# seconds, retry n waits between half and all of min(max, base * 2**n)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# consecutive refused requests opening the breaker, seconds it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+# symbols fetched on a thread pool of their own, before the next ones
+DEFAULT_CHUNK_SIZE = 200
+# seconds, how often a backoff checks whether it is cancelled
+_WAIT_SLICE = 0.1
+
+
+class RetryableError(Exception):
+    """
+    A request failed for a reason which may be gone on a later retry
+    """
+
+
+class RateLimitedError(RetryableError):
+    pass
+
+
+class EmptyInfoError(RetryableError):
+    pass
+
+
+class CircuitOpenError(RetryableError):
+    pass
+
+
+def is_rate_limited(err: BaseException) -> bool:
+    """
+    Whether err is an HTTP 429, from yfinance, urllib or requests
+    """
+    if isinstance(err, RateLimitedError) or type(err).__name__ == 'YFRateLimitError':
+        return True
+    status = getattr(err, 'code', None)
+    if status is None:
+        status = getattr(getattr(err, 'response', None), 'status_code', None)
+    return status == HTTP_TOO_MANY_REQUESTS
+
+
+def is_retryable(err: BaseException) -> bool:
+    """
+    Whether the request failing with err is worth retrying: throttled,
+    refused or a network error
+    """
+    return isinstance(err, RetryableError | OSError) or is_rate_limited(err)
+
+
+class TokenBucket:
+    """
+    Up to `burst` tokens, refilled at `rate` per second.  Every request takes
+    one, waiting for it if there is none left.  The tokens are handed out in
+    the order asked for, a waiting request has already reserved its own.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = DEFAULT_BURST,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        # negative when requests are waiting
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+        return
+
+    def acquire(self) -> float:
+        """
+        Take a token, returns the seconds waited for it
+        """
+        with self.lock:
+            now = self.clock()
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """
+    Closed, requests go through.  Open after `threshold` consecutive
+    failures, requests are refused for `cooldown` seconds.  Half open then,
+    requests go through again: the first failure opens it again, the first
+    success closes it.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        # clock() when it opened, None if closed
+        self.opened: float | None = None
+        self.lock = threading.Lock()
+        return
+
+    def __repr__(self) -> str:
+        return f'CircuitBreaker({self.host!r}, {self.state})'
+
+    @property
+    def state(self) -> str:
+        if self.opened is None:
+            return 'closed'
+        return 'open' if self.remaining() > 0 else 'half-open'
+
+    def remaining(self) -> float:
+        """
+        Seconds until it is half open, 0 unless open
+        """
+        opened = self.opened
+        if opened is None:
+            return 0.0
+        return max(opened + self.cooldown - self.clock(), 0.0)
+
+    def allow(self) -> bool:
+        return self.remaining() <= 0
+
+    def succeeded(self) -> None:
+        with self.lock:
+            if self.opened is not None:
+                log.info('%s answers again, closing the breaker', self.host)
+            self.failures = 0
+            self.opened = None
+        return
+
+    def failed(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.opened is not None or self.failures >= self.threshold:
+                if self.opened is None:
+                    log.warning(
+                        '%s refused %d requests in a row, pausing for %.0fs',
+                        self.host,
+                        self.failures,
+                        self.cooldown,
+                    )
+                self.opened = self.clock()
+        return
+
+
+class RequestStats:
+    """
+    Counters of the throttled requests, updated from the fetch threads:
+    requests sent, ok, failed, of these rate_limited and empty, refused by
+    an open breaker without sending them, and retried symbols
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.since = clock()
+        self.counts: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        return
+
+    def __getitem__(self, key: str) -> int:
+        return self.counts[key]
+
+    def add(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.counts[key] += n
+        return
+
+    def throughput(self) -> float:
+        """
+        Successful requests per second
+        """
+        elapsed = self.clock() - self.since
+        return self.counts['ok'] / elapsed if elapsed > 0 else 0.0
+
+    def error_rate(self) -> float:
+        """
+        Share of the requests sent which failed
+        """
+        requests = self.counts['requests']
+        return self.counts['failed'] / requests if requests else 0.0
+
+    def summary(self) -> str:
+        counts = self.counts
+        return (
+            f'{counts["requests"]} requests, {self.throughput():.1f}/s, '
+            f'{self.error_rate():.0%} failed, {counts["rate_limited"]} rate limited, '
+            f'{counts["refused"]} refused, {counts["retried"]} retried'
+        )
+
+
+class Throttle:
+    """
+    The request scheduler of a session: the rate limit, a circuit breaker
+    per host, the chunks, the retries and their counters.
+    rate: requests per second, 0 for no limit.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_LIMIT,
+        burst: int = DEFAULT_BURST,
+        retries: int = DEFAULT_RETRIES,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        backoff: tuple[float, float] = (BACKOFF_BASE, BACKOFF_MAX),
+        breaker: tuple[int, float] = (BREAKER_THRESHOLD, BREAKER_COOLDOWN),
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst, clock, sleep) if rate > 0 else None
+        self.retries = retries
+        self.chunk_size = max(1, chunk_size)
+        self.backoff_base, self.backoff_max = backoff
+        self.breaker_threshold, self.breaker_cooldown = breaker
+        self.clock = clock
+        self.sleep = sleep
+        # host -> its breaker
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+        # of the session, see iter_quotes for those of a single run
+        self.stats = RequestStats(clock)
+        # the stats of the run a fetch thread is working for
+        self._local = threading.local()
+        return
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    host, self.breaker_threshold, self.breaker_cooldown, self.clock
+                )
+                self.breakers[host] = breaker
+            return breaker
+
+    def call(self, host: str, request: Callable[[], T]) -> T:
+        """
+        Send request to host once the breaker and the rate limit allow.
+        Raises CircuitOpenError while the breaker is open, RateLimitedError
+        on HTTP 429, and whatever else request raises.
+        """
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            self._count('refused')
+            msg = f'{host} is refusing requests, retry in {breaker.remaining():.0f}s'
+            raise CircuitOpenError(msg)
+        if self.bucket is not None:
+            self.bucket.acquire()
+        self._count('requests')
+        try:
+            result = request()
+        except Exception as err:
+            self._count('failed')
+            if is_rate_limited(err):
+                self._count('rate_limited')
+                breaker.failed()
+                msg = f'{host}: too many requests'
+                raise RateLimitedError(msg) from err
+            if isinstance(err, EmptyInfoError):
+                # just as well an unknown symbol, the host is fine
+                self._count('empty')
+            elif isinstance(err, OSError):
+                breaker.failed()
+            raise
+        breaker.succeeded()
+        self._count('ok')
+        return result
+
+    def _count(self, key: str, n: int = 1) -> None:
+        """
+        Add to the session counters and to those of the run of this thread
+        """
+        self.stats.add(key, n)
+        run = getattr(self._local, 'stats', None)
+        if run is not None:
+            run.add(key, n)
+        return
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Seconds to wait before retry `attempt`, counted from 0
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2.0**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def refused_for(self) -> float:
+        """
+        Seconds until no breaker is open
+        """
+        with self.lock:
+            breakers = list(self.breakers.values())
+        return max((breaker.remaining() for breaker in breakers), default=0.0)
+
+    def wait(self, delay: float, cancelled: Callable[[], bool] | None) -> bool:
+        """
+        Sleep for delay seconds, returns False if cancelled meanwhile
+        """
+        end = self.clock() + delay
+        while (remaining := end - self.clock()) > 0:
+            if cancelled is not None and cancelled():
+                return False
+            self.sleep(min(remaining, _WAIT_SLICE))
+        return cancelled is None or not cancelled()
+
+    def iter_quotes(
+        self,
+        symbols: Iterable[str],
+        fetch: Callable[[str], dict[str, Any]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        cancelled: Callable[[], bool] | None = None,
+        stats: RequestStats | None = None,
+    ) -> Iterator[FetchResult]:
+        """
+        tickers.iter_quotes, `chunk_size` symbols at a time.  The symbols
+        which failed for a retryable reason are fetched again after all of
+        the others, up to `retries` times, and yielded once they are fetched
+        or out of retries.  Every symbol is yielded once, a request which
+        fails after it was reported as timed out is not retried.
+        stats: counters of the requests of this run only, logged at the end.
+        """
+        if stats is None:
+            stats = RequestStats(self.clock)
+        run = _Run(fetch, stats)
+        queue = list(symbols)
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            run.retry.clear()
+            for start in range(0, len(queue), self.chunk_size):
+                chunk = queue[start : start + self.chunk_size]
+                fetch_chunk = partial(self._fetch, run)
+                for result in iter_quotes(
+                    chunk, fetch_chunk, concurrency, timeout, cancelled
+                ):
+                    if run.done(result, last):
+                        yield result
+                if cancelled is not None and cancelled():
+                    return
+            queue = [symbol for symbol in queue if symbol in run.retry]
+            if last or not queue:
+                break
+            self.stats.add('retried', len(queue))
+            stats.add('retried', len(queue))
+            delay = max(self.backoff(attempt), self.refused_for())
+            log.info('Retrying %d tickers in %.1fs', len(queue), delay)
+            if not self.wait(delay, cancelled):
+                return
+        log.info('Requests: %s', stats.summary())
+        return
+
+    def _fetch(self, run: '_Run', symbol: str) -> dict[str, Any]:
+        """
+        run.fetch(symbol) on a fetch thread, counted in the stats of run,
+        marked for a retry if it failed for a retryable reason
+        """
+        self._local.stats = run.stats
+        try:
+            return run.fetch(symbol)
+        except Exception as err:
+            if is_retryable(err):
+                run.failed(symbol)
+            raise
+        finally:
+            self._local.stats = None
+
+
+class _Run:
+    """
+    State of a Throttle.iter_quotes call shared with its fetch threads
+    """
+
+    def __init__(
+        self, fetch: Callable[[str], dict[str, Any]], stats: RequestStats
+    ) -> None:
+        self.fetch = fetch
+        self.stats = stats
+        # symbols to fetch again in the next attempt
+        self.retry: set[str] = set()
+        self.yielded: set[str] = set()
+        self.lock = threading.Lock()
+        return
+
+    def failed(self, symbol: str) -> None:
+        with self.lock:
+            # a late failure of a request already reported as timed out
+            if symbol not in self.yielded:
+                self.retry.add(symbol)
+        return
+
+    def done(self, result: FetchResult, last: bool) -> bool:
+        """
+        Whether to yield result, false if the symbol is to be retried
+        """
+        with self.lock:
+            if result.symbol in self.yielded:
+                return False
+            if not (last or result.ok or result.symbol not in self.retry):
+                return False
+            self.yielded.add(result.symbol)
+            self.retry.discard(result.symbol)
+        return True
+
+
+class ThrottledProvider(QuoteProvider):
+    """
+    Pass the requests through to `provider` under `throttle`, as requests to
+    `host`.  An info without its symbol, what yfinance gets back when
+    throttled, is a failed request.
+    """
+
+    throttle: Throttle
+
+    def __init__(
+        self, provider: QuoteProvider, throttle: Throttle, host: str = YAHOO_HOST
+    ) -> None:
+        self.provider = provider
+        self.name = f'{provider.name}+throttle'
+        self.throttle = throttle
+        self.kind = provider.kind
+        self.host = host
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        return self.throttle.call(self.host, partial(self._get_info, symbol))
+
+    def _get_info(self, symbol: str) -> dict[str, Any]:
+        info = self.provider.get_info(symbol)
+        if not info or not info.get('symbol'):
+            msg = f'empty info for {symbol}'
+            raise EmptyInfoError(msg)
+        return info
+
+    def get_live(self, symbol: str) -> dict[str, Any]:
+        # an empty answer is handled by the cache, better stale than nothing
+        return self.throttle.call(self.host, partial(self.provider.get_live, symbol))
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: 'datetime | None' = None,
+    ) -> 'pd.DataFrame':
+        return self.throttle.call(
+            self.host,
+            partial(self.provider.get_history, symbol, period, interval, start),
+        )
+
+    def cached_quotes(self, symbols: Iterable[str]) -> dict[str, dict[str, Any]]:
+        return self.provider.cached_quotes(symbols)
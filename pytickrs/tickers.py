@@ -1,6 +1,28 @@
+import math
+import queue
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import yfinance as yf
+from .defaults import DEFAULT_CONCURRENCY, DEFAULT_PROXIMITY_PERCENT, DEFAULT_TIMEOUT
+from .timing import span
+
+if TYPE_CHECKING:
+    from .throttle import RequestStats, Throttle
+
+# relative strength index thresholds
+RSI_OVERBOUGHT = 70.0
+RSI_OVERSOLD = 30.0
+# analyze_tickers() batches at least this large are vectorized
+_VECTORIZE_MIN = 64
+
+# seconds, how often the collector checks for timed out requests
+_POLL_INTERVAL = 0.1
 
 headers = (
     'TIKR',
@@ -27,6 +49,42 @@ header2ticker_info = {
     'Change %': 'regularMarketChangePercent',
 }
 
+#
+# Extra columns shown when the price history is kept, see indicators.py
+#
+indicator_header2ticker_info = {
+    'RSI': 'rsi14',
+    'Vol %': 'volatility20',
+    'Z200': 'zScore200',
+}
+
+#
+# Info fields the recommendations are computed from
+#
+analysis_fields = (
+    'bid',
+    'ask',
+    'dayLow',
+    'dayHigh',
+    'fiftyTwoWeekLow',
+    'fiftyTwoWeekHigh',
+    'rsi14',
+    'smaCross',
+)
+
+#
+# Numeric info fields kept in the typed columns of QuoteStore
+#
+quote_fields = tuple(
+    dict.fromkeys(
+        (
+            *header2ticker_info.values(),
+            *indicator_header2ticker_info.values(),
+            *analysis_fields,
+        )
+    )
+)
+
 #
 # Ensure these are present to avoid issues with details display
 #
@@ -36,9 +94,19 @@ ticker_info_sanitize_keys = [
     'postMarketChangePercent',
     'targetMeanPrice',
     'trailingPE',
-    'epsTrailingTwelveMonths'
+    'epsTrailingTwelveMonths',
 ]
 
+
+def table_headers(indicators: bool = False) -> tuple[str, ...]:
+    """
+    Table headers, with the indicator columns before Thoughts if asked for
+    """
+    if not indicators:
+        return headers
+    return (*headers[:-1], *indicator_header2ticker_info, headers[-1])
+
+
 def load_tickers(fname: str) -> set[str]:
     """
     Load tickers from file fname
@@ -53,27 +121,482 @@ def load_tickers(fname: str) -> set[str]:
     return tickers
 
 
-def analyze_ticker(ticker: yf.Ticker) -> list[str]:
-    recommendations = []
-    high_low_proximity_percent = 20
-    info = ticker.info
-    fifty_two_week_high = info.get('fiftyTwoWeekHigh')
+def project_info(info: dict[str, Any], fields: Iterable[str]) -> dict[str, Any]:
+    """
+    Copy of info with only the fields, those missing in info stay missing
+    """
+    return {field: info[field] for field in fields if field in info}
+
+
+def _price(val: Any) -> float | None:
+    """
+    Numeric info value, None if missing
+    """
+    if isinstance(val, int | float) and not isinstance(val, bool):
+        val = float(val)
+        return None if math.isnan(val) else val
+    return None
+
+
+def _range_recommendations(
+    info: dict[str, Any], high_low_proximity_percent: float
+) -> list[str]:
+    """
+    Recommendations based on the proximity to the 52 week high or low
+    """
+    recommendations: list[str] = []
+    fifty_two_week_high = _price(info.get('fiftyTwoWeekHigh'))
+    fifty_two_week_low = _price(info.get('fiftyTwoWeekLow'))
+    if fifty_two_week_high is None or fifty_two_week_low is None:
+        return recommendations
+    yearly_range = fifty_two_week_high - fifty_two_week_low
+    if yearly_range <= 0:
+        return recommendations
     # currentPrice = info.get('currentPrice')
-    # the highest price a buyer is ready to pay
-    bid = info.get('bid')
+    # the highest price a buyer is ready to pay, no quote is often reported as 0
+    bid = _price(info.get('bid'))
+    if bid is not None and bid <= 0:
+        bid = None
     # the lowest price a seller is ready to accept
-    ask = info.get('ask')
-    fifty_two_week_low = info.get('fiftyTwoWeekLow')
-    dayLow = info.get('dayLow')
-    dayHigh = info.get('dayHigh')
-    yearly_range = fifty_two_week_high - fifty_two_week_low
-    assert yearly_range > 0
-    if dayHigh == fifty_two_week_high or bid > fifty_two_week_high:
+    ask = _price(info.get('ask'))
+    if ask is not None and ask <= 0:
+        ask = None
+    dayLow = _price(info.get('dayLow'))
+    dayHigh = _price(info.get('dayHigh'))
+    margin = yearly_range * high_low_proximity_percent / 100
+    if dayHigh == fifty_two_week_high or (
+        bid is not None and bid > fifty_two_week_high
+    ):
         recommendations.append('sell, 1y high')
-    elif bid > fifty_two_week_high - (yearly_range * high_low_proximity_percent / 100):
+    elif bid is not None and bid > fifty_two_week_high - margin:
         recommendations.append('sell, close to high')
-    if dayLow == fifty_two_week_low or ask < fifty_two_week_low:
+    if dayLow == fifty_two_week_low or (ask is not None and ask < fifty_two_week_low):
         recommendations.append('buy, 1y low')
-    elif ask < fifty_two_week_low + (yearly_range * high_low_proximity_percent / 100):
+    elif ask is not None and ask < fifty_two_week_low + margin:
         recommendations.append('buy, close to low')
     return recommendations
+
+
+def analyze_ticker(
+    info: dict[str, Any],
+    high_low_proximity_percent: float = DEFAULT_PROXIMITY_PERCENT,
+) -> list[str]:
+    """
+    Recommendations for a single ticker, see signals.compute_signals
+    for the vectorized version of the same.
+    """
+    recommendations = _range_recommendations(info, high_low_proximity_percent)
+    # indicators, if the price history is kept
+    rsi = _price(info.get('rsi14'))
+    if rsi is not None and rsi > RSI_OVERBOUGHT:
+        recommendations.append('sell, overbought')
+    if rsi is not None and rsi < RSI_OVERSOLD:
+        recommendations.append('buy, oversold')
+    sma_cross = _price(info.get('smaCross'))
+    if sma_cross is not None and sma_cross > 0:
+        recommendations.append('buy, golden cross')
+    if sma_cross is not None and sma_cross < 0:
+        recommendations.append('sell, death cross')
+    return recommendations
+
+
+def analyze_tickers(
+    infos: Sequence[dict[str, Any]],
+    high_low_proximity_percent: float = DEFAULT_PROXIMITY_PERCENT,
+) -> list[list[str]]:
+    """
+    Recommendations for each of infos.  Large batches are analyzed
+    in a single vectorized pass, small ones do not pay for importing NumPy.
+    """
+    if len(infos) < _VECTORIZE_MIN:
+        return [analyze_ticker(info, high_low_proximity_percent) for info in infos]
+
+    from .signals import recommendations
+
+    return recommendations(infos, high_low_proximity_percent)
+
+
+class QuoteStore:
+    """
+    Quotes of many tickers as a struct of arrays: one float64 column per
+    numeric field in `quote_fields`, NaN for missing values, a row per
+    interned symbol.  The other info fields, needed for the details only,
+    are kept in a dict per row.
+    """
+
+    __slots__ = ('columns', 'details', 'index', 'symbols')
+
+    def __init__(self, fields: Iterable[str] = quote_fields) -> None:
+        self.symbols: list[str] = []
+        # symbol -> row
+        self.index: dict[str, int] = {}
+        self.columns: dict[str, array[float]] = {field: array('d') for field in fields}
+        self.details: list[dict[str, Any]] = []
+        return
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self.index
+
+    def row(self, symbol: str) -> int:
+        """
+        Row of symbol, an empty one is added if it is not stored yet
+        """
+        i = self.index.get(symbol)
+        if i is not None:
+            return i
+        symbol = sys.intern(symbol)
+        i = len(self.symbols)
+        self.symbols.append(symbol)
+        self.index[symbol] = i
+        for column in self.columns.values():
+            column.append(float('nan'))
+        self.details.append({})
+        return i
+
+    def set(self, symbol: str, info: dict[str, Any], keep: Iterable[str] = ()) -> None:
+        """
+        Replace the quote of symbol with info, except for the fields in `keep`
+        info has no value for: their stored values are kept
+        """
+        kept: dict[str, Any] = {}
+        if symbol in self.index:
+            for field in keep:
+                value = self.get(symbol, field)
+                if value is not None and info.get(field) is None:
+                    kept[field] = value
+        i = self.row(symbol)
+        for field, column in self.columns.items():
+            value = _price(info.get(field))
+            column[i] = float('nan') if value is None else value
+        self.details[i] = {
+            sys.intern(k): v for k, v in info.items() if k not in self.columns
+        }
+        if kept:
+            self.update(symbol, kept)
+        return
+
+    def update(self, symbol: str, fields: dict[str, Any]) -> None:
+        """
+        Merge fields into the quote of symbol
+        """
+        i = self.row(symbol)
+        details = self.details[i]
+        for field, value in fields.items():
+            column = self.columns.get(field)
+            if column is None:
+                details[sys.intern(field)] = value
+                continue
+            number = _price(value)
+            column[i] = float('nan') if number is None else number
+        return
+
+    def get(self, symbol: str, field: str) -> Any:
+        """
+        Value of field for symbol, None if missing
+        """
+        i = self.index[symbol]
+        column = self.columns.get(field)
+        if column is None:
+            return self.details[i].get(field)
+        value = column[i]
+        return None if math.isnan(value) else value
+
+    def info(self, symbol: str) -> dict[str, Any]:
+        """
+        The info dict of symbol, rebuilt from the store
+        """
+        i = self.index[symbol]
+        info = dict(self.details[i])
+        for field, column in self.columns.items():
+            value = column[i]
+            if not math.isnan(value):
+                info[field] = value
+        return info
+
+    def _analysis_info(self, i: int) -> dict[str, float]:
+        return {field: self.columns[field][i] for field in analysis_fields}
+
+    def analyze_symbol(
+        self,
+        symbol: str,
+        high_low_proximity_percent: float = DEFAULT_PROXIMITY_PERCENT,
+    ) -> list[str]:
+        """
+        Recommendations for symbol
+        """
+        with span('analyze', symbol):
+            info = self._analysis_info(self.index[symbol])
+            return analyze_ticker(info, high_low_proximity_percent)
+
+    def analyze(
+        self, high_low_proximity_percent: float = DEFAULT_PROXIMITY_PERCENT
+    ) -> list[list[str]]:
+        """
+        Recommendations for each of the symbols, read straight from the columns
+        """
+        with span('analyze'):
+            if len(self) < _VECTORIZE_MIN:
+                return [
+                    analyze_ticker(self._analysis_info(i), high_low_proximity_percent)
+                    for i in range(len(self))
+                ]
+
+            from .signals import column_recommendations
+
+            return column_recommendations(
+                {f: self.columns[f] for f in analysis_fields},
+                len(self),
+                high_low_proximity_percent,
+            )
+
+
+# sort key of a missing value, after all the others
+_MISSING_KEY = (2, 0.0, '')
+
+
+def sort_key(value: Any) -> tuple[int, float, str]:
+    """
+    Typed sort key of a table value: numbers compare as numbers and come
+    before text, None, NaN and blank text sort last.
+    """
+    number = _price(value)
+    if number is not None:
+        return (0, number, '')
+    if isinstance(value, str) and value.strip() not in {'', '.'}:
+        return (1, 0.0, value.casefold())
+    return _MISSING_KEY
+
+
+class SortIndex:
+    """
+    Symbols sorted by the sort key of their value in a single column,
+    kept up to date one value at a time.
+    """
+
+    __slots__ = ('entries', 'keys')
+
+    def __init__(self) -> None:
+        # sorted (sort key, symbol)
+        self.entries: list[tuple[tuple[int, float, str], str]] = []
+        # symbol -> sort key
+        self.keys: dict[str, tuple[int, float, str]] = {}
+        return
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set(self, symbol: str, value: Any) -> None:
+        """
+        Move symbol to the place of its new value
+        """
+        key = sort_key(value)
+        old = self.keys.get(symbol)
+        if old == key:
+            return
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (old, symbol))]
+        insort(self.entries, (key, symbol))
+        self.keys[symbol] = key
+        return
+
+    def set_all(self, values: Iterable[tuple[str, Any]]) -> None:
+        """
+        Replace the index with the (symbol, value) pairs, sorted at once
+        """
+        self.keys = {symbol: sort_key(value) for symbol, value in values}
+        self.entries = sorted((key, symbol) for symbol, key in self.keys.items())
+        return
+
+    def ordered(self, reverse: bool = False) -> list[str]:
+        """
+        Symbols in the order of their values, the missing ones last either way
+        """
+        split = bisect_left(self.entries, (_MISSING_KEY, ''))
+        present = self.entries[:split]
+        if reverse:
+            present.reverse()
+        return [symbol for _, symbol in present] + [
+            symbol for _, symbol in self.entries[split:]
+        ]
+
+
+class FetchResult:
+    """
+    Outcome of fetching the info for a single ticker
+    """
+
+    __slots__ = ('elapsed', 'error', 'info', 'started', 'symbol')
+
+    def __init__(
+        self,
+        symbol: str,
+        info: dict[str, Any] | None = None,
+        error: str | None = None,
+        elapsed: float = 0.0,
+        started: float = 0.0,
+    ) -> None:
+        self.symbol = symbol
+        self.info: dict[str, Any] = info if info is not None else {}
+        self.error = error
+        # seconds spent in the request
+        self.elapsed = elapsed
+        # time.monotonic() when the request started, the newer of two quotes
+        # of a symbol is the one requested last
+        self.started = started
+        return
+
+    def __repr__(self) -> str:
+        return f'FetchResult({self.symbol!r}, error={self.error!r}, elapsed={self.elapsed:.3f})'
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def iter_quotes(
+    symbols: Iterable[str],
+    fetch: Callable[[str], dict[str, Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    cancelled: Callable[[], bool] | None = None,
+    throttle: 'Throttle | None' = None,
+    stats: 'RequestStats | None' = None,
+) -> Iterator[FetchResult]:
+    """
+    Fetch symbols on up to `concurrency` threads, yield results as they
+    complete.  `fetch` is a blocking call, e.g. QuoteProvider.get_info.
+    A request running longer than `timeout` seconds is reported as failed,
+    another thread takes over and the hung one exits once its request
+    returns; time spent waiting in the queue does not count against it.
+    The threads are daemon threads, a hung request does not keep the
+    process from exiting.
+    Once `cancelled()` is true no other request is started and nothing more
+    is yielded; the requests already running cannot be interrupted.
+    With a throttle, the symbols are fetched in chunks and the throttled
+    requests retried at the end, see Throttle.iter_quotes, `stats` counts
+    them for this call.
+    """
+    if throttle is not None:
+        yield from throttle.iter_quotes(
+            symbols, fetch, concurrency, timeout, cancelled, stats
+        )
+        return
+    todo: queue.SimpleQueue[str] = queue.SimpleQueue()
+    pending: set[str] = set()
+    for symbol in symbols:
+        todo.put(symbol)
+        pending.add(symbol)
+    results: queue.SimpleQueue[FetchResult] = queue.SimpleQueue()
+    # symbol -> time.monotonic() when its request started, while running
+    running: dict[str, float] = {}
+    lock = threading.Lock()
+    closed = threading.Event()
+
+    def stopped() -> bool:
+        return closed.is_set() or (cancelled is not None and cancelled())
+
+    def work() -> None:
+        while not stopped():
+            try:
+                symbol = todo.get_nowait()
+            except queue.Empty:
+                return
+            began = time.monotonic()
+            with lock:
+                running[symbol] = began
+            try:
+                with span('fetch', symbol):
+                    info = fetch(symbol)
+            except Exception as err:
+                result = FetchResult(
+                    symbol,
+                    error=str(err) or type(err).__name__,
+                    elapsed=time.monotonic() - began,
+                    started=began,
+                )
+            else:
+                result = FetchResult(
+                    symbol, info or {}, elapsed=time.monotonic() - began, started=began
+                )
+            with lock:
+                # reported as timed out, another thread took over the queue
+                retired = running.pop(symbol, None) is None
+            results.put(result)
+            if retired:
+                return
+        return
+
+    threads = 0
+
+    def start_thread() -> None:
+        nonlocal threads
+        # daemon threads, a hung request does not keep the process alive
+        name = f'fetch_{threads}'
+        threading.Thread(target=work, name=name, daemon=True).start()
+        threads += 1
+        return
+
+    try:
+        for _ in range(min(max(1, concurrency), len(pending))):
+            start_thread()
+        while pending and not stopped():
+            try:
+                result = results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                if stopped():
+                    return
+                # else reported as timed out already
+                if result.symbol in pending:
+                    pending.discard(result.symbol)
+                    yield result
+            now = time.monotonic()
+            with lock:
+                hung = [
+                    (symbol, start)
+                    for symbol, start in running.items()
+                    if now - start > timeout
+                ]
+                for symbol, _ in hung:
+                    del running[symbol]
+            for symbol, start in hung:
+                if stopped():
+                    return
+                # the thread can not be interrupted, stop waiting for it and
+                # let another one take over its share of the queue
+                pending.discard(symbol)
+                start_thread()
+                yield FetchResult(
+                    symbol,
+                    error=f'timed out after {timeout}s',
+                    elapsed=now - start,
+                    started=start,
+                )
+    finally:
+        # the requests still queued are dropped
+        closed.set()
+    return
+
+
+def fetch_quotes(
+    symbols: Iterable[str],
+    fetch: Callable[[str], dict[str, Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    throttle: 'Throttle | None' = None,
+) -> list[FetchResult]:
+    """
+    Fetch symbols concurrently, return the results in the order of `symbols`
+    """
+    ordered = list(symbols)
+    results = {
+        r.symbol: r
+        for r in iter_quotes(
+            ordered, fetch, concurrency=concurrency, timeout=timeout, throttle=throttle
+        )
+    }
+    return [results[symbol] for symbol in ordered]
@@ -0,0 +1,228 @@
+"""
+Timing spans around the phases of a refresh, recorded with `--profile`.
+
+Profiling is off unless `start_profiling()` is called: `span()` then
+returns a shared no-op context manager, so an instrumented phase costs a
+global lookup and a call.  Once on, every span is kept with its thread and
+symbol, and saved in the Chrome trace event format, for chrome://tracing
+or https://ui.perfetto.dev
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Any, Self
+
+# spans kept for the trace file, the oldest are dropped
+MAX_EVENTS = 200_000
+# durations kept per phase, for the percentiles
+MAX_DURATIONS = 10_000
+# milliseconds, upper bounds of the latency histogram buckets, the last is open
+HISTOGRAM_BOUNDS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# phases shown in the summary next to the fetch latency
+SUMMARY_PHASES = ('analyze', 'render', 'table')
+
+_NULL_SPAN = nullcontext()
+
+
+def format_seconds(seconds: float) -> str:
+    """
+    0.4ms, 120ms, 2.1s
+    """
+    if seconds < 0.01:
+        return f'{seconds * 1000:.1f}ms'
+    if seconds < 1:
+        return f'{seconds * 1000:.0f}ms'
+    return f'{seconds:.1f}s'
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest rank percentile of the sorted values, q in [0, 100]
+    """
+    assert values
+    rank = round(q / 100 * (len(values) - 1))
+    return values[rank]
+
+
+class Span:
+    """
+    Times a phase, recorded by the profiler on exit
+    """
+
+    __slots__ = ('name', 'profiler', 'start', 'symbol')
+
+    def __init__(self, profiler: 'Profiler', name: str, symbol: str | None) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.symbol = symbol
+        self.start = 0.0
+        return
+
+    def __enter__(self) -> Self:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.symbol)
+        return
+
+
+class Profiler:
+    """
+    Spans recorded from any thread
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.origin = time.perf_counter()
+        # (name, start, end, thread id, symbol)
+        self.events: deque[tuple[str, float, float, int, str | None]] = deque(
+            maxlen=MAX_EVENTS
+        )
+        # name -> the latest durations in seconds
+        self.durations: dict[str, deque[float]] = {}
+        # thread id -> name
+        self.threads: dict[int, str] = {}
+        # symbols seen in the spans
+        self.symbols: set[str] = set()
+        return
+
+    def span(self, name: str, symbol: str | None = None) -> Span:
+        return Span(self, name, symbol)
+
+    def record(
+        self, name: str, start: float, end: float, symbol: str | None = None
+    ) -> None:
+        """
+        Record a span, times from time.perf_counter()
+        """
+        thread = threading.current_thread()
+        tid = thread.ident or 0
+        with self._lock:
+            self.events.append((name, start, end, tid, symbol))
+            durations = self.durations.get(name)
+            if durations is None:
+                durations = self.durations[name] = deque(maxlen=MAX_DURATIONS)
+            durations.append(end - start)
+            if tid not in self.threads:
+                self.threads[tid] = thread.name
+            if symbol is not None:
+                self.symbols.add(symbol)
+        return
+
+    def sorted_durations(self, name: str) -> list[float]:
+        with self._lock:
+            return sorted(self.durations.get(name, ()))
+
+    def histogram(self, name: str) -> list[int]:
+        """
+        Count of the durations of name in each of the HISTOGRAM_BOUNDS buckets
+        """
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for duration in self.sorted_durations(name):
+            counts[bisect_left(HISTOGRAM_BOUNDS, duration * 1000)] += 1
+        return counts
+
+    def summary(self) -> str:
+        """
+        e.g. 400 tickers, p50 120ms, p99 2.1s, render 14ms
+        """
+        parts = [f'{len(self.symbols)} tickers']
+        fetch = self.sorted_durations('fetch')
+        if fetch:
+            parts.append(f'p50 {format_seconds(percentile(fetch, 50))}')
+            parts.append(f'p99 {format_seconds(percentile(fetch, 99))}')
+        for name in SUMMARY_PHASES:
+            durations = self.sorted_durations(name)
+            if durations:
+                parts.append(f'{name} {format_seconds(percentile(durations, 50))}')
+        return ', '.join(parts)
+
+    def trace(self) -> dict[str, Any]:
+        """
+        The spans as Chrome trace events, with the latency histograms
+        """
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+            names = list(self.durations)
+        trace_events: list[dict[str, Any]] = [
+            {
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': 1,
+                'tid': tid,
+                'args': {'name': name},
+            }
+            for tid, name in threads.items()
+        ]
+        for name, start, end, tid, symbol in events:
+            event: dict[str, Any] = {
+                'name': name,
+                'ph': 'X',
+                'pid': 1,
+                'tid': tid,
+                # microseconds
+                'ts': round((start - self.origin) * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+            }
+            if symbol is not None:
+                event['args'] = {'symbol': symbol}
+            trace_events.append(event)
+        histograms = {
+            name: {'bounds_ms': list(HISTOGRAM_BOUNDS), 'counts': self.histogram(name)}
+            for name in names
+        }
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'histograms': histograms,
+            'summary': self.summary(),
+        }
+
+    def save(self, path: str | Path) -> None:
+        with Path(path).open('w', encoding='utf-8') as f:
+            json.dump(self.trace(), f)
+        return
+
+
+_profiler: Profiler | None = None
+
+
+def start_profiling() -> Profiler:
+    """
+    Record the spans from now on
+    """
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def stop_profiling() -> Profiler | None:
+    """
+    Stop recording, returns the profiler that was recording, if any
+    """
+    global _profiler
+    stopped, _profiler = _profiler, None
+    return stopped
+
+
+def profiler() -> Profiler | None:
+    """
+    The profiler recording the spans, None if profiling is off
+    """
+    return _profiler
+
+
+def span(name: str, symbol: str | None = None) -> AbstractContextManager[Any]:
+    """
+    Context manager timing the phase `name`, of symbol if given
+    """
+    if _profiler is None:
+        return _NULL_SPAN
+    return Span(_profiler, name, symbol)
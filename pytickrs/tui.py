@@ -1,23 +1,64 @@
 import logging
-from typing import ClassVar
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar
 from datetime import datetime
 
-import yfinance as yf
-from jinja2 import Environment, FileSystemLoader, Template
+from jinja2 import Environment, FileSystemLoader, Template, meta
 from jinja2.exceptions import TemplateSyntaxError, UndefinedError
+from rich.text import Text
 from textual import work
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal
 from textual.message import Message
 from textual.widgets import DataTable, Footer, Header, Label, MarkdownViewer
-from textual.worker import Worker
+from textual.worker import Worker, get_current_worker
 
+from .alerts import ALERT_FIELDS, AlertEngine
+from .live import LiveFeed, TickCoalescer
 from .log import eprint, setup_logging
+from .providers import QuoteProvider
+from .schedule import RefreshScheduler
 from .split_pane import SplitContainer
-from .tickers import analyze_ticker, header2ticker_info, headers, ticker_info_sanitize_keys
+from .tickers import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PROXIMITY_PERCENT,
+    DEFAULT_TIMEOUT,
+    FetchResult,
+    QuoteStore,
+    SortIndex,
+    analysis_fields,
+    header2ticker_info,
+    headers,
+    indicator_header2ticker_info,
+    iter_quotes,
+    project_info,
+    table_headers,
+    ticker_info_sanitize_keys,
+)
+from .timing import profiler, span
+
+if TYPE_CHECKING:
+    from textual.timer import Timer
+
+    from .throttle import RequestStats
 
 log: logging.Logger | None = None
 
+# seconds the cursor has to rest on a row before its details are rendered
+DETAILS_DEBOUNCE = 0.1
+# rendered details kept for re-selecting a row
+DETAILS_CACHE_SIZE = 256
+# seconds, the table is refreshed at most once per frame
+FRAME_INTERVAL = 1 / 30
+# seconds between the checks for tickers due for a refresh, with --watch
+WATCH_TICK = 1.0
+# live ticks whose latency is kept, for the percentiles
+LIVE_LATENCIES = 10000
+# seconds between the saves of the session snapshot, if anything changed
+SNAPSHOT_INTERVAL = 60.0
+
 CSS = """
 Horizontal#footer-outer {
     height: 1;
@@ -40,10 +81,68 @@ class TaskCompleteMessage(Message):
     A message indicating the background task is complete.
     """
 
+    def __init__(
+        self,
+        indicators: dict[str, dict[str, float]] | None = None,
+        generation: int = 0,
+        stats: 'RequestStats | None' = None,
+    ) -> None:
+        super().__init__()
+        # symbol -> indicator fields computed from the local price history
+        self.indicators = indicators or {}
+        # the refresh which completed
+        self.generation = generation
+        # of the throttled requests of the refresh, if throttled
+        self.stats = stats
+        return
+
+
+class QuoteMessage(Message):
+    """
+    A message carrying the info fetched for a single ticker.
+    """
+
+    def __init__(
+        self, result: FetchResult, fetched: int, total: int, generation: int = 0
+    ) -> None:
+        super().__init__()
+        self.result = result
+        # progress of the background task
+        self.fetched = fetched
+        self.total = total
+        # the refresh which fetched it
+        self.generation = generation
+        return
+
+
+class DetailsMessage(Message):
+    """
+    A message carrying the details rendered in the background.
+    """
+
+    def __init__(self, symbol: str, version: int, markdown: str) -> None:
+        super().__init__()
+        self.symbol = symbol
+        # version of the info the markdown was rendered from
+        self.version = version
+        self.markdown = markdown
+        return
+
+
+class LiveFeedMessage(Message):
+    """
+    A message indicating the live feed is lost.
+    """
+
+    def __init__(self, error: str) -> None:
+        super().__init__()
+        self.error = error
+        return
+
 
 class TheApp(App):
     """
-    A simple Textual app using yfinance to retrieve and display stock data.
+    A simple Textual app using a QuoteProvider to retrieve and display stock data.
     1. Load tickers from a file
     2. Display tickers in a table
     3. Update ticker data on user command
@@ -51,7 +150,7 @@ class TheApp(App):
     5. Increase/decrease font size on user command
     6. Quit app on user command
     7. Log actions to a file
-    8. Use yfinance to fetch ticker data
+    8. Use yfinance (or replay recorded data) to fetch ticker data
     """
 
     TITLE = 'Stock Analyzer'
@@ -65,7 +164,20 @@ class TheApp(App):
         ('ctrl+minus', 'decrease_font_size', 'Decrease Font Size'),
     ]
 
-    def __init__(self, tickers: set[str], details_template: Template) -> None:
+    def __init__(
+        self,
+        tickers: set[str],
+        details_template: Template,
+        provider: QuoteProvider,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        proximity: float = DEFAULT_PROXIMITY_PERCENT,
+        details_fields: set[str] | None = None,
+        watch: bool = False,
+        live_url: str | None = None,
+        alerts: AlertEngine | None = None,
+        snapshot_path: str | Path | None = None,
+    ) -> None:
         super().__init__()
         self.column_index_selected = 0
         self.column_sort_reverse = False
@@ -73,6 +185,71 @@ class TheApp(App):
         assert self.tickers
         self.details_template = details_template
         assert self.details_template
+        self.provider = provider
+        self.fetch_failures = 0
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.proximity = proximity
+        # refresh the tickers as they come due, if watching
+        self.scheduler = RefreshScheduler() if watch else None
+        self.refreshing = False
+        # bumped by every refresh, the messages of a superseded one are stale
+        self.refresh_generation = 0
+        # symbol -> FetchResult.started of the quote shown
+        self.quote_started: dict[str, float] = {}
+        # stream the prices, if a streamer url is given
+        self.ticks = TickCoalescer()
+        self.live_feed = None
+        if live_url is not None:
+            self.live_feed = LiveFeed(tickers, self.ticks, live_url)
+        # seconds from the arrival of a tick to its row update
+        self.tick_latencies: deque[float] = deque(maxlen=LIVE_LATENCIES)
+        self.tick_rate_since = (time.monotonic(), 0)
+        # user defined price alerts, checked on every quote update
+        self.alerts = alerts
+        # show the indicator columns if the price history is kept
+        indicators = provider.history_store is not None
+        self.headers = table_headers(indicators)
+        # table header -> info field
+        self.header2ticker_info = header2ticker_info
+        # kept until the refresh completes and computes them again
+        self.indicator_fields: frozenset[str] = frozenset()
+        if indicators:
+            self.header2ticker_info = header2ticker_info | indicator_header2ticker_info
+            self.indicator_fields = frozenset(indicator_header2ticker_info.values())
+        # info fields kept for each ticker, all of them unless the fields
+        # referenced by the details template are known
+        self.fields: frozenset[str] | None = None
+        if details_fields is not None:
+            self.fields = frozenset(
+                (
+                    *details_fields,
+                    *self.header2ticker_info.values(),
+                    *analysis_fields,
+                    *ALERT_FIELDS,
+                    'longName',
+                    'marketState',
+                )
+            )
+        # symbol -> version of its info, bumped on every change
+        self.quote_versions: dict[str, int] = {}
+        # symbol -> (info version, rendered details), least recently used first
+        self.details_cache: OrderedDict[str, tuple[int, str]] = OrderedDict()
+        # the ticker whose details are wanted and the (symbol, version) shown
+        self.details_symbol: str | None = None
+        self.details_shown: tuple[str, int] | None = None
+        self.details_timer: Timer | None = None
+        # (symbol, header) -> value shown in the table, and the changes to show
+        self.cells: dict[tuple[str, str], Any] = {}
+        self.pending_cells: dict[tuple[str, str], Any] = {}
+        self.flush_timer: Timer | None = None
+        # header -> symbols sorted by the values shown
+        self.sort_indexes = {h: SortIndex() for h in self.headers}
+        # warm start from the snapshot of the last session, saved on exit
+        self.snapshot_path = snapshot_path
+        self.snapshot_dirty = False
+        # symbols shown from the snapshot, not refreshed yet
+        self.stale: set[str] = set()
         return
 
     def compose(self) -> ComposeResult:
@@ -81,7 +258,8 @@ class TheApp(App):
         """
         assert log is not None
         log.debug('compose %s', self)
-        self.tkrs: yf.Tickers | None = None
+        # ticker symbol -> yfinance info
+        self.quotes = QuoteStore()
         yield Header()
         yield SplitContainer(
             before=DataTable(cursor_type='row', zebra_stripes=True, id='tickers'),
@@ -104,10 +282,22 @@ class TheApp(App):
             for h in headers:
                 table.add_column(h, key=h)
 
-            # add rows and set row key
+            # add rows and set row key, with the values of the last session
+            columns: dict[str, list[tuple[str, Any]]] = {h: [] for h in headers}
             for row in rows:
-                r = [row if h == headers[0] else '.' for h in headers]
-                table.add_row(*r, key=row)
+                r = [
+                    row if h == headers[0] else self.cells.get((row, h), '.')
+                    for h in headers
+                ]
+                if row in self.stale:
+                    table.add_row(r[0], *map(stale_cell, r[1:]), key=row)
+                else:
+                    table.add_row(*r, key=row)
+                for h, value in zip(headers, r, strict=True):
+                    columns[h].append((row, value))
+            # sorted once per column rather than one row at a time
+            for h, values in columns.items():
+                self.sort_indexes[h].set_all(values)
             return
 
         self.tickers_table = self.query_one('#tickers', DataTable)
@@ -115,11 +305,128 @@ class TheApp(App):
         self.status = self.query_one('#status', Label)
         # self.footer_inner = self.query_one('#footer-inner')
         self.footer = self.query_one('#footer', Footer)
-        fill_table(self.tickers_table, list(headers), sorted(self.tickers))
+        # warm start from the last session
+        warm = self.load_snapshot()
+        with span('fill_table'):
+            fill_table(self.tickers_table, list(self.headers), sorted(self.tickers))
+
+        # cold start: show whatever was cached by the previous runs
+        if not warm:
+            cached = self.provider.cached_quotes(self.tickers)
+            for symbol, info in cached.items():
+                self.quotes.set(symbol, self.project(info))
+                self.bump_version(symbol)
+            if self.quotes:
+                self.update_table()
+                self.set_status(f'{len(self.quotes)} cached, press u to update')
 
         # adjust footer status styles
         self.status.styles.background = self.footer.styles.background
         self.status.styles.color = self.footer.styles.color
+
+        if self.scheduler is not None:
+            self.start_watch()
+        if self.live_feed is not None:
+            # the info not streamed, e.g. the 52 week range and the details
+            if self.scheduler is None:
+                self.update_tickers(self.tickers)
+            self.set_interval(FRAME_INTERVAL, self.apply_ticks)
+            self.run_live_feed()
+        elif self.stale and self.scheduler is None:
+            self.update_tickers(self.tickers)
+        if self.stale:
+            self.set_status(f'{len(self.stale)} from the last session, updating...')
+        if self.snapshot_path is not None:
+            self.set_interval(SNAPSHOT_INTERVAL, self.save_snapshot)
+        return
+
+    def on_unmount(self) -> None:
+        if self.live_feed is not None:
+            self.live_feed.stop()
+        self.save_snapshot()
+        return
+
+    def load_snapshot(self) -> bool:
+        """
+        Load the quotes, table cells and details of the last session, stale
+        until refreshed, before the table is filled.  Returns whether there
+        were any.
+        """
+        if self.snapshot_path is None:
+            return False
+        from .snapshot import load_snapshot
+
+        with span('warm_start'):
+            with span('snapshot'):
+                snapshot = load_snapshot(self.snapshot_path)
+            if snapshot is None or not snapshot.quotes:
+                return False
+            saved = snapshot.quotes
+            if all(symbol in self.tickers for symbol in saved.symbols):
+                self.quotes = saved
+            else:
+                for symbol in saved.symbols:
+                    if symbol in self.tickers:
+                        self.quotes.set(symbol, saved.info(symbol))
+            for symbol in self.quotes.symbols:
+                self.bump_version(symbol)
+            self.stale = set(self.quotes.symbols)
+            for symbol, markdown in snapshot.details.items():
+                if symbol in self.quotes:
+                    version = self.quote_versions[symbol]
+                    self.details_cache[symbol] = (version, markdown)
+            thoughts = self.quotes.analyze(self.proximity)
+            for symbol, row_thoughts in zip(self.quotes.symbols, thoughts, strict=True):
+                for header, value in self.row_cells(symbol, row_thoughts):
+                    self.cells[symbol, header] = value
+        self.snapshot_dirty = False
+        return True
+
+    def save_snapshot(self) -> None:
+        """
+        Save the quotes and their current rendered details for the next start.
+        """
+        if self.snapshot_path is None or not self.snapshot_dirty:
+            return
+        from .snapshot import save_snapshot
+
+        details = {
+            symbol: markdown
+            for symbol, (version, markdown) in self.details_cache.items()
+            if version == self.quote_versions.get(symbol)
+        }
+        assert log is not None
+        try:
+            with span('snapshot'):
+                save_snapshot(self.snapshot_path, self.quotes, details)
+        except (OSError, ValueError) as err:
+            log.warning('Failed to save the snapshot: %s', err)
+            return
+        self.snapshot_dirty = False
+        return
+
+    def refresh_stale(self, symbol: str) -> None:
+        """
+        The quote of symbol was refreshed, show its cells as current.
+        """
+        if symbol not in self.stale:
+            return
+        self.stale.discard(symbol)
+        for header in self.headers:
+            value = self.cells.pop((symbol, header), None)
+            if value is not None:
+                self.set_cell(symbol, header, value)
+        return
+
+    def start_watch(self) -> None:
+        """
+        Refresh the tickers as they come due from now on.
+        """
+        if self.scheduler is None:
+            self.scheduler = RefreshScheduler()
+        self.scheduler.schedule_all(self.tickers)
+        self.set_interval(WATCH_TICK, self.refresh_due)
+        self.refresh_due()
         return
 
     def on_data_table_header_selected(self, message: DataTable.HeaderSelected) -> None:
@@ -137,12 +444,12 @@ class TheApp(App):
         else:
             self.column_sort_reverse = not self.column_sort_reverse
 
-        try:
-            self.tickers_table.sort(
-                message.column_key, reverse=self.column_sort_reverse
-            )
-        except Exception:
-            log.exception('Error sorting table:')
+        assert message.column_key.value is not None
+        index = self.sort_indexes[message.column_key.value]
+        order = index.ordered(self.column_sort_reverse)
+        rank = {symbol: i for i, symbol in enumerate(order)}
+        # the first column holds the symbol
+        self.tickers_table.sort(headers[0], key=rank.__getitem__)
         return
 
     def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
@@ -155,25 +462,63 @@ class TheApp(App):
         if event.data_table != self.tickers_table:
             log.debug('Ignoring event: %s', event)
             return
-        if self.tkrs is not None:
-            ticker = self.tkrs.tickers.get(row_key.value)
-            if ticker is not None:
-                log.debug('Ticker: %s', ticker)
-                self.update_details(ticker)
-                self.set_status(ticker.info['longName'])
-                return
-        if row_key.value:
-            self.set_status(row_key.value)
+        symbol = row_key.value
+        if symbol is not None and symbol in self.quotes:
+            log.debug('Ticker: %s', symbol)
+            self.request_details(symbol)
+            self.set_status(str(self.quotes.get(symbol, 'longName') or symbol))
+            return
+        if symbol:
+            self.set_status(symbol)
+        return
+
+    def bump_version(self, symbol: str) -> None:
+        """
+        Mark the info of symbol changed, its rendered details are stale.
+        """
+        self.quote_versions[symbol] = self.quote_versions.get(symbol, 0) + 1
+        self.snapshot_dirty = True
+        return
+
+    def request_details(self, symbol: str) -> None:
+        """
+        Show the details of symbol, rendered once the cursor rests on it.
+        """
+        self.details_symbol = symbol
+        if self.details_timer is not None:
+            self.details_timer.stop()
+            self.details_timer = None
+        version = self.quote_versions.get(symbol, 0)
+        if self.details_shown == (symbol, version):
+            return
+        cached = self.details_cache.get(symbol)
+        if cached is not None and cached[0] == version:
+            self.details_cache.move_to_end(symbol)
+            self.show_details(symbol, version, cached[1])
+            return
+        self.details_timer = self.set_timer(DETAILS_DEBOUNCE, self.start_details)
         return
 
-    def update_details(self, ticker: yf.Ticker) -> None:
+    def start_details(self) -> None:
+        """
+        The cursor came to rest, render the details of the ticker under it.
         """
-        Update the details table with info from the selected ticker.
+        self.details_timer = None
+        symbol = self.details_symbol
+        if symbol is None or symbol not in self.quotes:
+            return
+        # rebuilt on the UI thread, the info may be updated while rendering
+        tvars = self.quotes.info(symbol)
+        self.render_details(symbol, self.quote_versions.get(symbol, 0), tvars)
+        return
+
+    @work(group='details', exclusive=True, thread=True)
+    def render_details(self, symbol: str, version: int, tvars: dict[str, Any]) -> None:
+        """
+        Render the details template in the background.
         """
         assert log is not None
-        log.debug('update_details %s', ticker)
-        info = ticker.info
-        tvars = dict(info.items())
+        log.debug('render_details %s %d', symbol, version)
         log.debug('corporateActions: %s', tvars.get('corporateActions'))
         # sanitize data - these are broken for NTDOY
         for key in ticker_info_sanitize_keys:
@@ -181,8 +526,39 @@ class TheApp(App):
                 tvars[key] = 0
             elif tvars[key] == '':
                 tvars[key] = 0
-        markdown = self.details_template.render(tvars)
+        with span('render', symbol):
+            markdown = self.details_template.render(tvars)
         log.debug('markdown %s', markdown)
+        self.post_message(DetailsMessage(symbol, version, markdown))
+        return
+
+    def on_details_message(self, message: DetailsMessage) -> None:
+        """
+        Called when the details are rendered, shown unless the cursor moved on.
+        """
+        assert log is not None
+        symbol = message.symbol
+        version = message.version
+        if version == self.quote_versions.get(symbol, 0):
+            self.details_cache[symbol] = (version, message.markdown)
+            self.details_cache.move_to_end(symbol)
+            while len(self.details_cache) > DETAILS_CACHE_SIZE:
+                self.details_cache.popitem(last=False)
+        if symbol != self.details_symbol:
+            log.debug('Discarding details of %s', symbol)
+            return
+        # the info changed while rendering, render it again
+        if version != self.quote_versions.get(symbol, 0):
+            self.request_details(symbol)
+            return
+        self.show_details(symbol, version, message.markdown)
+        return
+
+    def show_details(self, symbol: str, version: int, markdown: str) -> None:
+        """
+        Update the details pane with the rendered markdown.
+        """
+        self.details_shown = (symbol, version)
         self.details.document.update(markdown)
         return
 
@@ -208,55 +584,315 @@ class TheApp(App):
         """
         assert log is not None
         log.debug('action_update %s', self)
+        self.update_tickers(self.tickers)
+        return
+
+    def refresh_due(self) -> None:
+        """
+        Update the tickers due for a refresh, unless an update is running.
+        """
+        if self.scheduler is None or self.refreshing:
+            return
+        due = self.scheduler.pop_due()
+        if due:
+            self.update_tickers(set(due))
+        return
+
+    def update_tickers(self, symbols: set[str]) -> None:
+        """
+        Start updating the values for symbols
+        """
         self.set_status('Updating...')
-        self.run_long_task()
+        self.fetch_failures = 0
+        self.refreshing = True
+        self.refresh_generation += 1
+        self.run_long_task(symbols, self.refresh_generation)
         return
 
     @work(group='yfinance', exclusive=True, thread=True)
-    def run_long_task(self) -> None:
+    def run_long_task(self, symbols: set[str], generation: int) -> None:
         """
         Download ticker info in the background.
         group: A short string to identify a group of workers.
         exclusive: Cancel all workers in the same group.
         thread: Mark the method as a thread worker.
+        A newer refresh cancels this one: no other request is started, and the
+        quotes of the requests still running are dropped when they return.
+        Those posted before are only kept if fresher, see on_quote_message.
         """
-        self.tkrs = yf.Tickers(list(self.tickers))
-        self.tkrs.history(period='1d', repair=True, progress=False)
-        self.post_message(TaskCompleteMessage())
+        assert log is not None
+        worker = get_current_worker()
+        total = len(symbols)
+        throttle = self.provider.throttle
+        stats = None
+        if throttle is not None:
+            from .throttle import RequestStats
+
+            stats = RequestStats(throttle.clock)
+        results = iter_quotes(
+            symbols,
+            self.get_info,
+            concurrency=self.concurrency,
+            timeout=self.timeout,
+            cancelled=lambda: worker.is_cancelled,
+            throttle=throttle,
+            stats=stats,
+        )
+        fetched, fetched_symbols = 0, []
+        for fetched, result in enumerate(results, 1):
+            if result.ok:
+                fetched_symbols.append(result.symbol)
+            self.post_message(QuoteMessage(result, fetched, total, generation))
+        if worker.is_cancelled:
+            log.debug('Refresh %d cancelled, %d/%d fetched', generation, fetched, total)
+            return
+        indicators = None
+        store = self.provider.history_store
+        if store is not None:
+            from .indicators import indicator_fields
+
+            with span('indicators'):
+                indicators = indicator_fields(store, fetched_symbols)
+        self.post_message(TaskCompleteMessage(indicators, generation, stats))
         return
 
-    def on_task_complete_message(self, message: TaskCompleteMessage) -> None:
+    def get_info(self, symbol: str) -> dict[str, Any]:
         """
-        Called when the background task is complete.
+        Fetch the info for symbol, called from the fetch engine threads.
+        Raises LookupError for an empty info, what yfinance answers a failed
+        request with: the quote shown is not refreshed.
         """
-        self.notify('Background task finished!')
-
-        def update_table(table: DataTable, tkrs: yf.Tickers) -> None:
-            for ticker in tkrs.tickers.values():
-                info = ticker.info
-                for k, v in header2ticker_info.items():
-                    if table.get_cell(ticker.ticker, k) is None:
-                        continue
-                    if info.get(v) is None:
-                        continue
-                    table.update_cell(ticker.ticker, k, info.get(v))
-                table.update_cell(
-                    ticker.ticker,
-                    headers[-1],
-                    '; '.join(analyze_ticker(ticker)),
-                    update_width=True,
-                )
+        info = self.provider.get_info(symbol)
+        if not info:
+            msg = f'empty info for {symbol}'
+            raise LookupError(msg)
+        return self.project(info)
+
+    def project(self, info: dict[str, Any]) -> dict[str, Any]:
+        """
+        Only the fields of info the app displays.
+        """
+        if self.fields is None:
+            return info
+        return project_info(info, self.fields)
+
+    @work(group='live', exclusive=True, thread=True)
+    def run_live_feed(self) -> None:
+        """
+        Stream the prices in the background until the feed is lost.
+        """
+        assert self.live_feed is not None
+        try:
+            self.live_feed.run()
+        except Exception as err:
+            self.post_message(LiveFeedMessage(str(err)))
+        return
+
+    def apply_ticks(self) -> None:
+        """
+        Apply the ticks streamed since the last frame, one row update per symbol.
+        """
+        ticks, received = self.ticks.drain()
+        for symbol, fields in ticks.items():
+            if symbol not in self.tickers:
+                continue
+            self.quotes.update(symbol, fields)
+            self.bump_version(symbol)
+            self.update_row(symbol, self.quotes.analyze_symbol(symbol, self.proximity))
+            self.check_alerts(symbol)
+        if ticks:
+            self.flush_cells()
+            # without restarting the debounce, it would never expire
+            if self.details_symbol in ticks and self.details_timer is None:
+                self.request_details(self.details_symbol)
+            now = time.monotonic()
+            self.tick_latencies.extend(now - t for t in received.values())
+        # the rate, once a second
+        since, ticks_since = self.tick_rate_since
+        now = time.monotonic()
+        if self.live_feed is not None and now - since >= 1.0 and not self.refreshing:
+            rate = (self.ticks.ticks - ticks_since) / (now - since)
+            self.set_status(f'Live, {rate:.0f} ticks/s')
+            self.tick_rate_since = (now, self.ticks.ticks)
+        return
+
+    def on_live_feed_message(self, message: LiveFeedMessage) -> None:
+        """
+        Called when the live feed is lost, poll instead.
+        """
+        assert log is not None
+        log.warning('Live feed lost: %s', message.error)
+        self.live_feed = None
+        self.notify(f'Live feed lost, polling: {message.error}', severity='warning')
+        if self.scheduler is None:
+            self.start_watch()
+        return
+
+    def on_quote_message(self, message: QuoteMessage) -> None:
+        """
+        Called as the info for each ticker arrives.
+        """
+        assert log is not None
+        result = message.result
+        # the refresh in progress, not one it superseded
+        current = message.generation == self.refresh_generation
+        if current:
+            self.set_status(f'{message.fetched}/{message.total} fetched')
+        if not result.ok:
+            log.warning('Failed to fetch %s: %s', result.symbol, result.error)
+            if current:
+                self.fetch_failures += 1
+                if self.scheduler is not None:
+                    self.scheduler.reschedule(result.symbol, None)
+            return
+        if result.started < self.quote_started.get(result.symbol, float('-inf')):
+            # requested before the quote shown, by a superseded refresh
+            log.debug('Dropping an older quote of %s', result.symbol)
+            return
+        self.quote_started[result.symbol] = result.started
+        if self.scheduler is not None:
+            self.scheduler.reschedule(result.symbol, result.info.get('marketState'))
+        self.quotes.set(result.symbol, result.info, self.indicator_fields)
+        self.bump_version(result.symbol)
+        self.refresh_stale(result.symbol)
+        self.update_row(
+            result.symbol, self.quotes.analyze_symbol(result.symbol, self.proximity)
+        )
+        self.check_alerts(result.symbol)
+        # refresh the details of the ticker under the cursor
+        table = self.tickers_table
+        if table.row_count:
+            row_key, _ = table.coordinate_to_cell_key(table.cursor_coordinate)
+            if row_key.value == result.symbol:
+                self.request_details(result.symbol)
+        return
 
+    def check_alerts(self, symbol: str) -> None:
+        """
+        Notify the alerts fired by the updated quote of symbol.
+        """
+        if self.alerts is None or symbol not in self.alerts:
             return
+        info = {field: self.quotes.get(symbol, field) for field in ALERT_FIELDS}
+        for alert in self.alerts.update(symbol, info):
+            assert log is not None
+            log.info('Alert: %s', alert)
+            self.notify(str(alert), title='Alert', timeout=10)
+        return
 
-        update_table(self.tickers_table, self.tkrs)
-        self.set_status('Updated')
+    def on_task_complete_message(self, message: TaskCompleteMessage) -> None:
+        """
+        Called when the background task is complete.
+        """
+        if message.generation != self.refresh_generation:
+            # a newer refresh is running
+            return
+        self.refreshing = False
+        if self.scheduler is None:
+            self.notify('Background task finished!')
+        if message.indicators:
+            for symbol, fields in message.indicators.items():
+                self.quotes.update(symbol, fields)
+                self.bump_version(symbol)
+            self.update_table()
+            if self.details_symbol in message.indicators:
+                self.request_details(self.details_symbol)
+        status = 'Updated'
+        if self.fetch_failures:
+            status += f', {self.fetch_failures} failed'
+        stats = message.stats
+        if stats is not None and stats['rate_limited']:
+            status += f', {stats["rate_limited"]} rate limited'
+        recording = profiler()
+        if recording is not None:
+            status += f', {recording.summary()}'
+        self.set_status(status)
         # self.status.styles.width = '25%'
         # self.footer_inner.styles.width = '75%'
         assert log is not None
         log.debug('action_update DONE')
         return
 
+    def update_table(self) -> None:
+        """
+        Fill the tickers table with the values from self.quotes.
+        """
+        thoughts = self.quotes.analyze(self.proximity)
+        for symbol, row_thoughts in zip(self.quotes.symbols, thoughts, strict=True):
+            self.update_row(symbol, row_thoughts)
+        return
+
+    def update_row(self, symbol: str, thoughts: list[str]) -> None:
+        """
+        Fill the tickers table row for `symbol` with the values from self.quotes.
+        """
+        for header, value in self.row_cells(symbol, thoughts):
+            self.set_cell(symbol, header, value)
+        return
+
+    def row_cells(self, symbol: str, thoughts: list[str]) -> list[tuple[str, Any]]:
+        """
+        (header, value) of the cells of `symbol` with a value in self.quotes.
+        """
+        cells = []
+        for k, v in self.header2ticker_info.items():
+            value = self.quotes.get(symbol, v)
+            if value is None:
+                continue
+            cells.append((k, value))
+        cells.append((headers[-1], '; '.join(thoughts)))
+        return cells
+
+    def set_cell(self, symbol: str, header: str, value: Any) -> None:
+        """
+        Queue a change of the table cell, the unchanged values are skipped.
+        """
+        key = (symbol, header)
+        if self.cells.get(key) == value:
+            # changed back before it was shown
+            self.pending_cells.pop(key, None)
+            return
+        self.pending_cells[key] = value
+        if self.flush_timer is None:
+            self.flush_timer = self.set_timer(FRAME_INTERVAL, self.flush_cells)
+        return
+
+    def flush_cells(self) -> None:
+        """
+        Apply the queued cell changes to the table in a single batch.
+        """
+        if self.flush_timer is not None:
+            self.flush_timer.stop()
+            self.flush_timer = None
+        pending, self.pending_cells = self.pending_cells, {}
+        table = self.tickers_table
+        # header -> (length, symbol) of the widest changed value
+        widest: dict[str, tuple[int, str]] = {}
+        with span('table'):
+            for (symbol, header), value in pending.items():
+                table.update_cell(
+                    symbol,
+                    header,
+                    stale_cell(value) if symbol in self.stale else value,
+                )
+                self.cells[symbol, header] = value
+                self.sort_indexes[header].set(symbol, value)
+                length = len(str(value))
+                if length >= widest.get(header, (-1, ''))[0]:
+                    widest[header] = (length, symbol)
+            # the column widths, once per changed column
+            for header, (_, symbol) in widest.items():
+                value = pending[symbol, header]
+                table.update_cell(
+                    symbol,
+                    header,
+                    stale_cell(value) if symbol in self.stale else value,
+                    update_width=True,
+                )
+        assert log is not None
+        log.debug('flush_cells %d changed', len(pending))
+        return
+
     def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
         """Called when the worker state changes."""
         assert log is not None
@@ -288,6 +924,15 @@ class TheApp(App):
         # self.set_css_vars(font_size=f'{new_font_size}em')
         return
 
+
+def stale_cell(value: Any) -> Text:
+    """
+    Table cell of a value from the last session, dimmed until refreshed
+    """
+    content = f'{value:.2f}' if isinstance(value, float) else str(value)
+    return Text(content, style='dim', end='')
+
+
 #
 # Custom global functions for use in the jinja template
 #
@@ -311,6 +956,7 @@ def format_num(num: str) -> str:
         pass
     return ''
 
+
 def format_date(val: str) -> str:
     try:
         return datetime.fromtimestamp(int(val)).strftime('%Y-%m-%d')
@@ -318,6 +964,7 @@ def format_date(val: str) -> str:
         pass
     return ''
 
+
 def safe(val: str) -> str:
     try:
         return val
@@ -325,6 +972,7 @@ def safe(val: str) -> str:
         pass
     return ''
 
+
 def is_defined(val: str) -> bool:
     try:
         return True
@@ -332,7 +980,30 @@ def is_defined(val: str) -> bool:
         pass
     return False
 
-def run_tui(log_level: int, tickers: set[str], details_path: str) -> int:
+
+def template_fields(env: Environment, name: str) -> set[str]:
+    """
+    Info fields referenced by the template `name`, the globals excluded
+    """
+    assert env.loader is not None
+    source, _, _ = env.loader.get_source(env, name)
+    fields = meta.find_undeclared_variables(env.parse(source))
+    return fields - set(env.globals)
+
+
+def run_tui(
+    log_level: int,
+    tickers: set[str],
+    details_path: str,
+    provider: QuoteProvider,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    proximity: float = DEFAULT_PROXIMITY_PERCENT,
+    watch: bool = False,
+    live_url: str | None = None,
+    alerts: AlertEngine | None = None,
+    snapshot_path: str | Path | None = None,
+) -> int:
     """
     Main TUI entry point
     """
@@ -351,7 +1022,21 @@ def run_tui(log_level: int, tickers: set[str], details_path: str) -> int:
         env.globals['is_defined'] = is_defined
         env.globals['safe'] = safe
         details_template = env.get_template(details_path)
-        app = TheApp(tickers, details_template)
+        details_fields = template_fields(env, details_path)
+        log.debug('Details fields: %s', sorted(details_fields))
+        app = TheApp(
+            tickers,
+            details_template,
+            provider,
+            concurrency,
+            timeout,
+            proximity,
+            details_fields,
+            watch,
+            live_url,
+            alerts,
+            snapshot_path,
+        )
         app.run()
         return 0
 
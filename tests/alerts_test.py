@@ -0,0 +1,166 @@
+import random
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pytickrs import setup_logging
+from pytickrs.alerts import METRICS, AlertEngine, AlertRule, load_rules, parse_rule
+
+log = setup_logging(__name__)
+
+
+def brute_force(
+    rules: list[AlertRule], symbol: str, old: float | None, new: float, metric: str
+) -> list[AlertRule]:
+    """
+    The rules of symbol and metric a move from old to new crosses
+    """
+    fired = []
+    for rule in rules:
+        if rule.symbol != symbol or rule.metric != metric:
+            continue
+        if rule.op == '>':
+            crossed = new > rule.level and (old is None or old <= rule.level)
+        else:
+            crossed = new < rule.level and (old is None or old >= rule.level)
+        if crossed:
+            fired.append(rule)
+    return fired
+
+
+class TestAlertRules(unittest.TestCase):
+    """
+    Verify the alert rules are parsed
+    """
+
+    def test_parse(self) -> None:
+        rule = parse_rule('aapl price > 200')
+        self.assertEqual(
+            (rule.symbol, rule.metric, rule.op, rule.level), ('AAPL', 'price', '>', 200)
+        )
+        rule = parse_rule('NVDA near-high 5')
+        self.assertEqual((rule.metric, rule.op, rule.level), ('near-high', '<', 5))
+        self.assertEqual(str(parse_rule('MSFT change% < -3')), 'MSFT change% < -3')
+        for line in (
+            'AAPL price',
+            'AAPL volume > 1',
+            'AAPL price = 1',
+            'AAPL price > x',
+        ):
+            with self.assertRaises(ValueError):
+                parse_rule(line)
+        return
+
+    def test_load(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'alerts.txt'
+            path.write_text(
+                '# watchlist\n\nAAPL price > 200  # breakout\nMSFT near-low 3\n'
+            )
+            self.assertEqual(
+                [str(rule) for rule in load_rules(path)],
+                ['AAPL price > 200', 'MSFT near-low < 3'],
+            )
+            path.write_text('AAPL price > 200\nAAPL price >> 1\n')
+            with self.assertRaisesRegex(ValueError, 'line 2'):
+                load_rules(path)
+        return
+
+
+class TestAlertEngine(unittest.TestCase):
+    """
+    Verify the alerts fire when the levels are crossed
+    """
+
+    def test_crossing(self) -> None:
+        engine = AlertEngine(
+            [
+                parse_rule('AAPL price > 200'),
+                parse_rule('AAPL price < 150'),
+                parse_rule('AAPL near-high 5'),
+            ]
+        )
+        info = {'currentPrice': 180.0, 'fiftyTwoWeekHigh': 220.0}
+        self.assertEqual(engine.update('AAPL', info), [])
+        # no rules
+        self.assertEqual(engine.update('MSFT', {'currentPrice': 1.0}), [])
+        fired = engine.update('AAPL', info | {'currentPrice': 210.0})
+        self.assertEqual(
+            sorted(str(alert) for alert in fired),
+            ['AAPL near-high < 5: 4.55', 'AAPL price > 200: 210.00'],
+        )
+        # still above, fires once
+        self.assertEqual(engine.update('AAPL', info | {'currentPrice': 215.0}), [])
+        fired = engine.update('AAPL', info | {'currentPrice': 140.0})
+        self.assertEqual([str(alert.rule) for alert in fired], ['AAPL price < 150'])
+        self.assertEqual(
+            fired[0].record(),
+            {
+                'symbol': 'AAPL',
+                'alert': 'AAPL price < 150',
+                'metric': 'price',
+                'level': 150.0,
+                'value': 140.0,
+            },
+        )
+        return
+
+    def test_random_walk(self) -> None:
+        rnd = random.Random(3)
+        symbols = ['A', 'B', 'C']
+        rules = [
+            AlertRule(
+                rnd.choice(symbols),
+                rnd.choice(['price', 'change%']),
+                rnd.choice('<>'),
+                float(rnd.randint(80, 120)),
+            )
+            for _ in range(300)
+        ]
+        engine = AlertEngine(rules)
+        last: dict[tuple[str, str], float] = {}
+        for _ in range(2000):
+            symbol = rnd.choice(symbols)
+            info = {
+                'currentPrice': float(rnd.randint(75, 125)),
+                'regularMarketChangePercent': float(rnd.randint(75, 125)),
+            }
+            expected = []
+            for metric in ('price', 'change%'):
+                value = METRICS[metric](info)
+                assert value is not None
+                old = last.get((symbol, metric))
+                last[symbol, metric] = value
+                expected.extend(brute_force(rules, symbol, old, value, metric))
+            fired = [alert.rule for alert in engine.update(symbol, info)]
+            self.assertCountEqual(fired, expected)
+        return
+
+    def test_scaling(self) -> None:
+        # thousands of rules on a few symbols, an update bisects their levels
+        rnd = random.Random(5)
+        small = AlertEngine([AlertRule('A', 'price', '>', 1e9)])
+        big = AlertEngine(
+            [AlertRule('A', 'price', '>', rnd.uniform(0, 1000)) for _ in range(20000)]
+            + [AlertRule('A', 'price', '>', 1e9)]
+        )
+        self.assertEqual(len(big), 20001)
+
+        def timed(engine: AlertEngine) -> float:
+            # small moves cross a handful of levels
+            start = time.perf_counter()
+            for i in range(5000):
+                engine.update('A', {'currentPrice': 500 + (i % 2) * 0.01})
+            return time.perf_counter() - start
+
+        timed(big)
+        small_time, big_time = timed(small), timed(big)
+        log.info(f'5000 updates: 1 rule {small_time:.3f}s, 20k rules {big_time:.3f}s')
+        # a scan of the rules would be thousands of times slower
+        self.assertLess(big_time, small_time * 20)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,389 @@
+"""
+Offline benchmarks of the hot paths at 10, 1k and 10k symbols, on synthetic
+info dicts varied from details-template-vars.txt.
+
+    python -m tests.bench --save
+    python -m tests.bench --compare
+
+The results are saved to, and compared against, a JSON baseline file.
+A benchmark slower than the baseline by more than the threshold is flagged
+as a regression, and the exit code is 1.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from jinja2 import Environment, FileSystemLoader
+from tabulate import tabulate
+
+from pytickrs import setup_logging, timing, tui
+from pytickrs.once import batch_thoughts, process_tickers, result_row
+from pytickrs.providers import QuoteProvider
+from pytickrs.tickers import FetchResult, analyze_ticker, analyze_tickers, headers
+from tests.fixtures import sample_info
+
+log = setup_logging(__name__)
+
+BASELINE_FILE = 'bench-baseline.json'
+DEFAULT_SIZES = (10, 1000, 10000)
+# a benchmark this much slower than the baseline is a regression
+DEFAULT_THRESHOLD = 0.25
+# seconds, differences below this are noise
+NOISE_FLOOR = 0.001
+PROJECT_DIR = Path(__file__).absolute().parents[1]
+
+
+def synthetic_infos(count: int, seed: int = 1) -> dict[str, dict[str, Any]]:
+    """
+    Symbol -> info, the prices of the sample info scaled at random
+    """
+    rnd = random.Random(seed)
+    sample = sample_info()
+    infos = {}
+    for i in range(count):
+        symbol = f'S{i:05d}'
+        scale = rnd.uniform(0.05, 5)
+        info = dict(sample)
+        for field in (
+            'bid',
+            'ask',
+            'currentPrice',
+            'dayLow',
+            'dayHigh',
+            'fiftyTwoWeekLow',
+            'fiftyTwoWeekHigh',
+            'previousClose',
+            'regularMarketChange',
+        ):
+            info[field] = round(sample[field] * scale * rnd.uniform(0.9, 1.1), 2)
+        info['symbol'] = symbol
+        info['regularMarketChangePercent'] = round(rnd.uniform(-5, 5), 2)
+        info['marketCap'] = rnd.randint(10**6, 10**13)
+        infos[symbol] = info
+    return infos
+
+
+class SyntheticProvider(QuoteProvider):
+    """
+    The synthetic infos, straight from memory
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, infos: dict[str, dict[str, Any]]) -> None:
+        self.infos = infos
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        return self.infos[symbol]
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: Any = None,
+    ) -> Any:
+        msg = f'No history for {symbol}'
+        raise LookupError(msg)
+
+
+def details_environment() -> Environment:
+    """
+    The environment the TUI renders the details template with
+    """
+    env = Environment(autoescape=True, loader=FileSystemLoader(PROJECT_DIR))
+    env.globals['format_num'] = tui.format_num
+    env.globals['format_date'] = tui.format_date
+    env.globals['is_defined'] = tui.is_defined
+    env.globals['safe'] = tui.safe
+    return env
+
+
+def best_of(repeat: int, run: Callable[[], Any]) -> float:
+    """
+    Seconds of the fastest of the runs
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_once(infos: dict[str, dict[str, Any]], repeat: int) -> dict[str, float]:
+    """
+    The analysis and the --once table
+    """
+    values = list(infos.values())
+    results = [FetchResult(symbol, info) for symbol, info in infos.items()]
+    thoughts = batch_thoughts(results, 20.0)
+    rows = [result_row(r, t) for r, t in zip(results, thoughts, strict=True)]
+    provider = SyntheticProvider(infos)
+
+    def process() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_tickers(set(infos), provider)
+        return
+
+    return {
+        'analyze_ticker': best_of(
+            repeat, lambda: [analyze_ticker(info) for info in values]
+        ),
+        'analyze_tickers': best_of(repeat, lambda: analyze_tickers(values)),
+        'table_rows': best_of(
+            repeat,
+            lambda: [result_row(r, t) for r, t in zip(results, thoughts, strict=True)],
+        ),
+        'tabulate': best_of(
+            repeat, lambda: tabulate(rows, headers=headers, tablefmt='simple')
+        ),
+        'process_tickers': best_of(repeat, process),
+    }
+
+
+def bench_details(infos: dict[str, dict[str, Any]], repeat: int) -> dict[str, float]:
+    """
+    The template helpers and the rendering of the details of each symbol
+    """
+    values = list(infos.values())
+    template = details_environment().get_template('details-template.md')
+    return {
+        'format_num': best_of(
+            repeat, lambda: [tui.format_num(info['marketCap']) for info in values]
+        ),
+        'format_date': best_of(
+            repeat,
+            lambda: [tui.format_date(info['earningsTimestamp']) for info in values],
+        ),
+        'details': best_of(repeat, lambda: [template.render(info) for info in values]),
+    }
+
+
+def make_app(
+    infos: dict[str, dict[str, Any]], snapshot_path: Path | None = None
+) -> tui.TheApp:
+    """
+    TheApp showing the synthetic infos with the details template
+    """
+    tui.log = setup_logging(tui.__name__)
+    env = details_environment()
+    return tui.TheApp(
+        set(infos),
+        env.get_template('details-template.md'),
+        SyntheticProvider(infos),
+        details_fields=tui.template_fields(env, 'details-template.md'),
+        snapshot_path=snapshot_path,
+    )
+
+
+async def bench_tui(infos: dict[str, dict[str, Any]]) -> dict[str, float]:
+    """
+    Filling the table of a headless TheApp, updating it with the quotes and
+    saving them, then the warm start of the next session from the snapshot
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = Path(tmp) / 'session.snapshot'
+        app = make_app(infos, snapshot_path)
+        recording = timing.start_profiling()
+        try:
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                for symbol, info in infos.items():
+                    app.quotes.set(symbol, app.project(info))
+                start = time.perf_counter()
+                app.update_table()
+                app.flush_cells()
+                update_table = time.perf_counter() - start
+                app.snapshot_dirty = True
+                start = time.perf_counter()
+                app.save_snapshot()
+                snapshot_save = time.perf_counter() - start
+            (fill_table,) = recording.durations['fill_table']
+
+            app = make_app(infos, snapshot_path)
+            recording = timing.start_profiling()
+            async with app.run_test() as pilot:
+                await pilot.pause()
+        finally:
+            timing.stop_profiling()
+    # then saved again on exit
+    snapshot_load = recording.durations['snapshot'][0]
+    # loading the snapshot and filling the table with it
+    warm_start = recording.durations['warm_start'][0]
+    warm_start += recording.durations['fill_table'][0]
+    return {
+        'fill_table': fill_table,
+        'update_table': update_table,
+        'snapshot_save': snapshot_save,
+        'snapshot_load': snapshot_load,
+        'warm_start': warm_start,
+    }
+
+
+def run_benchmarks(
+    sizes: tuple[int, ...] = DEFAULT_SIZES, repeat: int = 3, tui_bench: bool = True
+) -> dict[str, float]:
+    """
+    'name[size]' -> seconds
+    """
+    results: dict[str, float] = {}
+    for size in sizes:
+        infos = synthetic_infos(size)
+        timings = bench_once(infos, repeat) | bench_details(infos, repeat)
+        if tui_bench:
+            timings |= asyncio.run(bench_tui(infos))
+        for name, seconds in timings.items():
+            results[f'{name}[{size}]'] = seconds
+            log.info('%s[%d] %.6f', name, size, seconds)
+    return results
+
+
+def compare(
+    baseline: dict[str, float],
+    results: dict[str, float],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """
+    The benchmarks slower than the baseline by more than threshold
+    """
+    regressions = []
+    for name, seconds in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if seconds > old * (1 + threshold) and seconds - old > NOISE_FLOOR:
+            regressions.append(name)
+    return regressions
+
+
+def report(
+    results: dict[str, float],
+    baseline: dict[str, float] | None = None,
+    regressions: list[str] = [],
+) -> str:
+    table = []
+    for name, seconds in results.items():
+        row: list[Any] = [name, f'{seconds * 1000:.3f}']
+        if baseline is not None:
+            old = baseline.get(name)
+            row.append('' if old is None else f'{old * 1000:.3f}')
+            row.append('' if not old else f'{seconds / old:.2f}x')
+            row.append('REGRESSION' if name in regressions else '')
+        table.append(row)
+    columns = ['benchmark', 'ms']
+    if baseline is not None:
+        columns += ['baseline ms', 'ratio', '']
+    text: str = tabulate(table, headers=columns, tablefmt='simple')
+    return text
+
+
+def add_baseline_arguments(ap: ArgumentParser, baseline_file: str) -> None:
+    """
+    The options to save and compare to a baseline
+    """
+    ap.add_argument(
+        '--baseline',
+        type=Path,
+        default=PROJECT_DIR / baseline_file,
+        help=f'Path to the baseline file, default: {baseline_file}',
+    )
+    ap.add_argument(
+        '--save', action='store_true', help='Save the results as the baseline'
+    )
+    ap.add_argument(
+        '--compare', action='store_true', help='Compare the results to the baseline'
+    )
+    ap.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help='Slowdown flagged as a regression, default: '
+        f'{DEFAULT_THRESHOLD} for {DEFAULT_THRESHOLD * 100:.0f}%%',
+    )
+    return
+
+
+def load_baseline(path: Path) -> dict[str, float] | None:
+    """
+    The results saved to path, None if there are none yet
+    """
+    try:
+        with path.open(encoding='utf-8') as f:
+            results: dict[str, float] = json.load(f)['results']
+    except FileNotFoundError:
+        print(f'No baseline at {path}, run with --save first', file=sys.stderr)
+        return None
+    return results
+
+
+def save_baseline(path: Path, results: dict[str, float]) -> None:
+    with path.open('w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'results': results,
+            },
+            f,
+            indent=2,
+        )
+    return
+
+
+def finish(
+    args: Namespace, results: dict[str, float], baseline: dict[str, float] | None
+) -> int:
+    """
+    Print the results, compared to the baseline if given, save them if asked.
+    Returns the exit code, 1 if there are regressions.
+    """
+    regressions = compare(baseline, results, args.threshold) if baseline else []
+    print(report(results, baseline, regressions))
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f'Saved the baseline to {args.baseline}')
+    if regressions:
+        print(f'{len(regressions)} regressions: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+def main() -> int:
+    ap = ArgumentParser(prog='python -m tests.bench', description=__doc__)
+    ap.add_argument(
+        '--sizes',
+        type=lambda arg: tuple(int(size) for size in arg.split(',')),
+        default=DEFAULT_SIZES,
+        help='Comma-separated numbers of symbols, default: 10,1000,10000',
+    )
+    ap.add_argument(
+        '--repeat', type=int, default=3, help='Runs of each benchmark, the best counts'
+    )
+    ap.add_argument(
+        '--no-tui', action='store_true', help='Skip the benchmarks of the TUI table'
+    )
+    add_baseline_arguments(ap, BASELINE_FILE)
+    args = ap.parse_args()
+
+    # before the runs, a broken baseline fails early
+    baseline = load_baseline(args.baseline) if args.compare else None
+    results = run_benchmarks(args.sizes, args.repeat, not args.no_tui)
+    return finish(args, results, baseline)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
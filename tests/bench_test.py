@@ -0,0 +1,66 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.bench import (
+    compare,
+    load_baseline,
+    report,
+    run_benchmarks,
+    save_baseline,
+    synthetic_infos,
+)
+
+
+class TestBench(unittest.TestCase):
+    """
+    Verify the benchmarks run and the regressions are flagged
+    """
+
+    def test_run(self) -> None:
+        results = run_benchmarks(sizes=(10,), repeat=1)
+        for name in (
+            'analyze_ticker',
+            'process_tickers',
+            'tabulate',
+            'format_num',
+            'format_date',
+            'details',
+            'fill_table',
+            'update_table',
+            'snapshot_save',
+            'snapshot_load',
+            'warm_start',
+        ):
+            self.assertGreater(results[f'{name}[10]'], 0)
+        self.assertEqual(len(synthetic_infos(10)), 10)
+        return
+
+    def test_compare(self) -> None:
+        baseline = {'a[10]': 0.010, 'b[10]': 0.010, 'c[10]': 0.0001, 'd[10]': 0.010}
+        results = {'a[10]': 0.011, 'b[10]': 0.020, 'c[10]': 0.0005, 'e[10]': 1.0}
+        # c is 5x slower, by less than the noise floor
+        regressions = compare(baseline, results, threshold=0.25)
+        self.assertEqual(regressions, ['b[10]'])
+        self.assertEqual(compare(baseline, results, threshold=1.5), [])
+        text = report(results, baseline, regressions)
+        self.assertIn('2.00x', text)
+        self.assertIn('REGRESSION', text)
+        return
+
+    def test_baseline(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'baseline.json'
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                self.assertIsNone(load_baseline(path))
+            self.assertIn('--save', stderr.getvalue())
+            save_baseline(path, {'a[10]': 0.01})
+            self.assertEqual(load_baseline(path), {'a[10]': 0.01})
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from pytickrs.cache import CachingProvider, QuoteCache
+from pytickrs.providers import QuoteProvider
+
+
+class CountingProvider(QuoteProvider):
+    name = 'counting'
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        self.calls.append('info')
+        return {'symbol': symbol, 'bid': 1.5, 'longBusinessSummary': 'Apples'}
+
+    def get_live(self, symbol: str) -> dict[str, Any]:
+        self.calls.append('live')
+        return {'bid': 2.5}
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: datetime | None = None,
+    ) -> pd.DataFrame:
+        return pd.DataFrame()
+
+
+class TestQuoteCache(unittest.TestCase):
+    """
+    Verify the on-disk quote cache
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'quotes.sqlite'
+        return
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return
+
+    def test_fresh(self) -> None:
+        inner = CountingProvider()
+        provider = CachingProvider(inner, QuoteCache(self.path))
+        first = provider.get_info('AAPL')
+        second = provider.get_info('AAPL')
+        self.assertEqual(first, second)
+        self.assertEqual(inner.calls, ['info'])
+        return
+
+    def test_stale_live(self) -> None:
+        inner = CountingProvider()
+        provider = CachingProvider(inner, QuoteCache(self.path), live_ttl=0.01)
+        provider.get_info('AAPL')
+        time.sleep(0.02)
+        info = provider.get_info('AAPL')
+        self.assertEqual(inner.calls, ['info', 'live'])
+        self.assertEqual(info['bid'], 2.5)
+        self.assertEqual(info['longBusinessSummary'], 'Apples')
+        return
+
+    def test_cold_start(self) -> None:
+        CachingProvider(CountingProvider(), QuoteCache(self.path)).get_info('AAPL')
+        # another process, everything expired
+        inner = CountingProvider()
+        provider = CachingProvider(inner, QuoteCache(self.path), live_ttl=0, slow_ttl=0)
+        quotes = provider.cached_quotes(['AAPL', 'MSFT'])
+        self.assertEqual(list(quotes), ['AAPL'])
+        self.assertEqual(quotes['AAPL']['bid'], 1.5)
+        self.assertEqual(inner.calls, [])
+        return
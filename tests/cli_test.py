@@ -1,9 +1,12 @@
+import json
 import subprocess
+import tempfile
 import time
 import unittest
 from pathlib import Path
 
 from pytickrs import __version__, setup_logging
+from pytickrs.providers import write_info
 
 log = setup_logging(__name__)
 
@@ -54,6 +57,17 @@ def run_cli(
     return popen.returncode, stdout_value, stderr_value
 
 
+AAPL_INFO = {
+    'symbol': 'AAPL',
+    'fiftyTwoWeekLow': 100.0,
+    'fiftyTwoWeekHigh': 200.0,
+    'dayLow': 150.0,
+    'dayHigh': 160.0,
+    'bid': 155.0,
+    'ask': 155.5,
+}
+
+
 class TestCLI(unittest.TestCase):
     """
     Verify CLI
@@ -77,10 +91,159 @@ class TestCLI(unittest.TestCase):
         return
 
     def test_single_ticker(self) -> None:
-        ec, out, err = run_cli(args=['--once', '--tickers=AAPL'])
+        # the cache of the user is left alone
+        ec, out, err = run_cli(args=['--once', '--tickers=AAPL', '--no-cache'])
         self.assertEqual(ec, 0)
         self.assertNotEqual(out, '')
         self.assertEqual(err, '')
         # print('out', out)
         # print('err', err)
         return
+
+    def test_replay(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO)
+            ec, out, err = run_cli(args=['--once', '--tickers=AAPL', f'--replay={tmp}'])
+        self.assertEqual(ec, 0)
+        self.assertIn('155.5', out)
+        self.assertEqual(err, '')
+        return
+
+    def test_stream_jsonl(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO)
+            ec, out, err = run_cli(
+                args=['--once', '--tickers=AAPL,MSFT', f'--replay={tmp}', '--stream']
+            )
+        self.assertEqual(ec, 0)
+        self.assertEqual(err, '')
+        records = {r['symbol']: r for r in map(json.loads, out.splitlines())}
+        self.assertEqual(records['AAPL']['ask'], 155.5)
+        self.assertIn('error', records['MSFT'])
+        return
+
+    def test_watch_closed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO | {'marketState': 'CLOSED'})
+            popen = subprocess.Popen(
+                [
+                    '.venv/bin/python3',
+                    '-m',
+                    'pytickrs',
+                    '--once',
+                    '--tickers=AAPL',
+                    f'--replay={tmp}',
+                    '--watch',
+                    '--format=jsonl',
+                ],
+                cwd=Path(__file__).absolute().parents[1],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+            try:
+                assert popen.stdout is not None
+                self.assertEqual(json.loads(popen.stdout.readline())['symbol'], 'AAPL')
+                # waiting to check for the next session
+                time.sleep(0.5)
+                self.assertIsNone(popen.poll())
+            finally:
+                popen.kill()
+                popen.communicate()
+        return
+
+    def test_alerts(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO | {'currentPrice': 155.5})
+            rules = Path(tmp) / 'alerts.txt'
+            rules.write_text('AAPL price > 150\nAAPL price > 160\nAAPL near-low 10\n')
+            ec, out, err = run_cli(
+                args=[
+                    '--once',
+                    '--tickers=AAPL',
+                    f'--replay={tmp}',
+                    f'--alerts={rules}',
+                    '--format=jsonl',
+                ]
+            )
+        self.assertEqual(ec, 0)
+        self.assertEqual(err, '')
+        records = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(records[0]['symbol'], 'AAPL')
+        self.assertEqual([r['alert'] for r in records[1:]], ['AAPL price > 150'])
+        return
+
+    def test_profile(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO)
+            trace_path = Path(tmp) / 'trace.json'
+            ec, out, err = run_cli(
+                args=[
+                    '--once',
+                    '--tickers=AAPL,MSFT',
+                    f'--replay={tmp}',
+                    f'--profile={trace_path}',
+                ]
+            )
+            trace = json.loads(trace_path.read_text())
+        self.assertEqual(ec, 0)
+        self.assertIn('155.5', out)
+        self.assertRegex(
+            err, r'2 tickers, p50 [\d.]+ms, p99 [\d.]+ms, analyze [\d.]+ms'
+        )
+        phases = {e['name'] for e in trace['traceEvents'] if e['ph'] == 'X'}
+        self.assertEqual(phases, {'fetch', 'analyze', 'render'})
+        self.assertEqual(sum(trace['histograms']['fetch']['counts']), 2)
+        return
+
+    def test_log_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO)
+            log_path = Path(tmp) / 'logs' / 'test.log'
+            log_path.parent.mkdir()
+            ec, _, err = run_cli(
+                args=[
+                    '--once',
+                    '--tickers=AAPL,MSFT',
+                    f'--replay={tmp}',
+                    f'--log-file={log_path}',
+                    '--log-level=pytickrs.once=DEBUG',
+                    '--log-rotate=1M',
+                ]
+            )
+            text = log_path.read_text()
+        self.assertEqual(ec, 0)
+        self.assertEqual(err, '')
+        self.assertIn('pytickrs.once WARNING Failed to fetch MSFT', text)
+        ec, _, err = run_cli(args=['--once', '--log-rotate=often'])
+        self.assertEqual(ec, 2)
+        self.assertIn('--log-rotate', err)
+        return
+
+    def test_root_log_level(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', AAPL_INFO)
+            log_path = Path(tmp) / 'test.log'
+            ec, _, _ = run_cli(
+                args=[
+                    '--once',
+                    '--tickers=AAPL,MSFT',
+                    f'--replay={tmp}',
+                    f'--log-file={log_path}',
+                    '--log-level=ERROR',
+                ]
+            )
+            text = log_path.read_text() if log_path.exists() else ''
+        self.assertEqual(ec, 0)
+        # the root level applies to pytickrs too
+        self.assertNotIn('Failed to fetch MSFT', text)
+        return
+
+    def test_alerts_invalid(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            rules = Path(tmp) / 'alerts.txt'
+            rules.write_text('AAPL price ~ 150\n')
+            ec, _, err = run_cli(args=['--once', '--tickers=AAPL', f'--alerts={rules}'])
+        self.assertEqual(ec, 2)
+        self.assertIn('line 1', err)
+        return
@@ -0,0 +1,22 @@
+"""
+Test data shared by the tests and the benchmarks
+"""
+
+import ast
+from pathlib import Path
+from typing import Any
+
+
+def sample_info() -> dict[str, Any]:
+    """
+    A complete yfinance info, as listed in details-template-vars.txt
+    """
+    info: dict[str, Any] = {}
+    path = Path(__file__).absolute().parents[1] / 'details-template-vars.txt'
+    for line in path.read_text(encoding='utf-8').splitlines():
+        key, _, value = line.partition(': ')
+        try:
+            info[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            info[key] = value
+    return info
@@ -0,0 +1,238 @@
+"""
+Headless TUI frame latency harness.
+
+Starts TheApp with synthetic quotes under Textual's test pilot, plays a
+script of user actions: `u`, header clicks, runs of arrow keys and drags of
+the split pane separator, and records the latency of each until the app is
+idle again.  The latency percentiles of each action can be saved to, and
+compared against, a baseline, as with tests/bench.py:
+
+    python -m tests.frames --rows=2000 --save
+    python -m tests.frames --rows=2000 --compare --trace=frames.json
+"""
+
+import asyncio
+import sys
+import time
+from argparse import ArgumentParser
+from collections.abc import Awaitable, Callable, Sequence
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from textual.pilot import Pilot
+
+from pytickrs import setup_logging, timing, tui
+from pytickrs.split_pane import SplitContainerSeparator
+from tests.bench import (
+    add_baseline_arguments,
+    finish,
+    load_baseline,
+    make_app,
+    synthetic_infos,
+)
+
+log = setup_logging(__name__)
+
+BASELINE_FILE = 'frames-baseline.json'
+DEFAULT_ROWS = 2000
+# columns, lines: wide enough to show all the headers
+SCREEN_SIZE = (240, 50)
+# seconds, waiting for the update or the details
+ACTION_TIMEOUT = 60.0
+# percentiles of each action kept in the results
+PERCENTILES = (50, 90, 99)
+
+#
+# (action, argument): update, sort by a header, run of a key, drag by columns
+#
+DEFAULT_SCRIPT: tuple[tuple[str, Any], ...] = (
+    ('update', None),
+    ('sort', 'Price'),
+    ('sort', 'Price'),
+    ('sort', 'Change %'),
+    ('sort', 'TIKR'),
+    ('keys', ('down', 20)),
+    ('keys', ('up', 10)),
+    ('keys', ('pagedown', 3)),
+    ('drag', 20),
+    ('drag', -20),
+)
+
+
+class FrameHarness:
+    """
+    Plays the actions on the app, records their latency in the profiler
+    """
+
+    def __init__(
+        self, app: tui.TheApp, pilot: Pilot[None], profiler: timing.Profiler
+    ) -> None:
+        self.app = app
+        self.pilot = pilot
+        self.profiler = profiler
+        return
+
+    async def timed(self, name: str, action: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Record how long the action takes until the app is idle
+        """
+        start = time.perf_counter()
+        await action()
+        await self.pilot.pause()
+        self.profiler.record(name, start, time.perf_counter())
+        return
+
+    async def wait_until(self, done: Callable[[], bool]) -> None:
+        deadline = time.monotonic() + ACTION_TIMEOUT
+        while not done():
+            if time.monotonic() > deadline:
+                msg = f'Action not done in {ACTION_TIMEOUT}s'
+                raise TimeoutError(msg)
+            await self.pilot.pause(0.005)
+        return
+
+    async def update(self, _: None) -> None:
+        """
+        Press u, until all of the quotes are shown
+        """
+
+        async def update() -> None:
+            await self.pilot.press('u')
+            await self.wait_until(lambda: not self.app.refreshing)
+            return
+
+        await self.timed('update', update)
+        return
+
+    async def sort(self, header: str) -> None:
+        """
+        Click on the header
+        """
+        table = self.app.tickers_table
+        x = 0
+        for column in table.ordered_columns:
+            if column.key.value == header:
+                break
+            x += column.get_render_width(table)
+        else:
+            msg = f'No column {header!r}'
+            raise ValueError(msg)
+        if x >= table.size.width:
+            msg = f'Column {header!r} is off the screen, at {x}'
+            raise ValueError(msg)
+        await self.timed(
+            'sort', lambda: self.pilot.click('#tickers', offset=(x + 1, 0))
+        )
+        return
+
+    async def keys(self, key_count: tuple[str, int]) -> None:
+        """
+        Press the key count times, then wait for the details of the row
+        """
+        key, count = key_count
+        for _ in range(count - 1):
+            await self.timed(f'key {key}', lambda: self.pilot.press(key))
+        start = time.perf_counter()
+        await self.timed(f'key {key}', lambda: self.pilot.press(key))
+        app = self.app
+        await self.wait_until(
+            lambda: (
+                app.details_symbol is None
+                or (
+                    app.details_shown is not None
+                    and app.details_shown[0] == app.details_symbol
+                )
+            )
+        )
+        self.profiler.record('details', start, time.perf_counter())
+        return
+
+    async def drag(self, columns: int) -> None:
+        """
+        Drag the split pane separator by columns, a move per column
+        """
+        region = self.app.query_one(SplitContainerSeparator).region
+        y = region.y + region.height // 2
+        await self.timed('drag', lambda: self.pilot.mouse_down(offset=(region.x, y)))
+        step = 1 if columns > 0 else -1
+        for dx in range(step, columns + step, step):
+            offset = (region.x + dx, y)
+            await self.timed('drag', partial(self.pilot.hover, offset=offset))
+        await self.timed(
+            'drag', lambda: self.pilot.mouse_up(offset=(region.x + columns, y))
+        )
+        return
+
+    async def play(self, script: Sequence[tuple[str, Any]]) -> None:
+        for action, arg in script:
+            await getattr(self, action)(arg)
+        return
+
+
+async def run_frames(
+    rows: int = DEFAULT_ROWS,
+    script: Sequence[tuple[str, Any]] = DEFAULT_SCRIPT,
+    repeat: int = 1,
+) -> timing.Profiler:
+    """
+    Play the script repeat times on a headless TheApp with rows tickers,
+    returns the profiler with the latencies and the spans of the app
+    """
+    app = make_app(synthetic_infos(rows))
+    profiler = timing.start_profiling()
+    try:
+        start = time.perf_counter()
+        async with app.run_test(size=SCREEN_SIZE) as pilot:
+            await pilot.pause()
+            profiler.record('mount', start, time.perf_counter())
+            harness = FrameHarness(app, pilot, profiler)
+            for _ in range(repeat):
+                await harness.play(script)
+    finally:
+        timing.stop_profiling()
+    return profiler
+
+
+def latency_percentiles(profiler: timing.Profiler, rows: int) -> dict[str, float]:
+    """
+    'name.pNN[rows]' -> seconds for the actions and the app spans,
+    'name[rows]' for those recorded once, e.g. mount
+    """
+    results: dict[str, float] = {}
+    for name in profiler.durations:
+        durations = profiler.sorted_durations(name)
+        if len(durations) == 1:
+            results[f'{name}[{rows}]'] = durations[0]
+            continue
+        for q in PERCENTILES:
+            results[f'{name}.p{q}[{rows}]'] = timing.percentile(durations, q)
+    return results
+
+
+def main() -> int:
+    ap = ArgumentParser(prog='python -m tests.frames', description=__doc__)
+    ap.add_argument(
+        '--rows',
+        type=int,
+        default=DEFAULT_ROWS,
+        help=f'Number of tickers in the table, default: {DEFAULT_ROWS}',
+    )
+    ap.add_argument(
+        '--repeat', type=int, default=3, help='Times to play the script, default: 3'
+    )
+    ap.add_argument(
+        '--trace', type=Path, help='Save the actions and the app spans as a trace'
+    )
+    add_baseline_arguments(ap, BASELINE_FILE)
+    args = ap.parse_args()
+
+    baseline = load_baseline(args.baseline) if args.compare else None
+    profiler = asyncio.run(run_frames(args.rows, repeat=args.repeat))
+    if args.trace:
+        profiler.save(args.trace)
+    return finish(args, latency_percentiles(profiler, args.rows), baseline)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
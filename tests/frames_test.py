@@ -0,0 +1,37 @@
+import unittest
+
+from tests.frames import latency_percentiles, run_frames
+
+SCRIPT = (
+    ('update', None),
+    ('sort', 'Price'),
+    ('sort', 'Price'),
+    ('keys', ('down', 2)),
+    ('drag', 2),
+)
+
+
+class TestFrames(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the scripted actions are played and their latencies recorded
+    """
+
+    async def test_script(self) -> None:
+        profiler = await run_frames(rows=50, script=SCRIPT, repeat=1)
+        self.assertEqual(len(profiler.durations['update']), 1)
+        self.assertEqual(len(profiler.durations['sort']), 2)
+        self.assertEqual(len(profiler.durations['key down']), 2)
+        self.assertEqual(len(profiler.durations['details']), 1)
+        # down, a move per column, up
+        self.assertEqual(len(profiler.durations['drag']), 4)
+        results = latency_percentiles(profiler, 50)
+        self.assertIn('mount[50]', results)
+        self.assertIn('fill_table[50]', results)
+        self.assertIn('update[50]', results)
+        self.assertLessEqual(results['sort.p50[50]'], results['sort.p99[50]'])
+        self.assertGreater(results['key down.p50[50]'], 0)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import tempfile
+import unittest
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from pytickrs.history import HistoryProvider, HistoryStore, yearly_range
+from pytickrs.providers import QuoteProvider
+
+DAYS = pd.date_range(
+    end=pd.Timestamp.now(tz='America/New_York').normalize(), periods=10, freq='D'
+)
+
+
+class BarsProvider(QuoteProvider):
+    """
+    Serves DAYS[:self.available] as daily bars, records the requests
+    """
+
+    name = 'bars'
+
+    def __init__(self) -> None:
+        self.available = 5
+        self.requests: list[datetime | None] = []
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        return {'symbol': symbol}
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: datetime | None = None,
+    ) -> pd.DataFrame:
+        self.requests.append(start)
+        index = DAYS[: self.available]
+        if start is not None:
+            index = index[index >= pd.Timestamp(start)]
+        prices = DAYS.get_indexer(index) + 1.0
+        return pd.DataFrame(
+            {
+                'Open': prices,
+                'High': prices + 1,
+                'Low': prices - 1,
+                'Close': prices,
+                'Volume': prices * 100,
+            },
+            index=index,
+        )
+
+
+class TestHistoryStore(unittest.TestCase):
+    """
+    Verify the local price history store
+    """
+
+    def test_incremental(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = HistoryStore(tmp)
+            provider = BarsProvider()
+            self.assertEqual(store.update('AAPL', provider), 5)
+            provider.available = 8
+            # the last stored bar is refetched, then 3 new ones
+            self.assertEqual(store.update('AAPL', provider), 4)
+            self.assertIsNone(provider.requests[0])
+            self.assertEqual(provider.requests[1], DAYS[4])
+
+            bars = store.load('AAPL')
+            self.assertIsInstance(bars, np.memmap)
+            self.assertEqual(len(bars), 8)
+            self.assertEqual(list(bars['close']), [float(d) for d in range(1, 9)])
+            self.assertTrue(np.all(np.diff(bars['ts']) > 0))
+        return
+
+    def test_yearly_range(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = HistoryStore(tmp)
+            provider = HistoryProvider(BarsProvider(), store, intervals=('1d',))
+            info = provider.get_info('AAPL')
+            self.assertEqual(yearly_range(store.load('AAPL')), (0.0, 6.0))
+            # filled in from the history
+            self.assertEqual(info['fiftyTwoWeekLow'], 0.0)
+            self.assertEqual(info['fiftyTwoWeekHigh'], 6.0)
+        return
+
+    def test_fresh_not_refetched(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = HistoryStore(tmp)
+            bars = BarsProvider()
+            bars.available = len(DAYS)
+            provider = HistoryProvider(bars, store, intervals=('1d',))
+            provider.get_info('AAPL')
+            # the last bar is today's, the next one is a day away
+            provider.get_info('AAPL')
+            self.assertEqual(bars.requests, [None])
+            last = store.last_timestamp('AAPL')
+            assert last is not None
+            self.assertFalse(store.stale('AAPL', '1d', now=last + 60))
+            self.assertTrue(store.stale('AAPL', '1d', now=last + 24 * 60 * 60))
+            self.assertTrue(store.stale('AAPL', '5m'))
+        return
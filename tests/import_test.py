@@ -0,0 +1,117 @@
+import subprocess
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from pytickrs import setup_logging
+from pytickrs.providers import ReplayProvider, write_info
+from pytickrs.serve import DaemonServer, QuoteDaemon
+
+log = setup_logging(__name__)
+
+#
+# Modules which must not be imported in a given mode
+#
+HEAVY_MODULES = {'jinja2', 'pandas', 'textual', 'yfinance'}
+ONCE_FORBIDDEN_MODULES = {'jinja2', 'textual'}
+# --once answered by a daemon
+CLIENT_FORBIDDEN_MODULES = HEAVY_MODULES | {'numpy', 'tabulate'}
+
+#
+# Budgets for the time spent importing, in microseconds.
+# Generous, to catch a heavy import sneaking in, not to measure noise.
+#
+VERSION_BUDGET_US = 60_000
+ONCE_BUDGET_US = 150_000
+
+
+def import_times(args: list[str]) -> tuple[dict[str, int], set[str]]:
+    """
+    Run pytickrs with `-X importtime`, returns:
+    top-level module name -> cumulative import time in microseconds,
+    all the imported modules.
+    Only the imports done by pytickrs count, not the interpreter start up.
+    """
+    command_line = ['.venv/bin/python3', '-X', 'importtime', '-m', 'pytickrs', *args]
+    parent_dir = Path(__file__).absolute().parents[1]
+    proc = subprocess.run(
+        command_line,
+        cwd=parent_dir,
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=False,
+    )
+    times: dict[str, int] = {}
+    modules: set[str] = set()
+    started = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        module = name.strip()
+        if module == 'pytickrs':
+            started = True
+        if not started:
+            continue
+        modules.add(module)
+        # nested imports are indented by two spaces per level
+        if name.startswith(' ' + module):
+            times[module] = int(cumulative)
+    assert started, proc.stderr
+    return times, modules
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Verify that each mode imports only what it needs
+    """
+
+    def check(self, args: list[str], forbidden: set[str], budget: int) -> None:
+        times, modules = import_times(args)
+        imported = {k.split('.')[0] for k in modules}
+        self.assertEqual(imported & forbidden, set())
+        total = sum(times.values())
+        log.info(f'{args} imports took {total} us')
+        self.assertLess(total, budget)
+        return
+
+    def test_version(self) -> None:
+        self.check(['--version'], HEAVY_MODULES, VERSION_BUDGET_US)
+        return
+
+    def test_help(self) -> None:
+        self.check(['--help'], HEAVY_MODULES, VERSION_BUDGET_US)
+        return
+
+    def test_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', {'symbol': 'AAPL'})
+            self.check(
+                ['--once', '--tickers=AAPL', f'--replay={tmp}', '--no-cache'],
+                ONCE_FORBIDDEN_MODULES,
+                ONCE_BUDGET_US,
+            )
+        return
+
+    def test_client(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', {'symbol': 'AAPL'})
+            path = Path(tmp) / 'pytickrs.sock'
+            provider = ReplayProvider(tmp)
+            # standing in for a live daemon
+            provider.kind = 'live'
+            daemon = QuoteDaemon(provider)
+            with DaemonServer(path, daemon) as server:
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                try:
+                    self.check(
+                        ['--once', '--tickers=AAPL', f'--socket={path}'],
+                        CLIENT_FORBIDDEN_MODULES,
+                        VERSION_BUDGET_US,
+                    )
+                finally:
+                    server.shutdown()
+            self.assertIn('AAPL', daemon.results)
+        return
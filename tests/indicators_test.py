@@ -0,0 +1,101 @@
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pytickrs.indicators import (
+    RSI_WINDOW,
+    compute_indicators,
+    crossover,
+    ema,
+    rolling_mean,
+    rolling_std,
+    rsi,
+)
+
+
+def random_walk(symbols: int, bars: int, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.01, size=(symbols, bars))
+    return 100 * np.exp(np.cumsum(steps, axis=1))
+
+
+def wilder_rsi(closes: np.ndarray, window: int) -> float:
+    """
+    Straightforward scalar RSI to verify against
+    """
+    gain = loss = 0.0
+    for i, delta in enumerate(np.diff(closes)):
+        g, lo = max(delta, 0.0), max(-delta, 0.0)
+        if i == 0:
+            gain, loss = g, lo
+        else:
+            gain += (g - gain) / window
+            loss += (lo - loss) / window
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+class TestIndicators(unittest.TestCase):
+    """
+    Verify the vectorized indicators
+    """
+
+    def test_kernels(self) -> None:
+        closes = random_walk(3, 300)
+        df = pd.DataFrame(closes.T)
+        np.testing.assert_allclose(
+            rolling_mean(closes, 50), df.rolling(50).mean().to_numpy().T
+        )
+        np.testing.assert_allclose(
+            rolling_std(closes, 20),
+            df.rolling(20).std(ddof=0).to_numpy().T,
+            rtol=1e-6,
+            equal_nan=True,
+        )
+        np.testing.assert_allclose(
+            ema(closes, 2 / 13), df.ewm(span=12, adjust=False).mean().to_numpy().T
+        )
+        for row in closes:
+            self.assertAlmostEqual(
+                rsi(row[None, :])[0], wilder_rsi(row, RSI_WINDOW), places=6
+            )
+        return
+
+    def test_crossover(self) -> None:
+        fast = np.array([[1.0, 3.0], [3.0, 1.0], [3.0, 4.0]])
+        slow = np.array([[2.0, 2.0], [2.0, 2.0], [2.0, 2.0]])
+        self.assertEqual(list(crossover(fast, slow)), [1.0, -1.0, 0.0])
+        return
+
+    def test_missing_history(self) -> None:
+        closes = random_walk(3, 201)
+        # too short for the 200 day window, with a gap
+        closes[1, :150] = np.nan
+        closes[1, 170] = np.nan
+        # nothing at all
+        closes[2, :] = np.nan
+        indicators = compute_indicators(closes)
+        self.assertTrue(np.isfinite(indicators['zscore'][0]))
+        self.assertTrue(np.isnan(indicators['zscore'][1]))
+        self.assertTrue(np.isfinite(indicators['rsi'][1]))
+        self.assertTrue(np.isfinite(indicators['volatility'][1]))
+        for values in indicators.values():
+            self.assertTrue(np.isnan(values[2]))
+        return
+
+    def test_linear_scaling(self) -> None:
+        def elapsed(symbols: int, bars: int) -> float:
+            closes = random_walk(symbols, bars)
+            best = float('inf')
+            for _ in range(3):
+                start = time.perf_counter()
+                compute_indicators(closes)
+                best = min(best, time.perf_counter() - start)
+            return best
+
+        base = elapsed(1000, 250)
+        # 8x the bars x symbols, allow for plenty of noise around 8x
+        self.assertLess(elapsed(4000, 500), base * 16)
+        self.assertLess(elapsed(1000, 2000), base * 16)
+        return
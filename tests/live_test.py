@@ -0,0 +1,171 @@
+import base64
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from jinja2 import DictLoader, Environment
+from websockets.sync.server import Server, ServerConnection, serve
+from yfinance.pricing_pb2 import PricingData
+
+from pytickrs import setup_logging, tui
+from pytickrs.live import LiveFeed, TickCoalescer, tick_fields
+from pytickrs.providers import ReplayProvider, write_info
+
+log = setup_logging(__name__)
+
+SYMBOLS = [f'T{i:02d}' for i in range(20)]
+
+
+def record_ticks(count: int, seed: int = 1) -> list[str]:
+    """
+    Streamer messages of a random walk of the SYMBOLS prices
+    """
+    rnd = random.Random(seed)
+    prices = dict.fromkeys(SYMBOLS, 100.0)
+    messages = []
+    for _ in range(count):
+        symbol = rnd.choice(SYMBOLS)
+        prices[symbol] = round(prices[symbol] * rnd.uniform(0.99, 1.01), 4)
+        data = PricingData(
+            id=symbol,
+            price=prices[symbol],
+            change=prices[symbol] - 100.0,
+            day_volume=rnd.randint(1, 10**9),
+            # regular market
+            market_hours=1,
+        )
+        encoded = base64.b64encode(data.SerializeToString()).decode()
+        messages.append(json.dumps({'type': 'pricing', 'message': encoded}))
+    return messages
+
+
+class StandInStreamer:
+    """
+    Local stand-in for the Yahoo streamer: once subscribed, replays the
+    recorded ticks at `rate` per second, then drops the connection.
+    """
+
+    def __init__(self, ticks: list[str], rate: float) -> None:
+        self.ticks = ticks
+        self.rate = rate
+        self.subscribed: list[str] = []
+        self.server: Server = serve(self.handler, 'localhost', 0)
+        self.url = f'ws://localhost:{self.server.socket.getsockname()[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return
+
+    def handler(self, connection: ServerConnection) -> None:
+        self.subscribed = json.loads(connection.recv())['subscribe']
+        start = time.monotonic()
+        for i, tick in enumerate(self.ticks):
+            delay = start + i / self.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            connection.send(tick)
+        connection.close()
+        return
+
+    def close(self) -> None:
+        self.server.shutdown()
+        return
+
+
+class TestLiveFeed(unittest.TestCase):
+    """
+    Verify the streamed ticks are decoded and coalesced
+    """
+
+    def test_tick_fields(self) -> None:
+        symbol, fields = tick_fields(
+            {
+                'id': 'AAPL',
+                'price': 1.5,
+                'day_volume': '123',
+                'market_hours': 2,
+            }
+        ) or ('', {})
+        self.assertEqual(symbol, 'AAPL')
+        self.assertEqual(
+            fields, {'currentPrice': 1.5, 'volume': 123.0, 'marketState': 'POST'}
+        )
+        self.assertIsNone(tick_fields({'price': 1.5}))
+        return
+
+    def test_throughput(self) -> None:
+        ticks = record_ticks(20000)
+        streamer = StandInStreamer(ticks, rate=50000)
+        coalescer = TickCoalescer()
+        feed = LiveFeed(SYMBOLS, coalescer, streamer.url)
+        start = time.monotonic()
+        # the stand-in drops the connection after the last tick
+        with self.assertRaises(ConnectionError):
+            feed.run()
+        elapsed = time.monotonic() - start
+        streamer.close()
+        log.info(f'{coalescer.ticks / elapsed:.0f} ticks/s sustained')
+        self.assertEqual(sorted(streamer.subscribed), SYMBOLS)
+        self.assertEqual(coalescer.ticks, len(ticks))
+        merged, _ = coalescer.drain()
+        # the last tick of each symbol wins
+        last: dict[str, float] = {}
+        for tick in ticks:
+            message = feed_message(tick)
+            last[message.id] = round(message.price, 4)
+        self.assertEqual(
+            {s: round(f['currentPrice'], 4) for s, f in merged.items()}, last
+        )
+        return
+
+
+def feed_message(tick: str) -> PricingData:
+    data = PricingData()
+    data.ParseFromString(base64.b64decode(json.loads(tick)['message']))
+    return data
+
+
+class TestLiveTUI(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the TUI keeps up with the stream and polls once it is lost
+    """
+
+    async def test_latency(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        ticks = record_ticks(4000)
+        streamer = StandInStreamer(ticks, rate=2000)
+        with tempfile.TemporaryDirectory() as tmp:
+            for symbol in SYMBOLS:
+                write_info(Path(tmp), symbol, {'symbol': symbol, 'currentPrice': 100.0})
+            app = tui.TheApp(
+                set(SYMBOLS),
+                env.get_template('t.md'),
+                ReplayProvider(tmp),
+                live_url=streamer.url,
+            )
+            async with app.run_test() as pilot:
+                start = time.monotonic()
+                while app.live_feed is not None and time.monotonic() - start < 10:
+                    await pilot.pause(0.1)
+                await pilot.pause(0.2)
+                self.assertIsNone(app.live_feed)
+                # fell back to polling
+                self.assertIsNotNone(app.scheduler)
+                latencies = sorted(app.tick_latencies)
+        streamer.close()
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        log.info(
+            f'{app.ticks.ticks} ticks, {len(latencies)} row updates, '
+            f'UI latency p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms'
+        )
+        self.assertEqual(app.ticks.ticks, len(ticks))
+        # coalesced, far fewer row updates than ticks
+        self.assertLess(len(latencies), len(ticks) / 2)
+        # a few frames, rendering the table takes most of each
+        self.assertLess(p99, 1.0)
+        return
@@ -0,0 +1,92 @@
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from pytickrs import log as log_module
+from pytickrs.log import (
+    configure_logging,
+    parse_log_levels,
+    parse_log_rotation,
+    setup_logging,
+    stop_logging,
+)
+
+
+class TestLogging(unittest.TestCase):
+    """
+    Verify the records are written by the background thread to a rotated file
+    """
+
+    def tearDown(self) -> None:
+        stop_logging()
+        return
+
+    def test_not_configured(self) -> None:
+        stop_logging()
+        setup_logging('test.setup')
+        # left to main()
+        self.assertIsNone(log_module._listener)
+        return
+
+    def test_parse(self) -> None:
+        self.assertEqual(
+            parse_log_levels('warning, pytickrs.tui=DEBUG,yfinance=info'),
+            {'': logging.WARNING, 'pytickrs.tui': logging.DEBUG, 'yfinance': 20},
+        )
+        with self.assertRaises(ValueError):
+            parse_log_levels('pytickrs=LOUD')
+        self.assertEqual(parse_log_rotation('10M'), 10 * 1024**2)
+        self.assertEqual(parse_log_rotation('512k'), 512 * 1024)
+        self.assertEqual(parse_log_rotation('4096'), 4096)
+        self.assertEqual(parse_log_rotation('Midnight'), 'midnight')
+        for arg in ('10X', '', '-1k'):
+            with self.assertRaises(ValueError):
+                parse_log_rotation(arg)
+        return
+
+    def test_rotation(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'test.log'
+            configure_logging(
+                path, {'test.quiet': logging.WARNING}, rotation=2048, backups=2
+            )
+            log = logging.getLogger('test.rotation')
+            quiet = logging.getLogger('test.quiet')
+            self.assertFalse(log.isEnabledFor(logging.DEBUG))
+            for i in range(200):
+                log.info('record %d', i)
+                log.debug('not written %d', i)
+                quiet.info('not written %d', i)
+            stop_logging()
+            files = sorted(p.name for p in Path(tmp).iterdir())
+            self.assertEqual(files, ['test.log', 'test.log.1', 'test.log.2'])
+            self.assertIn('test.rotation INFO record 199', path.read_text())
+            self.assertLessEqual(path.stat().st_size, 2048)
+            for name in files:
+                self.assertNotIn('not written', (Path(tmp) / name).read_text())
+        return
+
+    def test_background_writer(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            configure_logging(Path(tmp) / 'test.log')
+            assert log_module._listener is not None
+            (handler,) = log_module._listener.handlers
+            writers: list[str] = []
+            handle = handler.handle
+
+            def recording_handle(record: logging.LogRecord) -> bool:
+                writers.append(threading.current_thread().name)
+                return handle(record)
+
+            handler.handle = recording_handle  # type: ignore[method-assign]
+            logging.getLogger('test.writer').info('from the main thread')
+            stop_logging()
+        self.assertEqual(len(writers), 1)
+        self.assertNotEqual(writers[0], threading.current_thread().name)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
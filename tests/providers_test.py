@@ -0,0 +1,108 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import pandas as pd
+
+from pytickrs import providers
+from pytickrs.providers import (
+    INFO_SUFFIX,
+    QuoteProvider,
+    RecordingProvider,
+    ReplayProvider,
+    make_provider,
+)
+
+
+class FakeProvider(QuoteProvider):
+    name = 'fake'
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        return {'symbol': symbol, 'bid': 1.5, 'companyOfficers': [{'name': 'X'}]}
+
+    def get_history(
+        self,
+        symbol: str,
+        period: str = '1d',
+        interval: str = '1d',
+        start: datetime | None = None,
+    ) -> pd.DataFrame:
+        freq = 'D' if interval == '1d' else '5min'
+        index = pd.date_range('2025-01-01', periods=3, freq=freq, tz='UTC', name='Date')
+        df = pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=index)
+        if start is not None:
+            df = df[df.index >= start]
+        return df
+
+
+class TestReplay(unittest.TestCase):
+    """
+    Verify recording and replaying of ticker data
+    """
+
+    def test_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = RecordingProvider(FakeProvider(), tmp)
+            info = recorder.get_info('AAPL')
+            history = recorder.get_history('AAPL')
+
+            replay = ReplayProvider(tmp)
+            self.assertEqual(replay.symbols(), {'AAPL'})
+            self.assertEqual(replay.get_info('AAPL'), info)
+            pd.testing.assert_frame_equal(
+                replay.get_history('AAPL'), history, check_freq=False
+            )
+            with self.assertRaises(LookupError):
+                replay.get_info('MSFT')
+        return
+
+    def test_history_intervals(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = RecordingProvider(FakeProvider(), tmp)
+            daily = recorder.get_history('AAPL', period='2y', interval='1d')
+            recorder.get_history('AAPL', period='5d', interval='5m')
+            # an incremental fetch does not overwrite the recorded bars
+            start = datetime(2025, 1, 2, tzinfo=UTC)
+            self.assertEqual(len(recorder.get_history('AAPL', start=start)), 2)
+
+            replay = ReplayProvider(tmp)
+            pd.testing.assert_frame_equal(
+                replay.get_history('AAPL', interval='1d'), daily, check_freq=False
+            )
+            intraday = replay.get_history('AAPL', interval='5m')
+            self.assertEqual(len(intraday), 3)
+            self.assertEqual(
+                intraday.index[1] - intraday.index[0], pd.Timedelta('5min')
+            )
+            with self.assertRaises(LookupError):
+                replay.get_history('AAPL', interval='1h')
+        return
+
+    def test_latency(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            RecordingProvider(FakeProvider(), tmp).get_info('AAPL')
+            replay = ReplayProvider(tmp, latency=0.1)
+            start = time.monotonic()
+            replay.get_info('AAPL')
+            self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        return
+
+    def test_record_cache_hits(self) -> None:
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.dict(os.environ, {'XDG_CACHE_HOME': tmp}),
+            mock.patch.object(providers, 'YFinanceProvider', FakeProvider),
+        ):
+            record = Path(tmp) / 'record'
+            provider = make_provider(record=str(record), cache_ttls=(60.0, 3600.0))
+            provider.get_info('AAPL')
+            (record / f'AAPL{INFO_SUFFIX}').unlink()
+            # served from the cache, recorded all the same
+            provider.get_info('AAPL')
+            self.assertEqual(ReplayProvider(record).symbols(), {'AAPL'})
+        return
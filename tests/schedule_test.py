@@ -0,0 +1,72 @@
+import unittest
+
+from pytickrs.schedule import DEFAULT_POLL_INTERVAL, POLL_INTERVALS, RefreshScheduler
+
+INTERVALS: dict[str, float | None] = {'REGULAR': 60.0, 'PRE': 300.0, 'CLOSED': None}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        return
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    """
+    Verify the market state driven refresh scheduling
+    """
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.scheduler = RefreshScheduler(INTERVALS, self.clock)
+        return
+
+    def test_intervals(self) -> None:
+        scheduler = self.scheduler
+        scheduler.schedule_all(['AAPL', 'SAP.DE', 'TM', 'X'])
+        self.assertEqual(sorted(scheduler.pop_due()), ['AAPL', 'SAP.DE', 'TM', 'X'])
+        self.assertEqual(scheduler.pop_due(), [])
+        scheduler.reschedule('AAPL', 'REGULAR')
+        scheduler.reschedule('TM', 'PRE')
+        scheduler.reschedule('SAP.DE', 'CLOSED')
+        # failed fetch
+        scheduler.reschedule('X', None)
+        self.assertNotIn('SAP.DE', scheduler)
+        self.assertEqual(len(scheduler), 3)
+        self.assertEqual(scheduler.next_due(), 1060.0)
+
+        self.clock.now += 60
+        self.assertEqual(scheduler.pop_due(), ['AAPL'])
+        self.clock.now = 1000.0 + DEFAULT_POLL_INTERVAL - 1
+        self.assertEqual(scheduler.pop_due(), [])
+        self.clock.now += 1
+        self.assertEqual(sorted(scheduler.pop_due()), ['TM', 'X'])
+        self.assertIsNone(scheduler.next_due())
+        return
+
+    def test_reschedule_replaces(self) -> None:
+        scheduler = self.scheduler
+        scheduler.reschedule('AAPL', 'PRE')
+        # the market opened, the earlier due time wins over the stale one
+        scheduler.reschedule('AAPL', 'REGULAR')
+        self.assertEqual(scheduler.next_due(), 1060.0)
+        self.clock.now += 300
+        self.assertEqual(scheduler.pop_due(), ['AAPL'])
+        self.assertIsNone(scheduler.next_due())
+        # closed, the pending refresh is dropped
+        scheduler.reschedule('AAPL', 'REGULAR')
+        scheduler.reschedule('AAPL', 'CLOSED')
+        self.assertIsNone(scheduler.next_due())
+        return
+
+    def test_closed_rechecked(self) -> None:
+        scheduler = RefreshScheduler(clock=self.clock)
+        scheduler.reschedule('SAP.DE', 'CLOSED')
+        # by default a closed market is checked for the next session
+        interval = POLL_INTERVALS['CLOSED']
+        assert interval is not None
+        self.assertEqual(scheduler.next_due(), 1000.0 + interval)
+        return
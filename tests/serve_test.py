@@ -0,0 +1,123 @@
+import contextlib
+import io
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from pytickrs.cache import CachingProvider, QuoteCache
+from pytickrs.client import connect, query, run_client
+from pytickrs.defaults import DEFAULT_LIVE_TTL, DEFAULT_SLOW_TTL
+from pytickrs.once import process_tickers
+from pytickrs.providers import ReplayProvider, write_info
+from pytickrs.serve import DaemonServer, QuoteDaemon
+from tests.cli_test import AAPL_INFO
+
+TTLS = (DEFAULT_LIVE_TTL, DEFAULT_SLOW_TTL)
+
+
+class TestDaemon(unittest.TestCase):
+    """
+    Verify the daemon answers --once clients as --once prints
+    """
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        write_info(self.tmp, 'AAPL', AAPL_INFO)
+        self.provider = ReplayProvider(self.tmp)
+        # standing in for a live daemon
+        self.provider.kind = 'live'
+        self.daemon = QuoteDaemon(self.provider)
+        self.path = self.tmp / 'pytickrs.sock'
+        server = DaemonServer(self.path, self.daemon)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(self.daemon.stop)
+        return
+
+    def test_answer(self) -> None:
+        for fmt in ('table', 'csv', 'jsonl'):
+            expected = io.StringIO()
+            with contextlib.redirect_stdout(expected):
+                process_tickers({'AAPL', 'MSFT'}, self.provider, fmt=fmt)
+            answer = query(
+                self.path, {'AAPL', 'MSFT'}, fmt, 20.0, indicators=False, ttls=TTLS
+            )
+            assert answer is not None
+            header, output = answer
+            self.assertEqual(header, {'failed': ['MSFT']})
+            self.assertEqual(output, expected.getvalue())
+        # MSFT failed, it is not refreshed
+        self.assertEqual(set(self.daemon.results), {'AAPL'})
+        self.assertEqual(len(self.daemon.scheduler), 1)
+        return
+
+    def test_refresh(self) -> None:
+        threading.Thread(target=self.daemon.refresh, daemon=True).start()
+        self.daemon.watch(['AAPL'])
+        answer = query(self.path, ['AAPL'], 'jsonl', 20.0, indicators=False, ttls=TTLS)
+        assert answer is not None
+        self.assertEqual(json.loads(answer[1])['ask'], 155.5)
+        # a failed refresh keeps the last quote
+        (self.tmp / 'AAPL.info.json').unlink()
+        self.daemon.fetch(['AAPL'])
+        self.assertTrue(self.daemon.results['AAPL'].ok)
+        return
+
+    def test_owner_only(self) -> None:
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o600)
+        return
+
+    def test_bad_request(self) -> None:
+        sock = connect(self.path)
+        assert sock is not None
+        with sock, sock.makefile('rb') as answer:
+            sock.sendall(b'{"protocol": 0}\n')
+            header = json.loads(answer.readline())
+        self.assertIn('protocol 0', header['error'])
+        return
+
+    def test_no_daemon(self) -> None:
+        path = self.tmp / 'none.sock'
+        self.assertIsNone(
+            query(path, ['AAPL'], 'table', 20.0, indicators=False, ttls=TTLS)
+        )
+        self.assertIsNone(
+            run_client(path, ['AAPL'], 'table', 20.0, indicators=False, ttls=TTLS)
+        )
+        return
+
+    def test_refused(self) -> None:
+        # no replayed quotes for a live client
+        self.daemon.provider = ReplayProvider(self.tmp)
+        self.assertIsNone(
+            run_client(self.path, ['AAPL'], 'table', 20.0, indicators=False, ttls=TTLS)
+        )
+        self.daemon.provider = self.provider
+        # no indicators without a history store
+        self.assertIsNone(
+            run_client(self.path, ['AAPL'], 'table', 20.0, indicators=True, ttls=TTLS)
+        )
+        self.daemon.provider = CachingProvider(
+            self.provider, QuoteCache(self.tmp / 'quotes.sqlite'), 5.0, 60.0
+        )
+        answer = query(self.path, ['AAPL'], 'table', 20.0, indicators=False, ttls=TTLS)
+        assert answer is not None
+        self.assertIn('cache TTLs', answer[0]['refused'])
+        self.assertEqual(answer[1], '')
+        # nothing fetched for the refused requests
+        self.assertEqual(self.daemon.results, {})
+        answer = query(
+            self.path, ['AAPL'], 'jsonl', 20.0, indicators=False, ttls=(5.0, 60.0)
+        )
+        assert answer is not None
+        self.assertEqual(answer[0], {'failed': []})
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pytickrs.snapshot import (
+    dump_snapshot,
+    load_snapshot,
+    parse_snapshot,
+    save_snapshot,
+)
+from pytickrs.tickers import QuoteStore
+from tests.fixtures import sample_info
+
+
+class TestSnapshot(unittest.TestCase):
+    """
+    Verify the quote store and the details survive a round trip
+    """
+
+    def test_round_trip(self) -> None:
+        quotes = QuoteStore()
+        quotes.set('AAPL', sample_info())
+        quotes.set('MSFT', {'symbol': 'MSFT', 'bid': 1.5, 'longName': 'Microsoft'})
+        snapshot = parse_snapshot(dump_snapshot(quotes, {'AAPL': '# AAPL'}, 1.0))
+        self.assertEqual(snapshot.quotes.symbols, ['AAPL', 'MSFT'])
+        for symbol in quotes.symbols:
+            self.assertEqual(snapshot.quotes.info(symbol), quotes.info(symbol))
+        self.assertIsNone(snapshot.quotes.get('MSFT', 'ask'))
+        self.assertEqual(snapshot.details, {'AAPL': '# AAPL'})
+        self.assertEqual(snapshot.saved, 1.0)
+        # still a store
+        snapshot.quotes.set('NVDA', {'bid': 2.0})
+        self.assertEqual(len(snapshot.quotes.analyze()), 3)
+        return
+
+    def test_invalid(self) -> None:
+        data = dump_snapshot(QuoteStore(), {})
+        for invalid in (b'', b'PTKS', b'XXXX' + data[4:], data[:-10]):
+            with self.assertRaises(ValueError):
+                parse_snapshot(invalid)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'session.snapshot'
+            self.assertIsNone(load_snapshot(path))
+            path.write_bytes(data[:-10])
+            self.assertIsNone(load_snapshot(path))
+            save_snapshot(path, QuoteStore(), {})
+            snapshot = load_snapshot(path)
+            assert snapshot is not None
+            self.assertEqual(len(snapshot.quotes), 0)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+import json
+import threading
+import time
+import unittest
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from pytickrs.providers import QuoteProvider
+from pytickrs.throttle import (
+    CircuitBreaker,
+    RateLimitedError,
+    RequestStats,
+    Throttle,
+    ThrottledProvider,
+    TokenBucket,
+    is_rate_limited,
+)
+from pytickrs.tickers import fetch_quotes, iter_quotes
+from tests.cli_test import AAPL_INFO
+from tests.schedule_test import FakeClock
+
+# seconds, added to every answer of the stub server
+LATENCY = 0.01
+
+
+class FakeSleep:
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+        self.slept: list[float] = []
+        return
+
+    def __call__(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.clock.now += seconds
+        return
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /info/SYMBOL answers 429 to the first `limited` requests for a symbol,
+    an empty info to the next `empty` ones, then the info
+    """
+
+    server: 'StubServer'
+
+    def do_GET(self) -> None:
+        symbol = self.path.rsplit('/', 1)[-1]
+        time.sleep(LATENCY)
+        with self.server.lock:
+            self.server.requests[symbol] += 1
+            n = self.server.requests[symbol]
+        if n <= self.server.limited:
+            self.send_error(429, 'Too Many Requests')
+            return
+        info = {}
+        if n > self.server.limited + self.server.empty:
+            info = AAPL_INFO | {'symbol': symbol}
+        body = json.dumps(info).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, limited: int, empty: int = 0) -> None:
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.limited = limited
+        self.empty = empty
+        self.requests: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        return
+
+
+class HttpProvider(QuoteProvider):
+    name = 'http'
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        return
+
+    def get_info(self, symbol: str) -> dict[str, Any]:
+        # the http:// URL of the local stub server
+        url = f'{self.url}/info/{symbol}'
+        with urllib.request.urlopen(url) as answer:  # noqa: S310
+            info: dict[str, Any] = json.load(answer)
+        return info
+
+    def get_history(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError
+
+
+class TestThrottle(unittest.TestCase):
+    """
+    Verify the rate limit, the breaker and the retries
+    """
+
+    def test_token_bucket(self) -> None:
+        clock = FakeClock()
+        sleep = FakeSleep(clock)
+        bucket = TokenBucket(2.0, burst=2, clock=clock, sleep=sleep)
+        for _ in range(4):
+            bucket.acquire()
+        # the burst, then one every half second
+        self.assertEqual(sleep.slept, [0.5, 0.5])
+        clock.now += 10.0
+        self.assertEqual(bucket.acquire(), 0.0)
+        return
+
+    def test_circuit_breaker(self) -> None:
+        clock = FakeClock()
+        breaker = CircuitBreaker('host', threshold=2, cooldown=10.0, clock=clock)
+        breaker.failed()
+        breaker.succeeded()
+        breaker.failed()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.failed()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        clock.now += 10.0
+        self.assertEqual(breaker.state, 'half-open')
+        breaker.failed()
+        self.assertEqual(breaker.remaining(), 10.0)
+        clock.now += 10.0
+        breaker.succeeded()
+        self.assertEqual(breaker.state, 'closed')
+        return
+
+    def test_backoff(self) -> None:
+        throttle = Throttle(backoff=(1.0, 8.0))
+        for attempt, cap in enumerate((1.0, 2.0, 4.0, 8.0, 8.0)):
+            delay = throttle.backoff(attempt)
+            self.assertGreaterEqual(delay, cap / 2)
+            self.assertLessEqual(delay, cap)
+        return
+
+
+class TestStubServer(unittest.TestCase):
+    """
+    Verify the throttled fetch against a local server injecting 429s
+    """
+
+    def serve(self, limited: int, empty: int = 0) -> StubServer:
+        server = StubServer(limited, empty)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def provider(self, server: StubServer, throttle: Throttle) -> ThrottledProvider:
+        host, port = server.server_address[:2]
+        url = f'http://{host!s}:{port}'
+        return ThrottledProvider(HttpProvider(url), throttle, f'{host!s}:{port}')
+
+    def test_retried(self) -> None:
+        server = self.serve(limited=1, empty=1)
+        throttle = Throttle(
+            rate=500.0,
+            retries=3,
+            chunk_size=4,
+            backoff=(0.01, 0.05),
+            breaker=(100, 0.1),
+        )
+        provider = self.provider(server, throttle)
+        symbols = [f'T{i}' for i in range(10)]
+        results = fetch_quotes(
+            symbols, provider.get_info, concurrency=4, throttle=provider.throttle
+        )
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(results[3].info['symbol'], 'T3')
+        # a 429, an empty info, then the info
+        self.assertEqual(set(server.requests.values()), {3})
+        stats = throttle.stats
+        self.assertEqual(
+            (stats['requests'], stats['ok'], stats['rate_limited'], stats['empty']),
+            (30, 10, 10, 10),
+        )
+        self.assertEqual(stats['retried'], 20)
+        self.assertAlmostEqual(stats.error_rate(), 2 / 3)
+        self.assertGreater(stats.throughput(), 0.0)
+
+        # the counters of a later run start from 0
+        run = RequestStats()
+        results = list(
+            iter_quotes(symbols, provider.get_info, throttle=throttle, stats=run)
+        )
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual((run['requests'], run['ok'], run['rate_limited']), (10, 10, 0))
+        self.assertEqual(throttle.stats['requests'], 40)
+        return
+
+    def test_late_failure(self) -> None:
+        throttle = Throttle(rate=0.0, retries=2, chunk_size=1, backoff=(0.01, 0.05))
+        calls: Counter[str] = Counter()
+
+        def fetch(symbol: str) -> dict[str, Any]:
+            calls[symbol] += 1
+            if symbol == 'SLOW':
+                # fails after it was reported as timed out
+                time.sleep(0.3)
+                raise RateLimitedError(symbol)
+            time.sleep(0.05)
+            return {'symbol': symbol}
+
+        symbols = ['SLOW', 'A', 'B', 'C', 'D', 'E']
+        results = list(
+            iter_quotes(symbols, fetch, concurrency=1, timeout=0.15, throttle=throttle)
+        )
+        self.assertEqual(sorted(r.symbol for r in results), sorted(symbols))
+        self.assertEqual(calls['SLOW'], 1)
+        self.assertEqual(throttle.stats['retried'], 0)
+        return
+
+    def test_out_of_retries(self) -> None:
+        server = self.serve(limited=10)
+        throttle = Throttle(rate=500.0, retries=1, backoff=(0.01, 0.05))
+        provider = self.provider(server, throttle)
+        results = list(
+            iter_quotes(['AAPL'], provider.get_info, throttle=provider.throttle)
+        )
+        self.assertEqual(len(results), 1)
+        self.assertIn('too many requests', results[0].error or '')
+        self.assertEqual(server.requests['AAPL'], 2)
+        with self.assertRaises(RateLimitedError) as raised:
+            provider.get_info('AAPL')
+        # the HTTPError of urllib
+        cause = raised.exception.__cause__
+        assert cause is not None
+        self.assertTrue(is_rate_limited(cause))
+        return
+
+    def test_circuit_open(self) -> None:
+        server = self.serve(limited=100)
+        throttle = Throttle(
+            rate=500.0, retries=2, backoff=(0.01, 0.05), breaker=(3, 0.2)
+        )
+        provider = self.provider(server, throttle)
+        symbols = [f'T{i}' for i in range(20)]
+        results = fetch_quotes(
+            symbols, provider.get_info, concurrency=1, throttle=provider.throttle
+        )
+        self.assertFalse(any(result.ok for result in results))
+        # the host is not asked again until the breaker half opens
+        self.assertLess(sum(server.requests.values()), 10)
+        self.assertGreater(throttle.stats['refused'], 40)
+        self.assertEqual(throttle.breakers[provider.host].state, 'open')
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
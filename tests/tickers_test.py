@@ -0,0 +1,324 @@
+import gc
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import unittest
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from jinja2 import Environment, FileSystemLoader
+
+from pytickrs import setup_logging
+from pytickrs.signals import recommendations
+from pytickrs.tickers import (
+    QuoteStore,
+    SortIndex,
+    analyze_ticker,
+    fetch_quotes,
+    header2ticker_info,
+    iter_quotes,
+    project_info,
+    sort_key,
+)
+from pytickrs.tui import template_fields
+from tests.fixtures import sample_info
+
+log = setup_logging(__name__)
+
+DELAY = 0.2
+
+
+def slow_fetch(symbol: str) -> dict[str, Any]:
+    if symbol == 'FAIL':
+        msg = 'no data'
+        raise ValueError(msg)
+    if symbol == 'HANG':
+        time.sleep(DELAY * 5)
+    time.sleep(DELAY)
+    return {'symbol': symbol}
+
+
+class TestFetchEngine(unittest.TestCase):
+    """
+    Verify the concurrent fetch engine
+    """
+
+    def test_ordered(self) -> None:
+        symbols = ['MSFT', 'AAPL', 'GOOG', 'NVDA']
+        results = fetch_quotes(symbols, slow_fetch, concurrency=4)
+        self.assertEqual([r.symbol for r in results], symbols)
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(results[1].info, {'symbol': 'AAPL'})
+        return
+
+    def test_concurrent(self) -> None:
+        symbols = [f'T{i}' for i in range(16)]
+        start = time.monotonic()
+        fetch_quotes(symbols, slow_fetch, concurrency=16)
+        elapsed = time.monotonic() - start
+        # tracks the slowest symbol, not the sum of all of them
+        self.assertLess(elapsed, DELAY * 4)
+        return
+
+    def test_errors_and_timeouts(self) -> None:
+        results = fetch_quotes(
+            ['AAPL', 'FAIL', 'HANG'], slow_fetch, concurrency=3, timeout=DELAY * 2
+        )
+        ok, failed, hung = results
+        self.assertTrue(ok.ok)
+        self.assertEqual(failed.error, 'no data')
+        self.assertIn('timed out', hung.error or '')
+        return
+
+    def test_concurrency_after_timeout(self) -> None:
+        lock = threading.Lock()
+        active = 0
+        # fetches running at once after the hung request returned
+        peak = 0
+        hung_returned = False
+
+        def fetch(symbol: str) -> dict[str, Any]:
+            nonlocal active, peak, hung_returned
+            with lock:
+                active += 1
+                if hung_returned:
+                    peak = max(peak, active)
+            time.sleep(DELAY * 2 if symbol == 'HANG' else DELAY / 4)
+            with lock:
+                active -= 1
+                if symbol == 'HANG':
+                    hung_returned = True
+            return {'symbol': symbol}
+
+        symbols = ['HANG'] + [f'T{i}' for i in range(20)]
+        results = fetch_quotes(symbols, fetch, concurrency=1, timeout=DELAY / 2)
+        self.assertIn('timed out', results[0].error or '')
+        self.assertTrue(all(result.ok for result in results[1:]))
+        self.assertTrue(hung_returned)
+        # the hung thread does not take more requests once it returns
+        self.assertEqual(peak, 1)
+        return
+
+    def test_hung_exits(self) -> None:
+        script = (
+            'import time\n'
+            'from pytickrs.tickers import fetch_quotes\n'
+            'fetch_quotes(["HANG"], lambda symbol: time.sleep(60), timeout=0.2)\n'
+        )
+        start = time.monotonic()
+        # --once exits after the timeout, not when the hung request returns
+        subprocess.run([sys.executable, '-c', script], check=True, timeout=30)
+        self.assertLess(time.monotonic() - start, 10)
+        return
+
+    def test_cancelled(self) -> None:
+        fetched: list[str] = []
+
+        def counting_fetch(symbol: str) -> dict[str, Any]:
+            fetched.append(symbol)
+            return slow_fetch(symbol)
+
+        cancelled = False
+        symbols = [f'T{i}' for i in range(8)]
+        results = iter_quotes(
+            symbols, counting_fetch, concurrency=2, cancelled=lambda: cancelled
+        )
+        first = next(results)
+        self.assertTrue(first.ok)
+        self.assertGreater(first.started, 0.0)
+        cancelled = True
+        self.assertEqual(list(results), [])
+        time.sleep(DELAY * 3)
+        # the first two and those running when cancelled, not the other 4
+        self.assertLessEqual(len(fetched), 4)
+        return
+
+
+def random_info(rnd: random.Random) -> dict[str, Any]:
+    """
+    Synthetic info, with some of the values missing or broken
+    """
+    low = rnd.choice([None, 100.0, 150.0])
+    high = rnd.choice([None, 100.0, 200.0])
+    info: dict[str, Any] = {
+        'fiftyTwoWeekLow': low,
+        'fiftyTwoWeekHigh': high,
+        'dayLow': rnd.choice([None, low, 120.0, 180.0]),
+        'dayHigh': rnd.choice([None, high, 130.0, 190.0]),
+        'bid': rnd.choice([None, 0, '', 90.0, 110.0, 160.0, 185.0, 210.0]),
+        'ask': rnd.choice([None, 0, 90.0, 110.0, 160.0, 185.0, 210.0]),
+        'rsi14': rnd.choice([None, 20.0, 50.0, 80.0]),
+        'smaCross': rnd.choice([None, -1.0, 0.0, 1.0]),
+    }
+    return {k: v for k, v in info.items() if rnd.random() > 0.1}
+
+
+class TestAnalysis(unittest.TestCase):
+    """
+    Verify the recommendations
+    """
+
+    def test_scalar(self) -> None:
+        info = {
+            'fiftyTwoWeekLow': 100.0,
+            'fiftyTwoWeekHigh': 200.0,
+            'dayLow': 100.0,
+            'dayHigh': 190.0,
+            'bid': 185.0,
+            'ask': 186.0,
+        }
+        self.assertEqual(analyze_ticker(info), ['sell, close to high', 'buy, 1y low'])
+        self.assertEqual(analyze_ticker(info, 10), ['buy, 1y low'])
+        # pre-market, no quotes yet
+        self.assertEqual(
+            analyze_ticker(info | {'bid': None, 'ask': 0}), ['buy, 1y low']
+        )
+        self.assertEqual(analyze_ticker(info | {'fiftyTwoWeekHigh': 100.0}), [])
+        self.assertEqual(analyze_ticker({}), [])
+        return
+
+    def test_vectorized(self) -> None:
+        rnd = random.Random(42)
+        infos = [random_info(rnd) for _ in range(2000)]
+        for proximity in (0, 20, 50):
+            expected = [analyze_ticker(info, proximity) for info in infos]
+            self.assertEqual(recommendations(infos, proximity), expected)
+        return
+
+
+def traced_size(build: Callable[[int], object], n: int) -> int:
+    """
+    Bytes still allocated by build(n) once it returns
+    """
+    gc.collect()
+    tracemalloc.start()
+    kept = build(n)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+class TestQuoteStore(unittest.TestCase):
+    """
+    Verify the struct of arrays quote store
+    """
+
+    def test_round_trip(self) -> None:
+        store = QuoteStore()
+        info = {'symbol': 'AAPL', 'bid': 1.5, 'ask': None, 'dayLow': '', 'zip': '1'}
+        store.set('AAPL', info)
+        self.assertIn('AAPL', store)
+        self.assertEqual(store.get('AAPL', 'bid'), 1.5)
+        self.assertIsNone(store.get('AAPL', 'ask'))
+        self.assertIsNone(store.get('AAPL', 'dayLow'))
+        self.assertEqual(store.get('AAPL', 'zip'), '1')
+        self.assertEqual(store.info('AAPL'), {'symbol': 'AAPL', 'bid': 1.5, 'zip': '1'})
+        store.update('AAPL', {'rsi14': 75.0, 'note': 'x'})
+        self.assertEqual(store.get('AAPL', 'rsi14'), 75.0)
+        self.assertEqual(store.get('AAPL', 'note'), 'x')
+        # replaced, not merged
+        # but for the fields to keep info has no value for
+        store.set('AAPL', {'bid': 1.0}, keep=('rsi14', 'bid'))
+        self.assertEqual(store.info('AAPL'), {'bid': 1.0, 'rsi14': 75.0})
+        store.set('AAPL', {'ask': 2.0})
+        self.assertEqual(store.info('AAPL'), {'ask': 2.0})
+        self.assertEqual(len(store), 1)
+        return
+
+    def test_analyze(self) -> None:
+        rnd = random.Random(7)
+        for n in (10, 2000):
+            infos = [random_info(rnd) for _ in range(n)]
+            store = QuoteStore()
+            for i, info in enumerate(infos):
+                store.set(f'T{i}', info)
+            expected = [analyze_ticker(info, 20) for info in infos]
+            self.assertEqual(store.analyze(20), expected)
+            self.assertEqual(store.analyze_symbol('T3', 20), expected[3])
+        return
+
+    def test_memory(self) -> None:
+        info = sample_info()
+        parent_dir = Path(__file__).absolute().parents[1]
+        env = Environment(autoescape=True, loader=FileSystemLoader(parent_dir))
+        env.globals.update(format_num=str, format_date=str, safe=str, is_defined=bool)
+        fields = {
+            *template_fields(env, 'details-template.md'),
+            *header2ticker_info.values(),
+        }
+        encoded = json.dumps(info)
+
+        def infos(n: int) -> dict[str, dict[str, Any]]:
+            # a fresh info per symbol, as parsed from the response
+            return {f'T{i}': json.loads(encoded) for i in range(n)}
+
+        def store(n: int) -> QuoteStore:
+            quotes = QuoteStore()
+            for i in range(n):
+                quotes.set(f'T{i}', project_info(json.loads(encoded), fields))
+            return quotes
+
+        for n in (1000, 10000):
+            before = traced_size(infos, n)
+            after = traced_size(store, n)
+            log.info(
+                f'{n} symbols: info dicts {before} bytes, QuoteStore {after} bytes'
+            )
+            # the details, e.g. the business summary, take most of what is left
+            self.assertLess(after, before / 3)
+        return
+
+
+class TestSortIndex(unittest.TestCase):
+    """
+    Verify the typed, incrementally maintained sort order
+    """
+
+    def test_typed_keys(self) -> None:
+        index = SortIndex()
+        for symbol, value in [
+            ('A', 2.5),
+            ('B', '.'),
+            ('C', None),
+            ('D', -1),
+            ('E', float('nan')),
+            ('F', 10.0),
+            ('G', 'buy'),
+        ]:
+            index.set(symbol, value)
+        self.assertEqual(index.ordered(), ['D', 'A', 'F', 'G', 'B', 'C', 'E'])
+        # missing values stay last
+        self.assertEqual(
+            index.ordered(reverse=True), ['G', 'F', 'A', 'D', 'B', 'C', 'E']
+        )
+        return
+
+    def test_incremental(self) -> None:
+        rnd = random.Random(3)
+        symbols = [f'T{i}' for i in range(500)]
+        values: dict[str, Any] = {}
+        index = SortIndex()
+        for _ in range(5000):
+            symbol = rnd.choice(symbols)
+            values[symbol] = rnd.choice(
+                [None, '.', rnd.uniform(-5, 5), rnd.randint(0, 9)]
+            )
+            index.set(symbol, values[symbol])
+        expected = sorted(values, key=lambda s: (sort_key(values[s]), s))
+        self.assertEqual(index.ordered(), expected)
+        self.assertEqual(len(index), len(values))
+        bulk = SortIndex()
+        bulk.set_all(values.items())
+        self.assertEqual(bulk.ordered(), expected)
+        # still maintained incrementally
+        bulk.set(expected[0], 100.0)
+        index.set(expected[0], 100.0)
+        self.assertEqual(bulk.ordered(), index.ordered())
+        return
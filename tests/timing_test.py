@@ -0,0 +1,104 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from pytickrs import timing
+from pytickrs.timing import (
+    HISTOGRAM_BOUNDS,
+    Profiler,
+    format_seconds,
+    percentile,
+    span,
+    start_profiling,
+    stop_profiling,
+)
+
+
+class TestTiming(unittest.TestCase):
+    """
+    Verify the spans are recorded only while profiling
+    """
+
+    def tearDown(self) -> None:
+        stop_profiling()
+        return
+
+    def test_off(self) -> None:
+        self.assertIsNone(timing.profiler())
+        # the same no-op context manager, nothing to allocate
+        self.assertIs(span('fetch', 'AAPL'), span('render'))
+        with span('fetch', 'AAPL'):
+            pass
+        return
+
+    def test_spans(self) -> None:
+        recording = start_profiling()
+        self.assertIs(timing.profiler(), recording)
+
+        def fetch(symbol: str) -> None:
+            with span('fetch', symbol):
+                pass
+            return
+
+        threads = [
+            threading.Thread(target=fetch, args=(f'T{i}',), name=f'fetch_{i}')
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with span('render'):
+            pass
+        self.assertIs(stop_profiling(), recording)
+        self.assertIsNone(timing.profiler())
+        with span('render'):
+            pass
+
+        self.assertEqual(len(recording.events), 5)
+        self.assertEqual(recording.symbols, {'T0', 'T1', 'T2', 'T3'})
+        self.assertRegex(
+            recording.summary(), r'^4 tickers, p50 [\d.]+ms, p99 [\d.]+ms, render'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'trace.json'
+            recording.save(path)
+            trace = json.loads(path.read_text())
+        spans = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(
+            sorted(e['args']['symbol'] for e in spans if e['name'] == 'fetch'),
+            ['T0', 'T1', 'T2', 'T3'],
+        )
+        self.assertTrue(all(e['dur'] >= 0 for e in spans))
+        thread_names = {
+            e['args']['name'] for e in trace['traceEvents'] if e['ph'] == 'M'
+        }
+        self.assertIn('fetch_0', thread_names)
+        self.assertEqual(sum(trace['histograms']['fetch']['counts']), 4)
+        return
+
+    def test_stats(self) -> None:
+        recording = Profiler()
+        for ms in range(1, 101):
+            recording.record('fetch', 0.0, ms / 1000, f'T{ms}')
+        recording.record('fetch', 0.0, 30.0, 'SLOW')
+        self.assertEqual(len(recording.symbols), 101)
+        durations = recording.sorted_durations('fetch')
+        self.assertEqual(percentile(durations, 50), 0.051)
+        self.assertEqual(percentile(durations, 100), 30.0)
+        counts = recording.histogram('fetch')
+        self.assertEqual(len(counts), len(HISTOGRAM_BOUNDS) + 1)
+        # <= 10ms, ..., > 10s
+        self.assertEqual(counts[0], 10)
+        self.assertEqual(counts[3], 50)
+        self.assertEqual(counts[-1], 1)
+        self.assertEqual(format_seconds(0.0004), '0.4ms')
+        self.assertEqual(format_seconds(0.12), '120ms')
+        self.assertEqual(format_seconds(2.14), '2.1s')
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,366 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import Any
+
+from jinja2 import DictLoader, Environment
+
+from pytickrs import setup_logging, tui
+from pytickrs.alerts import AlertEngine, parse_rule
+from pytickrs.cache import CachingProvider, QuoteCache, split_info
+from pytickrs.history import HistoryProvider, HistoryStore
+from pytickrs.providers import ReplayProvider, write_info
+from pytickrs.tickers import FetchResult, project_info
+from pytickrs.tui import (
+    DETAILS_DEBOUNCE,
+    DetailsMessage,
+    QuoteMessage,
+    TaskCompleteMessage,
+    TheApp,
+    format_num,
+    template_fields,
+)
+
+TEMPLATE = """# {{longName}} | {{symbol}}
+{{ format_num(marketCap) }}
+{% for officer in companyOfficers %}{{ officer['name'] }}{% endfor %}
+{% set x = 1 %}{{ x }}
+"""
+
+
+class TestFieldProjection(unittest.TestCase):
+    """
+    Verify only the info fields the app displays are kept
+    """
+
+    def test_template_fields(self) -> None:
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': TEMPLATE}))
+        env.globals['format_num'] = format_num
+        self.assertEqual(
+            template_fields(env, 't.md'),
+            {'longName', 'symbol', 'marketCap', 'companyOfficers'},
+        )
+        return
+
+    def test_project_info(self) -> None:
+        info = {'symbol': 'AAPL', 'bid': 1.0, 'companyOfficers': [], 'zip': '95014'}
+        self.assertEqual(
+            project_info(info, ('symbol', 'bid', 'ask')), {'symbol': 'AAPL', 'bid': 1.0}
+        )
+        return
+
+
+INFO = {
+    'symbol': 'AAPL',
+    'longName': 'Apple Inc.',
+    'fiftyTwoWeekLow': 100.0,
+    'fiftyTwoWeekHigh': 200.0,
+    'bid': 155.0,
+    'ask': 155.5,
+}
+
+
+class TestTable(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the tickers table is updated in batches of the changed cells
+    """
+
+    async def test_diff_only(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': TEMPLATE}))
+        env.globals['format_num'] = format_num
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', INFO)
+            write_info(Path(tmp), 'MSFT', INFO | {'symbol': 'MSFT'})
+            app = TheApp(
+                {'AAPL', 'MSFT'}, env.get_template('t.md'), ReplayProvider(tmp)
+            )
+            async with app.run_test() as pilot:
+                table = app.tickers_table
+                updates: list[Any] = []
+                update_cell = table.update_cell
+
+                def counting_update_cell(*args: Any, **kwargs: Any) -> None:
+                    updates.append(args)
+                    update_cell(*args, **kwargs)
+                    return
+
+                table.update_cell = counting_update_cell  # type: ignore[method-assign]
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                self.assertEqual(table.get_cell('MSFT', 'Ask'), 155.5)
+                changed = len(updates)
+                self.assertGreater(changed, 0)
+                # nothing changed, nothing to update
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                self.assertEqual(len(updates), changed)
+        return
+
+
+class TestAlerts(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the fired alerts are notified
+    """
+
+    async def test_notify(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        alerts = AlertEngine(
+            [parse_rule('AAPL price > 150'), parse_rule('MSFT price < 1')]
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', INFO | {'currentPrice': 155.0})
+            write_info(
+                Path(tmp), 'MSFT', INFO | {'symbol': 'MSFT', 'currentPrice': 9.0}
+            )
+            app = TheApp(
+                {'AAPL', 'MSFT'},
+                env.get_template('t.md'),
+                ReplayProvider(tmp),
+                details_fields={'symbol'},
+                alerts=alerts,
+            )
+            async with app.run_test() as pilot:
+                notified: list[str] = []
+
+                def notify(message: str, **kwargs: Any) -> None:
+                    if kwargs.get('title') == 'Alert':
+                        notified.append(message)
+                    return
+
+                app.notify = notify  # type: ignore[method-assign,assignment]
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                self.assertEqual(notified, ['AAPL price > 150: 155.00'])
+                # fires on crossing only
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                self.assertEqual(len(notified), 1)
+        return
+
+
+class TestRefresh(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify a superseded refresh stops fetching and never clobbers newer quotes
+    """
+
+    async def test_cancel(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        symbols = {f'T{i}' for i in range(20)}
+        with tempfile.TemporaryDirectory() as tmp:
+            for symbol in symbols:
+                write_info(Path(tmp), symbol, INFO | {'symbol': symbol})
+            app = TheApp(
+                symbols,
+                env.get_template('t.md'),
+                ReplayProvider(tmp, latency=0.2),
+                concurrency=2,
+                details_fields={'symbol'},
+            )
+            fetched: list[str] = []
+            get_info = app.get_info
+
+            def counting_get_info(symbol: str) -> dict[str, Any]:
+                fetched.append(symbol)
+                return get_info(symbol)
+
+            app.get_info = counting_get_info  # type: ignore[method-assign]
+            async with app.run_test() as pilot:
+                await pilot.press('u')
+                await pilot.pause(0.3)
+                before = len(fetched)
+                await pilot.press('u')
+                await pilot.pause(3.0)
+                self.assertFalse(app.refreshing)
+                self.assertEqual(app.refresh_generation, 2)
+                self.assertEqual(len(app.quotes), 20)
+                # the first refresh stopped after the requests it had running
+                self.assertLessEqual(len(fetched), before + 20 + 2)
+        return
+
+    async def test_superseded(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        with tempfile.TemporaryDirectory() as tmp:
+            app = TheApp(
+                {'AAPL'},
+                env.get_template('t.md'),
+                ReplayProvider(tmp),
+                details_fields={'symbol'},
+            )
+            async with app.run_test() as pilot:
+                app.refreshing = True
+                app.refresh_generation = 2
+
+                def quote(bid: float, started: float, generation: int) -> None:
+                    info = INFO | {'bid': bid}
+                    result = FetchResult('AAPL', info, started=started)
+                    app.on_quote_message(QuoteMessage(result, 1, 1, generation))
+                    return
+
+                quote(1.0, 10.0, 2)
+                # requested before, by the superseded refresh
+                quote(2.0, 5.0, 1)
+                self.assertEqual(app.quotes.get('AAPL', 'bid'), 1.0)
+                # requested after, still fresher
+                quote(3.0, 20.0, 1)
+                self.assertEqual(app.quotes.get('AAPL', 'bid'), 3.0)
+                app.on_task_complete_message(TaskCompleteMessage(generation=1))
+                self.assertTrue(app.refreshing)
+                app.on_task_complete_message(TaskCompleteMessage(generation=2))
+                self.assertFalse(app.refreshing)
+                await pilot.pause()
+        return
+
+
+class TestDetails(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the details pane renders once the cursor rests, and only what is shown
+    """
+
+    async def test_debounce(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        symbols = [f'T{i}' for i in range(6)]
+        with tempfile.TemporaryDirectory() as tmp:
+            for symbol in symbols:
+                write_info(Path(tmp), symbol, INFO | {'symbol': symbol})
+            template = env.get_template('t.md')
+            app = TheApp(
+                set(symbols), template, ReplayProvider(tmp), details_fields={'symbol'}
+            )
+            rendered: list[str] = []
+            render = template.render
+
+            def counting_render(tvars: dict[str, Any]) -> str:
+                rendered.append(tvars['symbol'])
+                return render(tvars)
+
+            template.render = counting_render  # type: ignore[method-assign,assignment]
+            async with app.run_test() as pilot:
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                first = app.details_symbol
+                assert first is not None
+                self.assertEqual(app.details_shown, (first, 1))
+
+                # faster than the debounce, pilot.press() waits for the app
+                # to be idle after every key
+                rendered.clear()
+                table = app.tickers_table
+                for _ in range(3):
+                    table.action_cursor_down()
+                await pilot.pause(DETAILS_DEBOUNCE * 5)
+                last = app.details_symbol
+                self.assertNotEqual(last, first)
+                self.assertEqual(rendered, [last])
+                self.assertIn(str(last), app.details.document.source)
+
+                # rendered for a row the cursor left, or from an older info
+                app.on_details_message(DetailsMessage(first, 1, 'superseded'))
+                self.assertEqual(app.details_shown, (last, 1))
+                app.on_details_message(DetailsMessage(str(last), 0, 'outdated'))
+                self.assertEqual(app.details_shown, (last, 1))
+                self.assertNotIn('outdated', app.details.document.source)
+
+                # back on the first row, shown from the cache
+                for _ in range(3):
+                    table.action_cursor_up()
+                await pilot.pause()
+                self.assertEqual(app.details_shown, (first, 1))
+                await pilot.pause(DETAILS_DEBOUNCE * 5)
+                self.assertEqual(rendered, [last])
+        return
+
+
+class TestSnapshot(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify the next session starts from the quotes and details saved on exit
+    """
+
+    async def test_warm_start(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', INFO)
+            write_info(Path(tmp), 'MSFT', INFO | {'symbol': 'MSFT'})
+            snapshot_path = Path(tmp) / 'session.snapshot'
+            app = TheApp(
+                {'AAPL', 'MSFT'},
+                env.get_template('t.md'),
+                ReplayProvider(tmp),
+                details_fields={'symbol'},
+                snapshot_path=snapshot_path,
+            )
+            async with app.run_test() as pilot:
+                await pilot.press('u')
+                await pilot.pause(0.5)
+            self.assertTrue(snapshot_path.exists())
+
+            write_info(Path(tmp), 'AAPL', INFO | {'bid': 160.0})
+            app = TheApp(
+                {'AAPL', 'MSFT'},
+                env.get_template('t.md'),
+                ReplayProvider(tmp, latency=1.0),
+                details_fields={'symbol'},
+                snapshot_path=snapshot_path,
+            )
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                table = app.tickers_table
+                # shown right away, dimmed until refreshed
+                self.assertEqual(app.stale, {'AAPL', 'MSFT'})
+                cell = table.get_cell('AAPL', 'Bid')
+                self.assertEqual((cell.plain, str(cell.style)), ('155.00', 'dim'))
+                self.assertEqual(app.details_shown, ('AAPL', 1))
+                self.assertIn('AAPL', app.details.document.source)
+                await pilot.pause(1.5)
+                self.assertEqual(app.stale, set())
+                self.assertEqual(table.get_cell('AAPL', 'Bid'), 160.0)
+                self.assertEqual(table.get_cell('MSFT', 'Bid'), 155.0)
+
+            # what yfinance answers a failed request with
+            write_info(Path(tmp), 'AAPL', {})
+            app = TheApp(
+                {'AAPL', 'MSFT'},
+                env.get_template('t.md'),
+                ReplayProvider(tmp),
+                details_fields={'symbol'},
+                snapshot_path=snapshot_path,
+            )
+            async with app.run_test() as pilot:
+                await pilot.press('u')
+                await pilot.pause(0.5)
+                # dimmed until a fetch succeeds
+                self.assertEqual(app.stale, {'AAPL'})
+                cell = app.tickers_table.get_cell('AAPL', 'Bid')
+                self.assertEqual((cell.plain, str(cell.style)), ('160.00', 'dim'))
+        return
+
+
+class TestColdStart(unittest.IsolatedAsyncioTestCase):
+    """
+    Verify a session without a snapshot starts from the cached quotes
+    """
+
+    async def test_cached_history(self) -> None:
+        tui.log = setup_logging(tui.__name__)
+        env = Environment(autoescape=True, loader=DictLoader({'t.md': '{{symbol}}'}))
+        with tempfile.TemporaryDirectory() as tmp:
+            write_info(Path(tmp), 'AAPL', INFO)
+            cache = QuoteCache(Path(tmp) / 'cache')
+            cache.store('AAPL', split_info(INFO | {'bid': 150.0}), time.time())
+            # the cache under the history store, as with --history
+            provider = HistoryProvider(
+                CachingProvider(ReplayProvider(tmp), cache),
+                HistoryStore(Path(tmp) / 'history'),
+            )
+            app = TheApp({'AAPL'}, env.get_template('t.md'), provider)
+            async with app.run_test() as pilot:
+                await pilot.pause()
+                self.assertEqual(app.tickers_table.get_cell('AAPL', 'Bid'), 150.0)
+            cache.close()
+        return